@@ -91,6 +91,13 @@ class BaseSettings(Configuration):
 
     BROKER_TRANSPORT = 'redis'
 
+    # A build task holds the lock on its checkpoint for this many seconds and
+    # renews it after every week. The broker redelivers unacknowledged build
+    # tasks only after the visibility timeout, which must stay above the
+    # longest build so that a running build is not delivered twice.
+    BUILD_LOCK_TIMEOUT = 60 * 60
+    BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 60 * 60 * 24}
+
     CELERY_TASK_SERIALIZER = 'json'
     CELERY_RESULT_SERIALIZER = 'json'
     CELERY_ACCEPT_CONTENT = ['json']
@@ -100,3 +107,12 @@ class BaseSettings(Configuration):
     LESSON_HOURS = 6
     SELF_EDUCATION_HOURS = 2
     TERMS_COUNT = 7
+
+    # Occupancy index used by the builder: 'bitmask', or 'tensor' which
+    # needs numpy and falls back to 'bitmask' when it is not installed.
+    OCCUPANCY_BACKEND = 'bitmask'
+
+    # Teachers and audiences assignment: 'greedy' keeps the choice made for
+    # every troop in turn, 'matching' re-solves each week by date and hour
+    # window as a minimum-cost bipartite matching.
+    RESOURCE_ASSIGNMENT = 'greedy'
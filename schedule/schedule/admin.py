@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import Specialty, Troop, Discipline, Theme, Teacher, Audience, \
-    Lesson, ThemeType
+    Lesson, ThemeType, BuildCheckpoint, ScheduleBuild
 
 admin.site.register(Specialty)
 admin.site.register(Troop)
@@ -11,3 +11,5 @@ admin.site.register(Teacher)
 admin.site.register(Audience)
 admin.site.register(Lesson)
 admin.site.register(ThemeType)
+admin.site.register(BuildCheckpoint)
+admin.site.register(ScheduleBuild)
@@ -3,9 +3,12 @@ from django.conf import settings
 
 from rest_framework import serializers
 
-from ..tasks import build_schedule
+from ..tasks import build_schedule, build_schedule_parallel, \
+    build_schedule_distributed, rebuild_schedule, dry_run_schedule
 from ..models import Specialty, Troop, Discipline, Theme, Teacher, Audience, \
-    ThemeType, Lesson
+    ThemeType, Lesson, ScheduleBuild, CourseLength
+from ..progress import BuildProgress
+from ..solver import STRATEGIES
 
 
 class TroopSerializer(serializers.ModelSerializer):
@@ -49,20 +52,28 @@ class SpecialtyCourseLengthSerializer(serializers.Serializer):
 
     def get_course_length(self, specialty):
         struct = []
+        lengths = {}
+        disciplines = {}
 
-        for discipline in specialty.disciplines:
+        for length in specialty.course_lengths.select_related('discipline'):
+            lengths[(length.discipline_id, length.term)] = length
+            disciplines[length.discipline_id] = length.discipline
+
+        for discipline_id in sorted(disciplines):
             discipline_struct = {
-                'discipline': discipline.full_name,
+                'discipline': disciplines[discipline_id].full_name,
                 'terms': []
             }
 
             for term in xrange(1, settings.TERMS_COUNT + 1):
-                durations = discipline.get_courses_length(term, specialty)
+                length = lengths.get((discipline_id, term))
 
                 discipline_struct['terms'].append({
                     'term': term,
-                    'lessons': durations[0],
-                    'self_education': durations[1]
+                    'lessons': length.duration if length else 0,
+                    'self_education': (
+                        length.self_education_hours if length else 0
+                    )
                 })
 
             struct.append(discipline_struct)
@@ -115,9 +126,18 @@ class ThemeSerializer(serializers.ModelSerializer):
         exclude = [
             'created_at',
             'updated_at',
-            'teachers'
+            'teachers',
+            'sort_key'
         ]
 
+    def validate_number(self, value):
+        try:
+            Theme.parse_number(value)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+
+        return value
+
     def create(self, validated_data):
         teachers_main = validated_data.pop('teachers_main')
         teachers_alternative = validated_data.pop('teachers_alternative')
@@ -196,32 +216,205 @@ class ThemeTypeSerializer(serializers.ModelSerializer):
         ]
 
 
-class BuildScheduleSerializer(serializers.Serializer):
+class TermLoadMixin(object):
+    def calc_total_term_load(self):
+        totals = CourseLength.get_totals()
+
+        return sum(
+            totals.get((specialty_id, term), 0)
+            for specialty_id, term in Troop.objects.values_list(
+                'specialty_id', 'term'
+            )
+        )
+
+
+class BuildScheduleSerializer(TermLoadMixin, serializers.Serializer):
     start_date = serializers.DateField(write_only=True)
     term_length = serializers.IntegerField(write_only=True)
+    parallel = serializers.BooleanField(
+        write_only=True, required=False, default=False
+    )
+    shards = serializers.IntegerField(
+        write_only=True, required=False, min_value=1
+    )
+    profile = serializers.BooleanField(
+        write_only=True, required=False, default=False
+    )
+    strategy = serializers.ChoiceField(
+        sorted(STRATEGIES), write_only=True, required=False,
+        default='greedy'
+    )
+
+    def validate(self, attrs):
+        if attrs.get('shards') and (
+                attrs['parallel'] or attrs['strategy'] != 'greedy'):
+            raise serializers.ValidationError(
+                'Distributed build supports only the greedy strategy'
+            )
+
+        return attrs
 
     def create(self, validated_data):
-        Lesson.objects.all().delete()
-        cache.set('current_term_load', 0, timeout=None)
+        schedule_build = ScheduleBuild.objects.create(
+            start_date=validated_data['start_date'],
+            term_length=validated_data['term_length']
+        )
+        BuildProgress.reset_from_database(schedule_build)
 
         date = validated_data['start_date'].strftime('%Y-%m-%d')
-        async = build_schedule.delay(date, validated_data['term_length'])
+        options = {'build_id': schedule_build.id}
+
+        if validated_data['strategy'] != 'greedy':
+            options['strategy'] = validated_data['strategy']
+
+        if validated_data.get('shards'):
+            async = build_schedule_distributed(
+                date, validated_data['term_length'],
+                validated_data['shards'], **options
+            )
+        elif validated_data['parallel']:
+            async = build_schedule_parallel(
+                date, validated_data['term_length'], **options
+            )
+        else:
+            if validated_data['profile']:
+                options['profile'] = True
+
+            async = build_schedule.delay(
+                date, validated_data['term_length'], **options
+            )
 
         cache.set('build_schedule', async.task_id, timeout=None)
+        cache.set('build_schedule_build', schedule_build.id, timeout=None)
         cache.set(
-            'total_term_load', self.calc_total_term_load(), timeout=None
+            BuildProgress.get_key(BuildProgress.TOTAL, schedule_build),
+            self.calc_total_term_load(), timeout=None
         )
 
         return async
 
-    def calc_total_term_load(self):
-        total = 0
 
-        for specialty in Specialty.objects.all():
-            for troop in specialty.troops.all():
-                total += specialty.calc_course_length(troop.term)
+class RebuildScheduleSerializer(TermLoadMixin, serializers.Serializer):
+    start_date = serializers.DateField(write_only=True)
+    term_length = serializers.IntegerField(write_only=True)
+    troops = serializers.PrimaryKeyRelatedField(
+        queryset=Troop.objects, many=True, required=False, write_only=True
+    )
+
+    def create(self, validated_data):
+        troops = validated_data.get('troops')
+        start_date = validated_data['start_date']
+        published = ScheduleBuild.get_published()
+
+        schedule_build = ScheduleBuild.objects.create(
+            start_date=start_date,
+            term_length=validated_data['term_length'],
+            parent=published
+        )
+        BuildProgress.reset_from_database(schedule_build)
+
+        async = rebuild_schedule.delay(
+            start_date.strftime('%Y-%m-%d'), validated_data['term_length'],
+            [troop.id for troop in troops] if troops else None,
+            build_id=schedule_build.id
+        )
+
+        cache.set('build_schedule', async.task_id, timeout=None)
+        cache.set('build_schedule_build', schedule_build.id, timeout=None)
+        cache.set(
+            BuildProgress.get_key(BuildProgress.TOTAL, schedule_build),
+            self.calc_total_term_load(), timeout=None
+        )
+
+        return async
+
+
+class ScheduleBuildSerializer(serializers.ModelSerializer):
+    lessons_count = serializers.IntegerField(
+        read_only=True, source='lessons.count'
+    )
+
+    class Meta:
+        model = ScheduleBuild
+        fields = [
+            'id',
+            'start_date',
+            'term_length',
+            'parent',
+            'status',
+            'published',
+            'published_at',
+            'created_at',
+            'lessons_count'
+        ]
+        read_only_fields = fields
 
-        return total
+
+class DryRunTroopDaySerializer(serializers.Serializer):
+    troop = serializers.PrimaryKeyRelatedField(queryset=Troop.objects)
+    day = serializers.ChoiceField(Troop.DAY_CHOICES)
+
+
+class DryRunTeacherSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False, default='')
+    work_hours_limit = serializers.IntegerField(min_value=1)
+    themes_main = serializers.PrimaryKeyRelatedField(
+        queryset=Theme.objects, many=True, required=False
+    )
+    themes_alternative = serializers.PrimaryKeyRelatedField(
+        queryset=Theme.objects, many=True, required=False
+    )
+
+
+class DryRunScheduleSerializer(serializers.Serializer):
+    start_date = serializers.DateField(write_only=True)
+    term_length = serializers.IntegerField(write_only=True)
+    lesson_hours = serializers.IntegerField(
+        write_only=True, required=False, min_value=1
+    )
+    troop_days = DryRunTroopDaySerializer(
+        write_only=True, many=True, required=False
+    )
+    teachers = DryRunTeacherSerializer(
+        write_only=True, many=True, required=False
+    )
+
+    task_id = serializers.CharField(read_only=True)
+
+    def get_overrides(self, validated_data):
+        overrides = {
+            'troop_days': [
+                [struct['troop'].id, struct['day']]
+                for struct in validated_data.get('troop_days', [])
+            ],
+            'teachers': [
+                {
+                    'name': struct['name'],
+                    'work_hours_limit': struct['work_hours_limit'],
+                    'themes_main': [
+                        theme.id for theme in struct.get('themes_main', [])
+                    ],
+                    'themes_alternative': [
+                        theme.id
+                        for theme in struct.get('themes_alternative', [])
+                    ]
+                }
+                for struct in validated_data.get('teachers', [])
+            ]
+        }
+
+        if 'lesson_hours' in validated_data:
+            overrides['lesson_hours'] = validated_data['lesson_hours']
+
+        return overrides
+
+    def create(self, validated_data):
+        date = validated_data['start_date'].strftime('%Y-%m-%d')
+
+        return dry_run_schedule.delay(
+            date, validated_data['term_length'],
+            self.get_overrides(validated_data)
+        )
 
 
 class TeacherLoadStatisticsSerializer(serializers.Serializer):
@@ -232,7 +425,7 @@ class TeacherLoadStatisticsSerializer(serializers.Serializer):
     statistics = serializers.SerializerMethodField()
 
     def filter_lessons(self, teacher, date_from, date_to):
-        return Lesson.objects.filter(
+        return Lesson.objects.published().filter(
             date_of__gte=date_from,
             date_of__lte=date_to,
             teachers__id__in=[teacher.id]
@@ -266,8 +459,8 @@ class TroopProgressStatisticsSerializer(serializers.Serializer):
     code = serializers.CharField()
     statistics = serializers.SerializerMethodField()
 
-    def calc_discipline_progress(self, troop, discipline):
-        lessons = Lesson.objects.filter(
+    def calc_discipline_progress(self, troop, discipline, course_length):
+        lessons = Lesson.objects.published().filter(
             troop=troop, theme__discipline=discipline
         )
 
@@ -278,9 +471,6 @@ class TroopProgressStatisticsSerializer(serializers.Serializer):
             else:
                 hours += lesson.theme.duration
 
-        course_length = discipline.calc_course_length(troop.term,
-                                                      troop.specialty)
-
         if not course_length:
             return 1
 
@@ -290,11 +480,14 @@ class TroopProgressStatisticsSerializer(serializers.Serializer):
         progress_by_disciplines = []
 
         disciplines = troop.specialty.disciplines.all()
+        course_lengths = CourseLength.get_troop_lengths(troop)
 
         for discipline in disciplines:
             progress_by_disciplines.append({
                 'name': discipline.short_name,
-                'progress': self.calc_discipline_progress(troop, discipline)
+                'progress': self.calc_discipline_progress(
+                    troop, discipline, course_lengths.get(discipline.id, 0)
+                )
             })
 
         progress_summ = 0
@@ -314,8 +507,8 @@ class TroopsProgressStatisticsSerializer(serializers.Serializer):
     code = serializers.CharField()
     disciplines = serializers.SerializerMethodField()
 
-    def calc_discipline_progress(self, troop, discipline):
-        lessons = Lesson.objects.filter(
+    def calc_discipline_progress(self, troop, discipline, course_length):
+        lessons = Lesson.objects.published().filter(
             troop=troop, theme__discipline=discipline
         )
 
@@ -326,17 +519,23 @@ class TroopsProgressStatisticsSerializer(serializers.Serializer):
             else:
                 hours += lesson.theme.duration
 
-        return float(hours) / float(discipline.calc_course_length(troop.term))
+        if not course_length:
+            return 1
+
+        return float(hours) / float(course_length)
 
     def get_disciplines(self, troop):
         progress = []
 
         disciplines = troop.specialty.disciplines.all()
+        course_lengths = CourseLength.get_troop_lengths(troop)
 
         for discipline in disciplines:
             progress.append({
                 'name': discipline.short_name,
-                'progress': self.calc_discipline_progress(troop, discipline)
+                'progress': self.calc_discipline_progress(
+                    troop, discipline, course_lengths.get(discipline.id, 0)
+                )
             })
 
         return progress
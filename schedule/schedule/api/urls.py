@@ -4,7 +4,7 @@ from rest_framework.routers import SimpleRouter
 from .viewsets import SpecialtyViewSet, TroopViewSet, DisciplineViewSet, \
     ThemeViewSet, TeacherViewSet, AudienceViewSet, ThemeTypeViewSet, \
     ExportScheduleViewSet, ScheduleViewSet, TeacherLoadStatisticsViewSet, \
-    TroopProgressStatisticsViewSet
+    TroopProgressStatisticsViewSet, ScheduleBuildViewSet
 
 router = SimpleRouter()
 
@@ -21,6 +21,7 @@ router.register(
     ScheduleViewSet,
     base_name='schedule_operations'
 )
+router.register(r'schedule_build', ScheduleBuildViewSet)
 router.register(
     r'statistics/teachers_load',
     TeacherLoadStatisticsViewSet,
@@ -12,13 +12,16 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 
 from ..models import Specialty, Troop, Discipline, Theme, Teacher, Audience, \
-    ThemeType, Lesson
+    ThemeType, Lesson, ScheduleBuild
+from ..progress import BuildProgress
+from ..tasks import delete_schedule_build
 
 from .serializers import SpecialtySerializer, TroopSerializer, \
     DisciplineSerializer, ThemeSerializer, TeacherSerializer, \
     AudienceSerializer, ThemeTypeSerializer, BuildScheduleSerializer, \
     TeacherLoadStatisticsSerializer, TroopProgressStatisticsSerializer, \
-    SpecialtyCourseLengthSerializer
+    SpecialtyCourseLengthSerializer, RebuildScheduleSerializer, \
+    DryRunScheduleSerializer, ScheduleBuildSerializer
 from ..exporters import ExcelExporter
 
 class AuthMixin(object):
@@ -96,7 +99,7 @@ class ThemeTypeViewSet(BaseScheduleViewSet):
 class ExportScheduleViewSet(viewsets.GenericViewSet):
     @list_route()
     def excel(self, request):
-        ExcelExporter.export(Lesson.objects)
+        ExcelExporter.export(Lesson.objects.published())
 
         with open('./exported.xlsx', "rb") as excel:
             data = excel.read()
@@ -117,18 +120,60 @@ class ScheduleViewSet(AuthMixin, mixins.CreateModelMixin,
 
     def list(self, request, **kwargs):
         if self.is_build_done():
-            return Response({}, status.HTTP_200_OK)
-
-        total_term_load = float(cache.get('total_term_load'))
-        current_term_load = float(cache.get('current_term_load'))
+            return Response(self.get_build_report(), status.HTTP_200_OK)
+
+        schedule_build = ScheduleBuild.objects.filter(
+            id=cache.get('build_schedule_build')
+        ).first()
+        total_term_load = float(cache.get(
+            BuildProgress.get_key(BuildProgress.TOTAL, schedule_build)
+        ))
+        current_term_load = float(cache.get(
+            BuildProgress.get_key(BuildProgress.CURRENT, schedule_build)
+        ))
 
         struct = {
             'status': 'BUILD_PROCESSING',
             'progress': current_term_load / total_term_load
         }
+        struct.update(BuildProgress.get_breakdown(schedule_build))
 
         return Response(struct, status.HTTP_400_BAD_REQUEST)
 
+    @list_route(methods=['post'])
+    def rebuild(self, request):
+        serializer = RebuildScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @list_route(methods=['get', 'post'])
+    def dry_run(self, request):
+        if request.method == 'POST':
+            serializer = DryRunScheduleSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        task_id = request.query_params.get('task_id')
+
+        if not task_id:
+            return Response(
+                {'task_id': ['This field is required.']},
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        result = AsyncResult(task_id)
+
+        if result.status != 'SUCCESS':
+            return Response(
+                {'status': result.status}, status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(result.result, status.HTTP_200_OK)
+
     def is_build_done(self):
         task_id = cache.get(self.schedule_build_task)
 
@@ -139,6 +184,59 @@ class ScheduleViewSet(AuthMixin, mixins.CreateModelMixin,
 
         return True
 
+    def get_build_report(self):
+        task_id = cache.get(self.schedule_build_task)
+
+        if not task_id:
+            return {}
+
+        result = AsyncResult(task_id).result
+
+        if isinstance(result, dict) and 'profile' in result:
+            return {'profile': result['profile']}
+
+        return {}
+
+
+class ScheduleBuildViewSet(AuthMixin, mixins.DestroyModelMixin,
+                           viewsets.ReadOnlyModelViewSet):
+    queryset = ScheduleBuild.objects.all()
+    serializer_class = ScheduleBuildSerializer
+
+    def destroy(self, request, *args, **kwargs):
+        schedule_build = self.get_object()
+
+        if schedule_build.published:
+            return Response(
+                {'detail': 'Published build can not be deleted'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if schedule_build.status not in ScheduleBuild.DONE_STATUSES:
+            return Response(
+                {'detail': 'Build in progress can not be deleted'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        delete_schedule_build.delay(schedule_build.id)
+
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=['post'])
+    def publish(self, request, pk):
+        schedule_build = self.get_object()
+
+        if schedule_build.status != ScheduleBuild.FINISHED:
+            return Response(
+                {'detail': 'Only finished build can be published'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        schedule_build.publish()
+
+        serializer = self.get_serializer(schedule_build)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class TeacherLoadStatisticsViewSet(AuthMixin, viewsets.GenericViewSet):
     queryset = Teacher.objects.all()
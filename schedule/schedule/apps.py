@@ -5,3 +5,6 @@ from django.apps import AppConfig
 
 class ScheduleConfig(AppConfig):
     name = 'schedule'
+
+    def ready(self):
+        from . import signals  # noqa
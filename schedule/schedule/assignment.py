@@ -0,0 +1,391 @@
+from collections import defaultdict
+
+from .occupancy import OccupancyIndex, TimeSlot
+
+
+def solve_assignment(costs):
+    if not costs:
+        return []
+
+    rows, columns = len(costs), len(costs[0])
+    infinity = float('inf')
+
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (columns + 1)
+    matched = [0] * (columns + 1)
+    way = [0] * (columns + 1)
+
+    for row in xrange(1, rows + 1):
+        matched[0] = row
+        column = 0
+        min_values = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+
+        while matched[column]:
+            used[column] = True
+            current_row = matched[column]
+            delta, next_column = infinity, 0
+
+            for candidate in xrange(1, columns + 1):
+                if used[candidate]:
+                    continue
+
+                cost = costs[current_row - 1][candidate - 1] - \
+                    u[current_row] - v[candidate]
+
+                if cost < min_values[candidate]:
+                    min_values[candidate] = cost
+                    way[candidate] = column
+
+                if min_values[candidate] < delta:
+                    delta, next_column = min_values[candidate], candidate
+
+            for candidate in xrange(columns + 1):
+                if used[candidate]:
+                    u[matched[candidate]] += delta
+                    v[candidate] -= delta
+                else:
+                    min_values[candidate] -= delta
+
+            column = next_column
+
+        while column:
+            previous = way[column]
+            matched[column] = matched[previous]
+            column = previous
+
+    assignment = [None] * rows
+
+    for column in xrange(1, columns + 1):
+        if matched[column]:
+            assignment[matched[column] - 1] = column - 1
+
+    return assignment
+
+
+class ResourceAssigner(object):
+    ALTERNATIVE_COST = 10 ** 3
+    FORBIDDEN_COST = 10 ** 9
+    MAX_ROWS = 32
+
+    def __init__(self, snapshot, occupancy, teacher_load):
+        self.snapshot = snapshot
+        self.occupancy = occupancy
+        self.teacher_load = teacher_load
+
+    @staticmethod
+    def get_slot(lesson):
+        return TimeSlot(
+            lesson.date_of, lesson.initial_hour, lesson.theme.duration
+        )
+
+    @staticmethod
+    def group_lessons(lessons):
+        groups = defaultdict(list)
+
+        for index, lesson in enumerate(lessons):
+            groups[(lesson.date_of, lesson.initial_hour)].append(index)
+
+        return [groups[key] for key in sorted(groups)]
+
+    def assign(self, lessons):
+        lessons = list(lessons)
+        groups = [
+            group for group in self.group_lessons(lessons)
+            if len(group) > 1 and any(
+                self.is_understaffed(lessons[index]) for index in group
+            )
+        ]
+
+        for group in groups:
+            for index in group:
+                self.release(lessons[index])
+
+        for group in groups:
+            group_lessons = [lessons[index] for index in group]
+
+            teachers = self.pick(
+                group_lessons, 'teachers', self.get_teacher_requests
+            )
+            audiences = self.pick(
+                group_lessons, 'audiences', self.get_audience_requests
+            )
+
+            for index, lesson_teachers, lesson_audiences in zip(
+                    group, teachers, audiences):
+                lesson = lessons[index]._replace(
+                    teachers=lesson_teachers, audiences=lesson_audiences
+                )
+                lessons[index] = lesson
+
+                self.occupy(lesson)
+
+        return lessons
+
+    @staticmethod
+    def is_understaffed(lesson):
+        return not lesson.teachers and lesson.theme.teachers_count or \
+            not lesson.audiences and lesson.theme.audiences_count
+
+    def release(self, lesson):
+        mask = OccupancyIndex.get_mask(
+            lesson.initial_hour, lesson.theme.duration
+        )
+
+        for kind, key in self.get_resource_keys(lesson):
+            occupied = self.occupancy.get_occupied(lesson.date_of, kind, key)
+            self.occupancy.set_occupied(
+                lesson.date_of, kind, key, occupied & ~mask
+            )
+
+        for teacher_id in lesson.teachers:
+            self.teacher_load.add(teacher_id, -lesson.theme.duration)
+
+    def occupy(self, lesson):
+        slot = self.get_slot(lesson)
+
+        for kind, key in self.get_resource_keys(lesson):
+            self.occupancy.occupy(slot, kind, key)
+
+        self.teacher_load.add_lesson(lesson)
+
+    @staticmethod
+    def get_resource_keys(lesson):
+        return [
+            (OccupancyIndex.TEACHER, teacher_id)
+            for teacher_id in lesson.teachers
+        ] + [
+            (OccupancyIndex.AUDIENCE, audience_id)
+            for audience_id in lesson.audiences
+        ]
+
+    def get_teacher_requests(self, lesson):
+        theme, slot = lesson.theme, self.get_slot(lesson)
+        costs = {}
+
+        for teacher in self.occupancy.find_free(
+                slot, OccupancyIndex.TEACHER,
+                self.snapshot.alternative_teachers[theme.id]):
+            costs[teacher.id] = self.ALTERNATIVE_COST + \
+                self.teacher_load.get_ratio(teacher.id)
+
+        for teacher in self.occupancy.find_free(
+                slot, OccupancyIndex.TEACHER,
+                self.snapshot.main_teachers[theme.id]):
+            costs[teacher.id] = self.teacher_load.get_ratio(teacher.id)
+
+        return theme.teachers_count, costs
+
+    def get_audience_requests(self, lesson):
+        theme = lesson.theme
+        audiences = self.occupancy.find_free(
+            self.get_slot(lesson), OccupancyIndex.AUDIENCE,
+            self.snapshot.theme_audiences[theme.id]
+        )
+
+        return theme.audiences_count, dict(
+            (audience.id, position)
+            for position, audience in enumerate(audiences)
+        )
+
+    def pick(self, lessons, field, get_requests):
+        requests = [get_requests(lesson) for lesson in lessons]
+        current = [
+            getattr(lesson, field) if self.is_available(
+                getattr(lesson, field), request
+            ) else frozenset()
+            for lesson, request in zip(lessons, requests)
+        ]
+        matched = self.match(requests, current)
+
+        if sum(map(bool, matched)) < sum(map(bool, current)):
+            return current
+
+        return matched
+
+    @staticmethod
+    def is_available(resources, request):
+        count, costs = request
+
+        return len(resources) == count and all(
+            resource in costs for resource in resources
+        )
+
+    def match(self, requests, current):
+        matched = [frozenset()] * len(requests)
+
+        for component in self.split_components(requests):
+            if self.is_saturated(requests, current, component):
+                assigned = dict(
+                    (index, current[index]) for index in component
+                )
+            else:
+                assigned = self.match_component(requests, component)
+
+            for index, resources in assigned.items():
+                matched[index] = frozenset(resources)
+
+        return matched
+
+    @staticmethod
+    def is_saturated(requests, current, component):
+        resources = set()
+        counts = []
+
+        for index in component:
+            count, costs = requests[index]
+            resources.update(costs)
+
+            if len(costs) >= count:
+                counts.append(count)
+
+        available = len(resources)
+        servable = 0
+
+        for count in sorted(counts):
+            if count > available:
+                break
+
+            available -= count
+            servable += 1
+
+        return sum(1 for index in component if current[index]) >= servable
+
+    @staticmethod
+    def split_components(requests):
+        parents = {}
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+
+            return index
+
+        owners = {}
+
+        for index, (count, costs) in enumerate(requests):
+            if not count:
+                continue
+
+            parents[index] = index
+
+            for resource in costs:
+                if resource in owners:
+                    parents[find(index)] = find(owners[resource])
+                else:
+                    owners[resource] = index
+
+        components = defaultdict(list)
+
+        for index in sorted(parents):
+            components[find(index)].append(index)
+
+        return [components[root] for root in sorted(components)]
+
+    def match_component(self, requests, active):
+        active = [
+            index for index in active
+            if len(requests[index][1]) >= requests[index][0]
+        ]
+        matched = self.match_cheapest(requests, active)
+
+        if matched is not None:
+            return matched
+
+        if sum(requests[index][0] for index in active) > self.MAX_ROWS:
+            return self.match_greedy(requests, active)
+
+        while active:
+            assigned = self.solve(requests, active)
+            partial = [
+                (requests[index][0] - len(assigned[index]), index)
+                for index in active
+                if 0 < len(assigned[index]) < requests[index][0]
+            ]
+
+            if not partial:
+                return dict(
+                    (index, resources)
+                    for index, resources in assigned.items() if resources
+                )
+
+            active.remove(max(partial)[1])
+
+        return {}
+
+    @staticmethod
+    def get_cheapest(request, count=None):
+        costs = request[1]
+
+        return sorted(costs, key=lambda resource: (
+            costs[resource], resource
+        ))[0:request[0] if count is None else count]
+
+    def match_cheapest(self, requests, active):
+        matched = {}
+        used = set()
+
+        for index in active:
+            resources = self.get_cheapest(requests[index])
+
+            if used.intersection(resources):
+                return None
+
+            used.update(resources)
+            matched[index] = resources
+
+        return matched
+
+    def match_greedy(self, requests, active):
+        matched = {}
+        used = set()
+
+        for index in sorted(active, key=lambda index: (
+                len(requests[index][1]) - requests[index][0], index)):
+            count, costs = requests[index]
+            resources = self.get_cheapest(
+                (count, dict(
+                    (resource, cost) for resource, cost in costs.items()
+                    if resource not in used
+                ))
+            )
+
+            if len(resources) == count:
+                used.update(resources)
+                matched[index] = resources
+
+        return matched
+
+    def solve(self, requests, active):
+        rows = [
+            index for index in active for _ in range(requests[index][0])
+        ]
+        resources = sorted(set(
+            resource for index in active
+            for resource in self.get_cheapest(requests[index], len(rows))
+        ))
+
+        costs = [
+            [
+                requests[index][1].get(resource, self.FORBIDDEN_COST)
+                for resource in resources
+            ]
+            for index in rows
+        ]
+
+        if len(rows) <= len(resources):
+            columns = solve_assignment(costs)
+        else:
+            columns = [None] * len(rows)
+
+            for column, row in enumerate(solve_assignment(zip(*costs))):
+                columns[row] = column
+
+        assigned = dict((index, set()) for index in active)
+
+        for index, column in zip(rows, columns):
+            if column is not None and resources[column] in requests[index][1]:
+                assigned[index].add(resources[column])
+
+        return assigned
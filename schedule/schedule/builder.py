@@ -1,65 +1,90 @@
-from datetime import timedelta
+from collections import defaultdict
+from datetime import datetime, timedelta
+from uuid import uuid4
 
 from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
 
-from .models import Lesson, Troop
+from .assignment import ResourceAssigner
+from .models import Lesson, Troop, Teacher, BuildCheckpoint, CourseLength
+from .occupancy import OccupancyIndex, TimeSlot, create_occupancy_index
+from .persistence import LessonUnitOfWork, LessonCollector
+from .progress import BuildProgress
+from .snapshot import ScheduleSnapshot, LessonRecord
+from .tracking import DisciplineProgress, ThemeCursor, TeacherLoad
 
 
 class ScheduleBuilder(object):
-    def build(self, date, term_length):
-        for i in range(term_length):
-            troop_list = list(Troop.objects.all())
+    def __init__(self, schedule_build=None):
+        self.schedule_build = schedule_build
+        self.progress = BuildProgress(schedule_build)
 
-            for troop in troop_list:
-                date = date - timedelta(days=date.weekday())
-                date = date + timedelta(days=troop.day)
-                hours = 0
-                themes_today = []
+    def build(self, date, term_length, first_week=0):
+        for week in range(first_week, term_length):
+            self.build_week(date, week)
 
-                while hours != settings.LESSON_HOURS:
-                    disciplines = self.get_disciplines_by_priority(troop)
+            date = date + timedelta(weeks=1)
 
-                    lesson_dependencies = self.find_lesson_dependencies(
-                        disciplines, troop, date, hours
-                    )
+        self.progress.flush()
 
-                    if lesson_dependencies is None:
-                        break
+    def build_week(self, date, week):
+        monday = date - timedelta(days=date.weekday())
 
-                    theme, teachers, audiences = lesson_dependencies
-                    themes_today.append(theme)
+        for troop in self.get_troops():
+            self.build_day(troop, monday + timedelta(days=troop.day))
 
-                    self.create_lesson(
-                        date, troop, hours,
-                        theme, teachers, audiences, theme.duration
-                    )
+    def build_day(self, troop, date):
+        hours = 0
 
-                    hours += theme.duration
+        while hours != self.get_lesson_hours():
+            disciplines = self.get_disciplines_by_priority(troop)
 
-            date = date + timedelta(weeks=1)
+            lesson_dependencies = self.find_lesson_dependencies(
+                disciplines, troop, date, hours
+            )
+
+            if lesson_dependencies is None:
+                break
+
+            theme, teachers, audiences = lesson_dependencies
+
+            self.create_lesson(
+                date, troop, hours,
+                theme, teachers, audiences, theme.duration
+            )
+
+            hours += theme.duration
+
+    def get_troops(self):
+        return list(Troop.objects.all())
+
+    def get_lesson_hours(self):
+        return settings.LESSON_HOURS
 
     def create_lesson(self, date_of, troop, initial_hour,
                       theme, teachers, audiences, delta, self_ed=False):
         lesson = Lesson.objects.create(
             date_of=date_of, initial_hour=initial_hour,
-            troop=troop, theme=theme, self_education=self_ed
+            troop=troop, theme=theme, self_education=self_ed,
+            build=self.schedule_build
         )
 
         lesson.teachers.set(teachers)
         lesson.audiences.set(audiences)
 
-        cache.set(
-            'current_term_load',
-            int(cache.get('current_term_load')) + delta,
-            timeout=None
-        )
+        self.report_progress(troop, theme, delta)
 
         return lesson
 
+    def report_progress(self, troop, theme, delta):
+        self.progress.add(troop.id, theme.discipline_id, delta)
+
+    def get_lessons(self):
+        return Lesson.objects.filter(build=self.schedule_build)
+
     def find_lesson_dependencies(self, disciplines, troop,
                                  date, initial_hour):
-        if disciplines[0][1] == 1:
+        if not disciplines or disciplines[0][1] == 1:
             return None
 
         themes = self.get_sorted_head_themes(
@@ -84,13 +109,13 @@ class ScheduleBuilder(object):
             audiences_not_enough = False
 
             main_teachers = self.find_free_teachers(
-                theme.teachers_main, lessons_in_same_time
+                self.get_main_teachers(theme), lessons_in_same_time
             )
             alternative_teachers = []
 
             if len(main_teachers) < theme.teachers_count:
                 alternative_teachers = self.find_free_teachers(
-                    theme.teachers_alternative, lessons_in_same_time
+                    self.get_alternative_teachers(theme), lessons_in_same_time
                 )
 
             if len(main_teachers) + len(alternative_teachers) < theme.teachers_count:
@@ -110,11 +135,9 @@ class ScheduleBuilder(object):
                 audiences_not_enough = True
 
             if not teachers_not_enough:
-                sorted_main_teachers = self.sort_teachers_by_priority(main_teachers)
-                sorted_alternative_teachers = self.sort_teachers_by_priority(alternative_teachers)
-
-                teachers = (sorted_main_teachers +
-                            sorted_alternative_teachers)[0:theme.teachers_count]
+                teachers = self.pick_teachers(
+                    main_teachers, alternative_teachers, theme.teachers_count
+                )
             else:
                 teachers = []
 
@@ -125,6 +148,20 @@ class ScheduleBuilder(object):
 
             return theme, teachers, audiences
 
+    def pick_teachers(self, main_teachers, alternative_teachers, count):
+        sorted_main_teachers = self.sort_teachers_by_priority(main_teachers)
+        sorted_alternative_teachers = self.sort_teachers_by_priority(
+            alternative_teachers
+        )
+
+        return (sorted_main_teachers + sorted_alternative_teachers)[0:count]
+
+    def get_main_teachers(self, theme):
+        return theme.teachers_main
+
+    def get_alternative_teachers(self, theme):
+        return theme.teachers_alternative
+
     def get_sorted_head_themes(self, themes_with_priority):
         sorted_themes = sorted(
             themes_with_priority,
@@ -143,14 +180,14 @@ class ScheduleBuilder(object):
 
         return [
             theme for theme in themes_with_priority
-            if not (theme[0].duration + initial_hour > settings.LESSON_HOURS)
+            if not (theme[0].duration + initial_hour > self.get_lesson_hours())
             and self.check_prev_themes(theme[0], troop)
         ]
 
     def calc_teacher_ratio(self, teacher):
         hours = 0
 
-        for lesson in teacher.lessons.all():
+        for lesson in self.get_lessons().filter(teachers=teacher):
             hours += lesson.theme.duration
 
         return float(hours) / float(teacher.work_hours_limit)
@@ -167,23 +204,23 @@ class ScheduleBuilder(object):
 
     def get_disciplines_by_priority(self, troop):
         with_ratio = []
+        course_lengths = CourseLength.get_troop_lengths(troop)
+
         for discipline in troop.specialty.disciplines.all():
             hours = 0
 
             for theme in discipline.themes.filter(term=troop.term):
-                if Lesson.objects.filter(
+                if self.get_lessons().filter(
                         troop=troop, theme=theme, self_education=False
                 ).exists():
                     hours += theme.duration
 
-                if Lesson.objects.filter(
+                if self.get_lessons().filter(
                         troop=troop, theme=theme, self_education=True
                 ).exists():
                     hours += theme.self_education_hours
 
-            course_length = discipline.calc_course_length(
-                troop.term, troop.specialty
-            )
+            course_length = course_lengths.get(discipline.id)
             if not course_length:
                 continue
 
@@ -199,13 +236,13 @@ class ScheduleBuilder(object):
         return sorted(with_ratio, key=lambda tup: tup[1])
 
     def get_next_theme(self, discipline, troop):
-        themes = discipline.themes.filter(term=troop.term)
-        sorted_by_number = sorted(
-            themes, key=lambda theme: float(theme.number)
+        themes = discipline.themes.filter(term=troop.term).order_by(
+            'sort_key', 'id'
         )
 
-        for theme in sorted_by_number:
-            if not Lesson.objects.filter(troop=troop, theme=theme).exists():
+        for theme in themes:
+            if not self.get_lessons().filter(
+                    troop=troop, theme=theme).exists():
                 return theme
 
     def check_prev_themes(self, theme, troop):
@@ -213,7 +250,7 @@ class ScheduleBuilder(object):
             return True
 
         for previous_theme in theme.previous_themes.all():
-            if not Lesson.objects.filter(
+            if not self.get_lessons().filter(
                     troop=troop, theme=previous_theme
             ).exists():
                 return False
@@ -221,19 +258,10 @@ class ScheduleBuilder(object):
         return True
 
     def get_lessons_in_same_time(self, theme, troop, date, initial_hour):
-        in_same_time = []
-
-        time_line = set(range(initial_hour, initial_hour + theme.duration))
-        in_same_day = Lesson.objects.filter(date_of=date).exclude(troop=troop)
-
-        for lesson in in_same_day:
-            end_hour = lesson.initial_hour + lesson.theme.duration
-            current_time_line = set(range(lesson.initial_hour + 1, end_hour))
-
-            if len(time_line & current_time_line):
-                in_same_time.append(lesson)
-
-        return in_same_time
+        return list(self.get_lessons().filter(
+            date_of=date, initial_hour__lt=initial_hour + theme.duration,
+            end_hour__gt=initial_hour
+        ).exclude(troop=troop).select_related('theme').order_by('id'))
 
     def is_theme_parallel(self, theme, lessons_in_same_time):
         return theme in [lesson.theme for lesson in lessons_in_same_time]
@@ -269,3 +297,342 @@ class ScheduleBuilder(object):
                 free_teachers.append(teacher)
 
         return free_teachers
+
+
+class SnapshotScheduleBuilder(ScheduleBuilder):
+    def __init__(self, snapshot=None, unit_of_work=None, days=None,
+                 checkpoint_key=None, troops=None, start_date=None,
+                 schedule_build=None):
+        super(SnapshotScheduleBuilder, self).__init__(schedule_build)
+
+        self.snapshot = snapshot
+        self.unit_of_work = unit_of_work or LessonUnitOfWork(schedule_build)
+        self.days = days
+        self.troops = troops
+        self.start_date = start_date
+        self.checkpoint_key = checkpoint_key
+        self.checkpoint = None
+
+        self.occupancy = create_occupancy_index()
+        self.troop_themes = defaultdict(set)
+        self.disciplines_progress = {}
+        self.theme_cursors = {}
+        self.completed_themes = defaultdict(int)
+        self.teacher_load = None
+
+    def build(self, date, term_length, first_week=0):
+        self.checkpoint = self.lock_checkpoint()
+
+        try:
+            self.prepare()
+
+            if isinstance(date, datetime):
+                date = date.date()
+
+            if self.checkpoint is not None and \
+                    self.checkpoint.week is not None:
+                first_week = self.checkpoint.week + 1
+                date = self.checkpoint.date_of + timedelta(weeks=1)
+
+                BuildProgress.reset_from_lessons(
+                    [troop.id for troop in self.snapshot.troops],
+                    self.snapshot.disciplines, self.snapshot.lessons,
+                    self.schedule_build
+                )
+
+            super(SnapshotScheduleBuilder, self).build(
+                date, term_length, first_week
+            )
+        except Exception:
+            if self.checkpoint is not None:
+                self.checkpoint.unlock()
+
+            raise
+
+        if self.checkpoint is not None:
+            self.checkpoint.release()
+
+    def lock_checkpoint(self):
+        if self.checkpoint_key is None:
+            return None
+
+        return BuildCheckpoint.lock(
+            self.checkpoint_key, uuid4().hex, self.schedule_build
+        )
+
+    def save_checkpoint(self, date, week):
+        if self.checkpoint is not None:
+            self.checkpoint.save_week(date, week)
+
+    def prepare(self):
+        if self.snapshot is None:
+            self.snapshot = ScheduleSnapshot.load(self.schedule_build)
+
+        if self.teacher_load is None:
+            self.teacher_load = TeacherLoad.load(
+                self.snapshot.teachers, self.schedule_build
+            )
+
+        for lesson in self.snapshot.lessons:
+            self.register_lesson(lesson)
+
+    def get_troops(self):
+        return [
+            troop for troop in self.snapshot.troops
+            if (self.days is None or troop.day in self.days) and
+            (self.troops is None or troop.id in self.troops)
+        ]
+
+    def build_day(self, troop, date):
+        if self.start_date is not None and date < self.start_date:
+            return
+
+        super(SnapshotScheduleBuilder, self).build_day(troop, date)
+
+    def build_week(self, date, week):
+        super(SnapshotScheduleBuilder, self).build_week(date, week)
+
+        self.commit_week(date, week)
+
+    def commit_week(self, date, week):
+        self.assign_resources()
+        self.progress.flush()
+
+        with transaction.atomic():
+            self.save_checkpoint(date, week)
+            self.unit_of_work.flush()
+
+    def assign_resources(self):
+        if settings.RESOURCE_ASSIGNMENT != 'matching':
+            return
+
+        assigner = ResourceAssigner(
+            self.snapshot, self.occupancy, self.teacher_load
+        )
+        self.unit_of_work.pending = assigner.assign(self.unit_of_work.pending)
+
+    def create_lesson(self, date_of, troop, initial_hour,
+                      theme, teachers, audiences, delta, self_ed=False):
+        lesson = LessonRecord(
+            date_of, initial_hour, troop, theme,
+            frozenset(teacher.id for teacher in teachers),
+            frozenset(audience.id for audience in audiences),
+            self_ed
+        )
+
+        self.register_lesson(lesson)
+        self.teacher_load.add_lesson(lesson)
+        self.unit_of_work.add(lesson)
+
+        self.report_progress(troop, theme, delta)
+
+        return lesson
+
+    def register_lesson(self, lesson):
+        self.occupancy.add_lesson(lesson)
+        self.register_progress(lesson)
+
+    def register_progress(self, lesson):
+        troop, theme = lesson.troop, lesson.theme
+        scheduled = self.troop_themes[troop.id]
+
+        if (theme.id, lesson.self_education) in scheduled:
+            return
+
+        scheduled.add((theme.id, lesson.self_education))
+        self.completed_themes[troop.id] |= \
+            self.snapshot.prerequisites.get_bit(theme.id)
+
+        if theme.term != troop.term:
+            return
+
+        if lesson.self_education:
+            hours = theme.self_education_hours
+        else:
+            hours = theme.duration
+
+        self.get_discipline_progress(troop).add(theme.discipline_id, hours)
+
+    def get_discipline_progress(self, troop):
+        if troop.id not in self.disciplines_progress:
+            disciplines = self.snapshot.specialty_disciplines[
+                troop.specialty_id
+            ]
+            course_lengths = dict(
+                (discipline.id, self.snapshot.calc_course_length(
+                    discipline, troop.term, troop.specialty
+                ))
+                for discipline in disciplines
+            )
+
+            self.disciplines_progress[troop.id] = DisciplineProgress(
+                disciplines, course_lengths
+            )
+
+        return self.disciplines_progress[troop.id]
+
+    def is_theme_scheduled(self, theme, troop, self_ed=None):
+        scheduled = self.troop_themes[troop.id]
+
+        if self_ed is None:
+            return (theme.id, False) in scheduled \
+                or (theme.id, True) in scheduled
+
+        return (theme.id, self_ed) in scheduled
+
+    def get_main_teachers(self, theme):
+        return self.snapshot.main_teachers[theme.id]
+
+    def get_alternative_teachers(self, theme):
+        return self.snapshot.alternative_teachers[theme.id]
+
+    def calc_teacher_ratio(self, teacher):
+        return self.teacher_load.get_ratio(teacher.id)
+
+    def sort_teachers_by_priority(self, teachers):
+        return self.teacher_load.sort(teachers)
+
+    def pick_teachers(self, main_teachers, alternative_teachers, count):
+        teachers = self.teacher_load.get_least_loaded(main_teachers, count)
+
+        if len(teachers) < count:
+            teachers += self.teacher_load.get_least_loaded(
+                alternative_teachers, count - len(teachers)
+            )
+
+        return teachers
+
+    def get_disciplines_by_priority(self, troop):
+        return self.get_discipline_progress(troop).get_ordered()
+
+    def get_next_theme(self, discipline, troop):
+        key = (troop.id, discipline.id)
+
+        if key not in self.theme_cursors:
+            self.theme_cursors[key] = ThemeCursor(
+                self.snapshot.get_ordered_themes(discipline, troop.term)
+            )
+
+        return self.theme_cursors[key].get_next(
+            lambda theme: self.is_theme_scheduled(theme, troop)
+        )
+
+    def check_prev_themes(self, theme, troop):
+        return self.snapshot.prerequisites.is_ready(
+            theme.id, self.completed_themes[troop.id]
+        )
+
+    def get_lessons_in_same_time(self, theme, troop, date, initial_hour):
+        return TimeSlot(date, initial_hour, theme.duration)
+
+    def is_theme_parallel(self, theme, slot):
+        return not self.occupancy.is_free(
+            slot, OccupancyIndex.THEME, theme.id
+        )
+
+    def is_audience_free(self, required_audience, slot):
+        return self.occupancy.is_free(
+            slot, OccupancyIndex.AUDIENCE, required_audience.id
+        )
+
+    def find_free_audiences(self, theme, slot):
+        return self.occupancy.find_free(
+            slot, OccupancyIndex.AUDIENCE,
+            self.snapshot.theme_audiences[theme.id]
+        )
+
+    def is_teacher_free(self, required_teacher, slot):
+        return self.occupancy.is_free(
+            slot, OccupancyIndex.TEACHER, required_teacher.id
+        )
+
+    def find_free_teachers(self, teachers, slot):
+        return self.occupancy.find_free(slot, OccupancyIndex.TEACHER, teachers)
+
+
+class DryRunScheduleBuilder(SnapshotScheduleBuilder):
+    def __init__(self, snapshot=None, overrides=None):
+        super(DryRunScheduleBuilder, self).__init__(
+            snapshot, unit_of_work=LessonCollector()
+        )
+        self.overrides = overrides or {}
+
+    def prepare(self):
+        if self.snapshot is None:
+            self.snapshot = ScheduleSnapshot.load(with_lessons=False)
+
+        self.teacher_load = TeacherLoad(self.snapshot.teachers)
+
+        for lesson in self.snapshot.lessons:
+            self.teacher_load.add_lesson(lesson)
+
+        self.apply_overrides()
+
+        super(DryRunScheduleBuilder, self).prepare()
+
+    def apply_overrides(self):
+        for troop_id, day in self.overrides.get('troop_days', []):
+            self.snapshot.troops_by_id[troop_id].day = day
+
+        for index, struct in enumerate(self.overrides.get('teachers', [])):
+            teacher = Teacher(
+                id=-(index + 1), name=struct.get('name', ''),
+                work_hours_limit=struct['work_hours_limit']
+            )
+            self.snapshot.teachers[teacher.id] = teacher
+
+            for theme_id in struct.get('themes_main', []):
+                self.snapshot.main_teachers[theme_id].append(teacher)
+
+            for theme_id in struct.get('themes_alternative', []):
+                self.snapshot.alternative_teachers[theme_id].append(teacher)
+
+    def get_lesson_hours(self):
+        return self.overrides.get('lesson_hours') or \
+            super(DryRunScheduleBuilder, self).get_lesson_hours()
+
+    def report_progress(self, troop, theme, delta):
+        pass
+
+    def commit_week(self, date, week):
+        self.assign_resources()
+        self.unit_of_work.flush()
+
+    def calc_total_term_load(self):
+        total = 0
+
+        for troop in self.snapshot.troops:
+            for discipline in self.snapshot.specialty_disciplines[
+                    troop.specialty_id]:
+                total += self.snapshot.calc_course_length(
+                    discipline, troop.term, troop.specialty
+                )
+
+        return total
+
+    def get_summary(self):
+        lessons = self.unit_of_work.lessons
+        total_term_load = self.calc_total_term_load()
+
+        scheduled_hours = sum(
+            lesson.theme.duration
+            for lesson in self.snapshot.lessons + lessons
+        )
+        teachers_ratio = [
+            self.teacher_load.get_ratio(teacher_id)
+            for teacher_id in self.snapshot.teachers
+        ]
+
+        return {
+            'lessons': len(lessons),
+            'hours': sum(lesson.theme.duration for lesson in lessons),
+            'without_teachers': len(
+                [lesson for lesson in lessons if not lesson.teachers]
+            ),
+            'without_audiences': len(
+                [lesson for lesson in lessons if not lesson.audiences]
+            ),
+            'progress': float(scheduled_hours) / float(total_term_load)
+            if total_term_load else 1.0,
+            'max_teacher_load': max(teachers_ratio) if teachers_ratio else 0
+        }
@@ -0,0 +1,291 @@
+from django_redis import get_redis_connection
+
+from .builder import SnapshotScheduleBuilder
+from .occupancy import OccupancyIndex, TimeSlot
+
+
+class LocalReservationStore(object):
+    namespaces = {}
+    journals = {}
+
+    def __init__(self, namespace, owner=None):
+        self.namespace = namespace
+        self.owner = owner
+        self.reservations = self.namespaces.setdefault(namespace, {})
+        self.claims = self.journals.setdefault((namespace, owner), {})
+
+    @staticmethod
+    def get_field(slot, kind, key):
+        return '%s:%s:%s' % (slot.date_of.strftime('%Y-%m-%d'), kind, key)
+
+    @staticmethod
+    def get_mask(slot):
+        return OccupancyIndex.get_mask(slot.initial_hour, slot.duration)
+
+    def get_reserved(self, slot, kind, key):
+        return self.reservations.get(self.get_field(slot, kind, key), 0)
+
+    def is_free(self, slot, kind, key):
+        return not self.get_reserved(slot, kind, key) & self.get_mask(slot)
+
+    def reserve(self, slot, kind, key):
+        field, mask = self.get_field(slot, kind, key), self.get_mask(slot)
+        reserved = self.reservations.get(field, 0)
+
+        if reserved & mask:
+            return False
+
+        self.reservations[field] = reserved | mask
+        self.claims[field] = self.claims.get(field, 0) | mask
+
+        return True
+
+    def release(self, slot, kind, key):
+        field, mask = self.get_field(slot, kind, key), self.get_mask(slot)
+        self.reservations[field] = self.reservations.get(field, 0) & ~mask
+        self.claims[field] = self.claims.get(field, 0) & ~mask
+
+    def commit(self):
+        self.claims.clear()
+
+    def rollback(self):
+        for field, mask in self.claims.items():
+            self.reservations[field] = self.reservations.get(field, 0) & ~mask
+
+        self.claims.clear()
+
+    def clear(self):
+        self.namespaces.pop(self.namespace, None)
+
+        for key in list(self.journals):
+            if key[0] == self.namespace:
+                del self.journals[key]
+
+
+class RedisReservationStore(LocalReservationStore):
+    KEY = 'schedule:reservations:{%s}'
+    CLAIMS_KEY = 'schedule:reservations:{%s}:claims:%s'
+    TIMEOUT = 60 * 60 * 24
+
+    RESERVE_SCRIPT = """
+        local reserved = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+        local claimed = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+        local mask = tonumber(ARGV[2])
+
+        if bit.band(reserved, mask) ~= 0 then
+            return 0
+        end
+
+        redis.call('HSET', KEYS[1], ARGV[1], bit.bor(reserved, mask))
+        redis.call('HSET', KEYS[2], ARGV[1], bit.bor(claimed, mask))
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        redis.call('EXPIRE', KEYS[2], ARGV[3])
+
+        return 1
+    """
+
+    RELEASE_SCRIPT = """
+        local reserved = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+        local claimed = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+        local mask = bit.bnot(tonumber(ARGV[2]))
+
+        redis.call('HSET', KEYS[1], ARGV[1], bit.band(reserved, mask))
+        redis.call('HSET', KEYS[2], ARGV[1], bit.band(claimed, mask))
+
+        return 1
+    """
+
+    ROLLBACK_SCRIPT = """
+        local claims = redis.call('HGETALL', KEYS[2])
+
+        for i = 1, #claims, 2 do
+            local reserved = tonumber(
+                redis.call('HGET', KEYS[1], claims[i]) or '0'
+            )
+            local mask = bit.bnot(tonumber(claims[i + 1]))
+
+            redis.call('HSET', KEYS[1], claims[i], bit.band(reserved, mask))
+        end
+
+        redis.call('DEL', KEYS[2])
+
+        return #claims / 2
+    """
+
+    def __init__(self, namespace, client, owner=None):
+        self.namespace = namespace
+        self.owner = owner
+        self.client = client
+        self.key = self.KEY % namespace
+        self.claims_key = self.CLAIMS_KEY % (namespace, owner)
+
+        self.reserve_script = client.register_script(self.RESERVE_SCRIPT)
+        self.release_script = client.register_script(self.RELEASE_SCRIPT)
+        self.rollback_script = client.register_script(self.ROLLBACK_SCRIPT)
+
+    def get_reserved(self, slot, kind, key):
+        return int(
+            self.client.hget(self.key, self.get_field(slot, kind, key)) or 0
+        )
+
+    def reserve(self, slot, kind, key):
+        return bool(self.reserve_script(
+            keys=[self.key, self.claims_key], args=[
+                self.get_field(slot, kind, key), self.get_mask(slot),
+                self.TIMEOUT
+            ]
+        ))
+
+    def release(self, slot, kind, key):
+        self.release_script(keys=[self.key, self.claims_key], args=[
+            self.get_field(slot, kind, key), self.get_mask(slot)
+        ])
+
+    def commit(self):
+        self.client.delete(self.claims_key)
+
+    def rollback(self):
+        self.rollback_script(keys=[self.key, self.claims_key], args=[])
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+def get_reservation_store(namespace, owner=None):
+    try:
+        client = get_redis_connection('default')
+    except NotImplementedError:
+        return LocalReservationStore(namespace, owner)
+
+    return RedisReservationStore(namespace, client, owner)
+
+
+def split_troops(troops, shards):
+    size, rest = divmod(len(troops), shards)
+    chunks = []
+    start = 0
+
+    for shard in range(shards):
+        end = start + size + (1 if shard < rest else 0)
+
+        if end > start:
+            chunks.append(troops[start:end])
+
+        start = end
+
+    return chunks
+
+
+class DistributedScheduleBuilder(SnapshotScheduleBuilder):
+    def __init__(self, reservations, *args, **kwargs):
+        super(DistributedScheduleBuilder, self).__init__(*args, **kwargs)
+
+        self.reservations = reservations
+
+    def prepare(self):
+        self.reservations.rollback()
+
+        super(DistributedScheduleBuilder, self).prepare()
+
+        self.restore_reservations()
+
+    def restore_reservations(self):
+        for lesson in self.snapshot.lessons:
+            if self.troops is not None and lesson.troop.id not in self.troops:
+                continue
+
+            slot = TimeSlot(
+                lesson.date_of, lesson.initial_hour, lesson.theme.duration
+            )
+
+            # Claims of committed weeks are normally still held, so a failed
+            # reserve here only means the claim survived the restart.
+            for kind, key in OccupancyIndex.get_lesson_keys(lesson):
+                self.reservations.reserve(slot, kind, key)
+
+        self.reservations.commit()
+
+    def commit_week(self, date, week):
+        super(DistributedScheduleBuilder, self).commit_week(date, week)
+
+        self.reservations.commit()
+
+    def assign_resources(self):
+        pass
+
+    def find_lesson_dependencies(self, disciplines, troop,
+                                 date, initial_hour):
+        while True:
+            dependencies = super(
+                DistributedScheduleBuilder, self
+            ).find_lesson_dependencies(disciplines, troop, date, initial_hour)
+
+            if dependencies is None:
+                return None
+
+            theme = dependencies[0]
+            slot = TimeSlot(date, initial_hour, theme.duration)
+
+            if self.reservations.reserve(slot, OccupancyIndex.THEME, theme.id):
+                return dependencies
+
+            if super(DistributedScheduleBuilder, self).is_theme_parallel(
+                    theme, slot):
+                return dependencies
+
+            self.occupancy.occupy(slot, OccupancyIndex.THEME, theme.id)
+
+    def is_theme_parallel(self, theme, slot):
+        return super(DistributedScheduleBuilder, self).is_theme_parallel(
+            theme, slot
+        ) or not self.reservations.is_free(
+            slot, OccupancyIndex.THEME, theme.id
+        )
+
+    def create_lesson(self, date_of, troop, initial_hour,
+                      theme, teachers, audiences, delta, self_ed=False):
+        slot = TimeSlot(date_of, initial_hour, theme.duration)
+
+        if teachers:
+            main_teachers = self.get_main_teachers(theme)
+            alternative_teachers = self.get_alternative_teachers(theme)
+
+            teachers = self.reserve(
+                slot, OccupancyIndex.TEACHER, teachers, self.pick_teachers(
+                    self.find_free_teachers(main_teachers, slot),
+                    self.find_free_teachers(alternative_teachers, slot),
+                    len(main_teachers) + len(alternative_teachers)
+                ), theme.teachers_count
+            )
+
+        if audiences:
+            audiences = self.reserve(
+                slot, OccupancyIndex.AUDIENCE, audiences,
+                self.find_free_audiences(theme, slot), theme.audiences_count
+            )
+
+        return super(DistributedScheduleBuilder, self).create_lesson(
+            date_of, troop, initial_hour, theme, teachers, audiences, delta,
+            self_ed
+        )
+
+    def reserve(self, slot, kind, chosen, candidates, count):
+        reserved = []
+
+        for item in chosen + [item for item in candidates
+                              if item not in chosen]:
+            if len(reserved) == count:
+                break
+
+            if self.reservations.reserve(slot, kind, item.id):
+                reserved.append(item)
+            else:
+                self.occupancy.occupy(slot, kind, item.id)
+
+        if len(reserved) < count:
+            for item in reserved:
+                self.reservations.release(slot, kind, item.id)
+
+            return []
+
+        return reserved
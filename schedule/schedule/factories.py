@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 from django.utils.timezone import now
 
 from .models import Specialty, Troop, Discipline, Theme, Teacher, Audience, \
-    Lesson, ThemeType
+    Lesson, ThemeType, ScheduleBuild
 
 
 class SpecialtyFactory(factory.DjangoModelFactory):
@@ -76,6 +76,14 @@ class AudienceFactory(factory.DjangoModelFactory):
     location = factory.Faker('word')
 
 
+class ScheduleBuildFactory(factory.DjangoModelFactory):
+    class Meta:
+        model = ScheduleBuild
+
+    start_date = now()
+    term_length = 18
+
+
 class LessonFactory(factory.DjangoModelFactory):
     class Meta:
         model = Lesson
@@ -0,0 +1,240 @@
+import itertools
+import json
+import os
+import resource
+import traceback
+from datetime import date
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...builder import ScheduleBuilder, SnapshotScheduleBuilder
+from ...models import Lesson
+from ...persistence import clear_lessons
+from ...profiling import BuildProfiler
+from ...progress import BuildProgress
+from ...solver import PropagationScheduleBuilder
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the schedule builder on synthetic datasets'
+
+    BUILDERS = {
+        'orm': ScheduleBuilder,
+        'snapshot': SnapshotScheduleBuilder,
+        'propagation': PropagationScheduleBuilder
+    }
+
+    TOLERANCES = {
+        'time': 0.5,
+        'queries': 0,
+        'memory': 1024
+    }
+
+    BASELINE = os.path.normpath(os.path.join(
+        os.path.dirname(__file__), '..', '..', 'benchmarks', 'baseline.json'
+    ))
+
+    START_DATE = date(2017, 9, 4)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--builder', choices=sorted(self.BUILDERS), default='snapshot'
+        )
+        parser.add_argument(
+            '--troops', type=int, nargs='+', default=[8, 16, 32],
+            help='Troops per specialty and term'
+        )
+        parser.add_argument(
+            '--themes', type=int, nargs='+', default=[10, 20],
+            help='Themes per discipline and term'
+        )
+        parser.add_argument(
+            '--weeks', type=int, nargs='+', default=[8, 16]
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Runs per case, the fastest one is reported'
+        )
+        parser.add_argument('--baseline', default=self.BASELINE)
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed relative slowdown against the baseline'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Store the results as the new baseline'
+        )
+        parser.add_argument(
+            '--output', help='Write the results as JSON to the given file'
+        )
+
+    def handle(self, *args, **options):
+        builder = options['builder']
+        cases = sorted(itertools.product(
+            options['troops'], options['themes'], options['weeks']
+        ))
+
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            results = dict(
+                (self.get_case_name(*case), self.run_best(
+                    options['repeat'], builder, *case, seed=options['seed']
+                ))
+                for case in cases
+            )
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+
+        baseline = self.load_baseline(options['baseline'])
+
+        for case in cases:
+            name = self.get_case_name(*case)
+            self.stdout.write(self.format_result(name, results[name]))
+
+        if options['output']:
+            self.dump(options['output'], results)
+
+        if options['save']:
+            baseline.setdefault(builder, {}).update(results)
+            self.dump(options['baseline'], baseline)
+
+            return
+
+        regressions = self.compare(
+            results, baseline.get(builder, {}), options['threshold']
+        )
+
+        if regressions:
+            raise CommandError(
+                'Regressions found:\n%s' % '\n'.join(regressions)
+            )
+
+    @staticmethod
+    def get_case_name(troops, themes, weeks):
+        return 'troops=%i themes=%i weeks=%i' % (troops, themes, weeks)
+
+    @staticmethod
+    def reset_peak_memory():
+        # A forked case inherits the peak RSS of the command, so the peak is
+        # reset to the current RSS (Linux only) before the case is measured.
+        try:
+            with open('/proc/self/clear_refs', 'w') as clear_refs:
+                clear_refs.write('5')
+        except IOError:
+            pass
+
+    @staticmethod
+    def get_peak_memory():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def run_best(self, repeat, builder, troops, themes, weeks, seed=0):
+        self.generate_dataset(troops, themes, seed)
+
+        runs = [self.run_isolated(builder, weeks) for _ in range(repeat)]
+
+        return min(runs, key=lambda run: run['time'])
+
+    def run_isolated(self, *args, **kwargs):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+
+        if not pid:
+            os.close(read_fd)
+            code = 0
+
+            try:
+                result = self.run_case(*args, **kwargs)
+
+                with os.fdopen(write_fd, 'w') as pipe:
+                    json.dump(result, pipe)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+
+            os._exit(code)
+
+        os.close(write_fd)
+
+        with os.fdopen(read_fd) as pipe:
+            output = pipe.read()
+
+        _, status = os.waitpid(pid, 0)
+
+        if status:
+            raise CommandError('Benchmark case failed: %r' % (args,))
+
+        return json.loads(output)
+
+    @staticmethod
+    def generate_dataset(troops, themes, seed=0):
+        call_command(
+            'generate_dataset', preset='small', troops=troops,
+            themes=themes, seed=seed, clear=True, stdout=StringIO()
+        )
+
+    def run_case(self, builder, weeks):
+        clear_lessons()
+        BuildProgress.reset_from_database()
+
+        profiler = BuildProfiler()
+        self.reset_peak_memory()
+        memory = self.get_peak_memory()
+
+        profiler.instrument(self.BUILDERS[builder]()).build(
+            self.START_DATE, weeks
+        )
+
+        report = profiler.get_report()
+        lessons = Lesson.objects.count()
+
+        return {
+            'time': report['time'],
+            'queries': report['queries'],
+            'memory': self.get_peak_memory() - memory,
+            'lessons': lessons,
+            'lessons_per_second': lessons / report['time']
+        }
+
+    def compare(self, results, baseline, threshold):
+        regressions = []
+
+        for name, result in sorted(results.items()):
+            if name not in baseline:
+                continue
+
+            for metric, tolerance in sorted(self.TOLERANCES.items()):
+                expected = baseline[name][metric]
+                limit = max(expected * (1 + threshold), expected + tolerance)
+
+                if result[metric] > limit:
+                    regressions.append('%s %s: %s > %s' % (
+                        name, metric, result[metric], expected
+                    ))
+
+        return regressions
+
+    @staticmethod
+    def format_result(name, result):
+        return '%s: %.3fs, %i queries, %i KB, %i lessons, %.1f lessons/s' % (
+            name, result['time'], result['queries'], result['memory'],
+            result['lessons'], result['lessons_per_second']
+        )
+
+    @staticmethod
+    def load_baseline(path):
+        if not os.path.exists(path):
+            return {}
+
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+
+    @staticmethod
+    def dump(path, results):
+        with open(path, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
@@ -0,0 +1,310 @@
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from ...models import Specialty, Troop, Discipline, ThemeType, Theme, \
+    Teacher, Audience, TeacherTheme, BuildCheckpoint, ScheduleBuild, \
+    CourseLength
+from ...persistence import clear_lessons
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic curriculum of the given scale'
+
+    PRESETS = {
+        'small': {
+            'specialties': 2,
+            'terms': 2,
+            'troops': 3,
+            'disciplines': 6,
+            'specialty_disciplines': 4,
+            'themes': 10,
+            'teachers': 20,
+            'audiences': 10
+        },
+        'medium': {
+            'specialties': 5,
+            'terms': 4,
+            'troops': 5,
+            'disciplines': 20,
+            'specialty_disciplines': 8,
+            'themes': 20,
+            'teachers': 100,
+            'audiences': 40
+        },
+        'large': {
+            'specialties': 10,
+            'terms': 8,
+            'troops': 6,
+            'disciplines': 60,
+            'specialty_disciplines': 12,
+            'themes': 30,
+            'teachers': 400,
+            'audiences': 150
+        }
+    }
+
+    THEME_TYPES = [
+        ('Lecture', 'L'),
+        ('Seminar', 'S'),
+        ('Practice', 'P'),
+        ('Test', 'T')
+    ]
+
+    MODELS = [
+        Specialty, Troop, Discipline, ThemeType, Theme, Teacher, Audience,
+        TeacherTheme
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--preset', choices=sorted(self.PRESETS), default='small'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--troops', type=int,
+            help='Troops per specialty and term, overrides the preset'
+        )
+        parser.add_argument(
+            '--themes', type=int,
+            help='Themes per discipline and term, overrides the preset'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the existing curriculum and schedule first'
+        )
+
+    def handle(self, *args, **options):
+        self.random = Random(options['seed'])
+        self.scale = dict(self.PRESETS[options['preset']])
+        self.next_ids = {}
+
+        for key in ['troops', 'themes']:
+            if options.get(key):
+                self.scale[key] = options[key]
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+
+            counts = self.generate()
+
+        self.reset_sequences()
+
+        for name, count in counts:
+            self.stdout.write('%s: %i' % (name, count))
+
+    def clear(self):
+        BuildCheckpoint.objects.all().delete()
+        clear_lessons()
+        ScheduleBuild.objects.all().delete()
+        CourseLength.objects.all().delete()
+        Theme.specialties.through.objects.all().delete()
+
+        for model in reversed(self.MODELS):
+            model.objects.all().delete()
+
+    def allocate_id(self, model):
+        if model not in self.next_ids:
+            last_id = model.objects.aggregate(Max('id'))['id__max'] or 0
+            self.next_ids[model] = last_id + 1
+
+        allocated = self.next_ids[model]
+        self.next_ids[model] += 1
+
+        return allocated
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), self.MODELS + [
+                Theme.audiences.through, Theme.specialties.through,
+                Theme.previous_themes.through
+            ]
+        )
+
+        if not statements:
+            return
+
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def generate(self):
+        scale = self.scale
+
+        specialties = [
+            Specialty(id=self.allocate_id(Specialty), code='SP-%02i' % index)
+            for index in range(scale['specialties'])
+        ]
+        disciplines = [
+            Discipline(
+                id=self.allocate_id(Discipline),
+                full_name='Discipline %i' % index,
+                short_name='D%i' % index
+            )
+            for index in range(scale['disciplines'])
+        ]
+        theme_types = [
+            ThemeType(id=self.allocate_id(ThemeType), name=name,
+                      short_name=short_name)
+            for name, short_name in self.THEME_TYPES
+        ]
+        teachers = [
+            Teacher(
+                id=self.allocate_id(Teacher), name='Teacher %i' % index,
+                military_rank='Officer',
+                work_hours_limit=self.random.choice([600, 700, 800, 900])
+            )
+            for index in range(scale['teachers'])
+        ]
+        audiences = [
+            Audience(
+                id=self.allocate_id(Audience),
+                description='Audience %i' % index,
+                location='%i-%02i' % (index // 20 + 1, index % 20 + 1)
+            )
+            for index in range(scale['audiences'])
+        ]
+
+        troops = []
+
+        for specialty in specialties:
+            for term in range(1, scale['terms'] + 1):
+                for index in range(scale['troops']):
+                    troops.append(Troop(
+                        id=self.allocate_id(Troop),
+                        code='%s-%i%02i' % (specialty.code, term, index + 1),
+                        day=self.random.randint(0, 4), term=term,
+                        specialty_id=specialty.id
+                    ))
+
+        discipline_specialties = dict(
+            (discipline.id, []) for discipline in disciplines
+        )
+
+        for specialty in specialties:
+            for discipline in self.random.sample(
+                    disciplines, scale['specialty_disciplines']):
+                discipline_specialties[discipline.id].append(specialty.id)
+
+        themes = []
+        teacher_themes = []
+        theme_audiences = []
+        theme_specialties = []
+        previous_themes = []
+
+        for discipline in disciplines:
+            specialties_ids = discipline_specialties[discipline.id]
+
+            if not specialties_ids:
+                continue
+
+            teachers_pool = self.random.sample(teachers, 5)
+            audiences_pool = self.random.sample(audiences, 3)
+
+            for term in range(1, scale['terms'] + 1):
+                term_themes = self.generate_themes(
+                    discipline, term, theme_types
+                )
+
+                for index, theme in enumerate(term_themes):
+                    main = self.random.sample(
+                        teachers_pool, theme.teachers_count + 1
+                    )
+                    alternative = [
+                        teacher for teacher in teachers_pool
+                        if teacher not in main
+                    ][0:1]
+
+                    for teacher in main:
+                        teacher_themes.append(TeacherTheme(
+                            id=self.allocate_id(TeacherTheme),
+                            teacher_id=teacher.id, theme_id=theme.id
+                        ))
+
+                    for teacher in alternative:
+                        teacher_themes.append(TeacherTheme(
+                            id=self.allocate_id(TeacherTheme),
+                            teacher_id=teacher.id, theme_id=theme.id,
+                            alternative=True
+                        ))
+
+                    for audience in self.random.sample(audiences_pool, 2):
+                        theme_audiences.append(Theme.audiences.through(
+                            theme_id=theme.id, audience_id=audience.id
+                        ))
+
+                    for specialty_id in specialties_ids:
+                        theme_specialties.append(Theme.specialties.through(
+                            theme_id=theme.id, specialty_id=specialty_id
+                        ))
+
+                    for previous in self.pick_previous_themes(
+                            term_themes[0:index]):
+                        previous_themes.append(
+                            Theme.previous_themes.through(
+                                from_theme_id=theme.id,
+                                to_theme_id=previous.id
+                            )
+                        )
+
+                themes.extend(term_themes)
+
+        rows = [
+            ('specialties', specialties),
+            ('disciplines', disciplines),
+            ('theme types', theme_types),
+            ('teachers', teachers),
+            ('audiences', audiences),
+            ('troops', troops),
+            ('themes', themes),
+            ('theme teachers', teacher_themes),
+            ('theme audiences', theme_audiences),
+            ('theme specialties', theme_specialties),
+            ('previous themes', previous_themes)
+        ]
+
+        for name, objects in rows:
+            if objects:
+                type(objects[0]).objects.bulk_create(objects)
+
+        CourseLength.refresh()
+
+        return [(name, len(objects)) for name, objects in rows]
+
+    def generate_themes(self, discipline, term, theme_types):
+        themes = []
+
+        for index in range(self.scale['themes']):
+            number = str(index + 1)
+
+            themes.append(Theme(
+                id=self.allocate_id(Theme),
+                name='%s theme %i.%i' % (discipline.short_name, term,
+                                         index + 1),
+                number=number,
+                sort_key=Theme.parse_number(number),
+                term=term,
+                self_education_hours=self.random.choice([0, 0, 1, 2]),
+                duration=self.random.choice([1, 2, 2, 4]),
+                audiences_count=1,
+                teachers_count=self.random.choice([1, 1, 2]),
+                type_id=self.random.choice(theme_types).id,
+                discipline_id=discipline.id
+            ))
+
+        return themes
+
+    def pick_previous_themes(self, candidates):
+        if not candidates:
+            return []
+
+        previous = [candidates[-1]]
+
+        if len(candidates) > 1 and self.random.random() < 0.3:
+            previous.append(self.random.choice(candidates[0:-1]))
+
+        return previous
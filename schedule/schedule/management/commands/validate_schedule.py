@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import ScheduleBuild
+from ...occupancy import OccupancyIndex, OccupancyTensor, numpy
+from ...snapshot import ScheduleSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Checks a schedule build for double-booked troops, teachers ' \
+           'and audiences'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--build', type=int,
+            help='Schedule build to check, the published one by default'
+        )
+
+    def handle(self, *args, **options):
+        if options['build'] is not None:
+            schedule_build = ScheduleBuild.objects.filter(
+                id=options['build']
+            ).first()
+
+            if schedule_build is None:
+                raise CommandError(
+                    'Schedule build %i does not exist' % options['build']
+                )
+        else:
+            schedule_build = ScheduleBuild.get_published()
+
+        snapshot = ScheduleSnapshot.load(schedule_build, with_relations=False)
+        index = OccupancyTensor if numpy is not None else OccupancyIndex
+        conflicts = index.find_conflicts(snapshot.lessons)
+
+        for date_of, hour, kind, key in conflicts:
+            self.stdout.write('%s hour %i: %s %s is double-booked' % (
+                date_of.strftime('%Y-%m-%d'), hour, kind, key
+            ))
+
+        if conflicts:
+            raise CommandError('%i conflicts found' % len(conflicts))
+
+        self.stdout.write('%i lessons checked, no conflicts found' % len(
+            snapshot.lessons
+        ))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:26
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max, Min
+from django.utils.timezone import now
+
+
+def publish_existing_lessons(apps, schema_editor):
+    Lesson = apps.get_model('schedule', 'Lesson')
+    ScheduleBuild = apps.get_model('schedule', 'ScheduleBuild')
+
+    dates = Lesson.objects.aggregate(Min('date_of'), Max('date_of'))
+
+    if dates['date_of__min'] is None:
+        return
+
+    first, last = dates['date_of__min'], dates['date_of__max']
+    build = ScheduleBuild.objects.create(
+        start_date=first, term_length=(last - first).days // 7 + 1,
+        published=True, published_at=now()
+    )
+    Lesson.objects.update(build=build)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0011_buildcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleBuild',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('start_date', models.DateField()),
+                ('term_length', models.PositiveIntegerField()),
+                ('published', models.BooleanField(db_index=True, default=False)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='schedule.ScheduleBuild')),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='build',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='schedule.ScheduleBuild'),
+        ),
+        migrations.RunPython(
+            publish_existing_lessons, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_time_span(apps, schema_editor):
+    Lesson = apps.get_model('schedule', 'Lesson')
+    Theme = apps.get_model('schedule', 'Theme')
+
+    durations = Theme.objects.order_by().values_list(
+        'duration', flat=True
+    ).distinct()
+
+    for duration in durations:
+        Lesson.objects.filter(theme__duration=duration).update(
+            duration=duration, end_hour=F('initial_hour') + duration
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0012_schedulebuild'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='duration',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='end_hour',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_time_span, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['troop', 'theme', 'self_education'], name='schedule_le_troop_i_7e5984_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['build', 'date_of', 'initial_hour', 'end_hour'], name='schedule_le_build_i_075b5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='theme',
+            index=models.Index(fields=['discipline', 'term'], name='schedule_th_discipl_55fba0_idx'),
+        ),
+    ]
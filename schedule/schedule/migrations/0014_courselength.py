@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:42
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_course_lengths(apps, schema_editor):
+    CourseLength = apps.get_model('schedule', 'CourseLength')
+    Theme = apps.get_model('schedule', 'Theme')
+
+    themes = Theme.specialties.through.objects.values(
+        'specialty_id', 'theme__discipline_id', 'theme__term'
+    ).annotate(
+        duration=Sum('theme__duration'),
+        self_education=Sum('theme__self_education_hours')
+    )
+
+    CourseLength.objects.bulk_create([
+        CourseLength(
+            specialty_id=struct['specialty_id'],
+            discipline_id=struct['theme__discipline_id'],
+            term=struct['theme__term'], duration=struct['duration'],
+            self_education_hours=struct['self_education']
+        )
+        for struct in themes
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0013_lesson_time_span'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseLength',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('term', models.PositiveSmallIntegerField()),
+                ('duration', models.PositiveIntegerField(default=0)),
+                ('self_education_hours', models.PositiveIntegerField(default=0)),
+                ('discipline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_lengths', to='schedule.Discipline')),
+                ('specialty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_lengths', to='schedule.Specialty')),
+            ],
+            options={
+                'default_related_name': 'course_lengths',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='courselength',
+            unique_together=set([('specialty', 'discipline', 'term')]),
+        ),
+        migrations.RunPython(
+            fill_course_lengths, migrations.RunPython.noop
+        ),
+    ]
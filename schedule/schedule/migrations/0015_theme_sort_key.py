@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 18:45
+from __future__ import unicode_literals
+
+import re
+
+from django.db import migrations, models
+
+
+NUMBER_PATTERN = re.compile(r'^\d+([./-]\d+)*$')
+NUMBER_PART_DIGITS = 4
+
+
+def parse_number(number):
+    number = number.strip()
+
+    if not NUMBER_PATTERN.match(number):
+        raise ValueError('Invalid theme number: %s' % number)
+
+    parts = [int(part) for part in re.split(r'[./-]', number)]
+
+    if any(len(str(part)) > NUMBER_PART_DIGITS for part in parts):
+        raise ValueError('Theme number part is too long: %s' % number)
+
+    return '.'.join(str(part).zfill(NUMBER_PART_DIGITS) for part in parts)
+
+
+def fill_sort_keys(apps, schema_editor):
+    Theme = apps.get_model('schedule', 'Theme')
+    errors = []
+
+    for theme in Theme.objects.only('id', 'number'):
+        try:
+            sort_key = parse_number(theme.number)
+        except ValueError as e:
+            errors.append('theme %i: %s' % (theme.id, e))
+            continue
+
+        Theme.objects.filter(id=theme.id).update(sort_key=sort_key)
+
+    if errors:
+        raise ValueError(
+            'Fix theme numbers before migrating:\n%s' % '\n'.join(errors)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0014_courselength'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='theme',
+            options={'ordering': ['sort_key', 'id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='theme',
+            name='schedule_th_discipl_55fba0_idx',
+        ),
+        migrations.AddField(
+            model_name='theme',
+            name='sort_key',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='theme',
+            index=models.Index(fields=['discipline', 'term', 'sort_key'], name='schedule_th_discipl_a221ea_idx'),
+        ),
+    ]
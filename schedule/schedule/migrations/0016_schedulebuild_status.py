@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 19:13
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def finish_published_builds(apps, schema_editor):
+    ScheduleBuild = apps.get_model('schedule', 'ScheduleBuild')
+    ScheduleBuild.objects.filter(published_at__isnull=False).update(
+        status='finished'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0015_theme_sort_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulebuild',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(
+            finish_published_builds, migrations.RunPython.noop
+        ),
+    ]
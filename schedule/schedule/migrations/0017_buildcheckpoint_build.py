@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 19:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0016_schedulebuild_status'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='buildcheckpoint',
+            name='term_load',
+        ),
+        migrations.AddField(
+            model_name='buildcheckpoint',
+            name='build',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='schedule.ScheduleBuild'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 19:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0017_buildcheckpoint_build'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buildcheckpoint',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='buildcheckpoint',
+            name='owner',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='buildcheckpoint',
+            name='date_of',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='buildcheckpoint',
+            name='week',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
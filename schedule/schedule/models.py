@@ -1,7 +1,12 @@
 from __future__ import unicode_literals
 
-from django.db import models
-from django.db.models import Sum
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q, Sum
+from django.utils.timezone import now
 
 
 class BaseScheduleModel(models.Model):
@@ -27,18 +32,14 @@ class Discipline(BaseScheduleModel):
         return durations[0] + durations[1]
 
     def get_courses_length(self, term, specialty):
-        themes = self.themes.filter(
-            term=term, specialties__in=[specialty]
-        )
-        if not themes.exists():
-            return 0, 0
+        length = self.course_lengths.filter(
+            term=term, specialty=specialty
+        ).first()
 
-        duration = themes.aggregate(Sum('duration'))['duration__sum']
-        self_ed = themes.aggregate(
-            Sum('self_education_hours')
-        )['self_education_hours__sum']
+        if length is None:
+            return 0, 0
 
-        return duration, self_ed
+        return length.duration, length.self_education_hours
 
     def __unicode__(self):
         return self.full_name
@@ -55,16 +56,17 @@ class Specialty(BaseScheduleModel):
 
     @property
     def related_disciplines_ids(self):
-        return self.themes.values_list(
+        return self.course_lengths.order_by('discipline').values_list(
             'discipline', flat=True
         ).distinct()
 
     def calc_course_length(self, term):
-        length = 0
-        for discipline in self.disciplines:
-            length += discipline.calc_course_length(term, self)
+        totals = self.course_lengths.filter(term=term).aggregate(
+            duration=Sum('duration'),
+            self_education=Sum('self_education_hours')
+        )
 
-        return length
+        return (totals['duration'] or 0) + (totals['self_education'] or 0)
 
     def __unicode__(self):
         return self.code
@@ -137,9 +139,12 @@ class Theme(BaseScheduleModel):
         (4, 4),
         (6, 6)
     )
+    NUMBER_PATTERN = re.compile(r'^\d+([./-]\d+)*$')
+    NUMBER_PART_DIGITS = 4
 
     name = models.CharField(max_length=255)
     number = models.CharField(max_length=30)
+    sort_key = models.CharField(max_length=150, default='', editable=False)
     term = models.PositiveSmallIntegerField()
     self_education_hours = models.PositiveSmallIntegerField(default=0)
     duration = models.PositiveSmallIntegerField(choices=DURATION_CHOICES)
@@ -162,39 +167,324 @@ class Theme(BaseScheduleModel):
     def teachers_alternative(self):
         return self.teachers.filter(teachertheme__alternative=True)
 
+    @classmethod
+    def parse_number(cls, number):
+        number = number.strip()
+
+        if not cls.NUMBER_PATTERN.match(number):
+            raise ValueError('Invalid theme number: %s' % number)
+
+        parts = [int(part) for part in re.split(r'[./-]', number)]
+
+        if any(len(str(part)) > cls.NUMBER_PART_DIGITS for part in parts):
+            raise ValueError('Theme number part is too long: %s' % number)
+
+        return '.'.join(
+            str(part).zfill(cls.NUMBER_PART_DIGITS) for part in parts
+        )
+
     @staticmethod
     def set_teachers(theme, main_teachers, alternative_teachers):
-        theme.teachers.clear()
-        through = theme.teachers.through
-
-        for teacher in main_teachers:
-            through.objects.create(teacher=teacher, theme=theme, alternative=False)
+        Theme.set_teachers_batch(
+            [(theme, main_teachers, alternative_teachers)]
+        )
 
-        for teacher in alternative_teachers:
-            through.objects.create(teacher=teacher, theme=theme, alternative=True)
+    @staticmethod
+    def set_teachers_batch(assignments):
+        required = {}
+
+        for theme, main_teachers, alternative_teachers in assignments:
+            required[theme.id] = set(
+                (teacher.id, False) for teacher in main_teachers
+            ) | set(
+                (teacher.id, True) for teacher in alternative_teachers
+            )
+
+        stale = []
+        existing = set()
+
+        for row_id, theme_id, teacher_id, alternative in \
+                TeacherTheme.objects.filter(
+                    theme_id__in=required
+                ).values_list('id', 'theme_id', 'teacher_id', 'alternative'):
+            key = (theme_id, teacher_id, alternative)
+
+            if key in existing or \
+                    (teacher_id, alternative) not in required[theme_id]:
+                stale.append(row_id)
+            else:
+                existing.add(key)
+
+        with transaction.atomic():
+            if stale:
+                TeacherTheme.objects.filter(id__in=stale).delete()
+
+            TeacherTheme.objects.bulk_create([
+                TeacherTheme(
+                    theme_id=theme_id, teacher_id=teacher_id,
+                    alternative=alternative
+                )
+                for theme_id, teachers in required.items()
+                for teacher_id, alternative in sorted(teachers)
+                if (theme_id, teacher_id, alternative) not in existing
+            ])
 
     class Meta:
         default_related_name = 'themes'
-        ordering = ['number']
+        ordering = ['sort_key', 'id']
+        indexes = [
+            models.Index(fields=['discipline', 'term', 'sort_key'])
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        theme = super(Theme, cls).from_db(db, field_names, values)
+        theme.loaded_values = dict(zip(field_names, values))
+
+        return theme
+
+    def save(self, *args, **kwargs):
+        loaded_values = getattr(self, 'loaded_values', {})
+
+        if self.number != loaded_values.get('number'):
+            self.sort_key = self.parse_number(self.number)
+
+        super(Theme, self).save(*args, **kwargs)
+
+        if self.duration != loaded_values.get('duration'):
+            self.lessons.exclude(duration=self.duration).update(
+                duration=self.duration,
+                end_hour=F('initial_hour') + self.duration
+            )
+
+        self.loaded_values = dict(
+            loaded_values, number=self.number, duration=self.duration
+        )
 
     def __unicode__(self):
         return '%s %s' % (self.number, self.name)
 
 
+class CourseLength(BaseScheduleModel):
+    specialty = models.ForeignKey(Specialty, on_delete=models.CASCADE)
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE)
+    term = models.PositiveSmallIntegerField()
+
+    duration = models.PositiveIntegerField(default=0)
+    self_education_hours = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        default_related_name = 'course_lengths'
+        unique_together = ['specialty', 'discipline', 'term']
+
+    @property
+    def total(self):
+        return self.duration + self.self_education_hours
+
+    @classmethod
+    def get_totals(cls):
+        totals = cls.objects.values('specialty_id', 'term').annotate(
+            duration_sum=Sum('duration'),
+            self_education_sum=Sum('self_education_hours')
+        )
+
+        return dict(
+            (
+                (struct['specialty_id'], struct['term']),
+                struct['duration_sum'] + struct['self_education_sum']
+            )
+            for struct in totals
+        )
+
+    @classmethod
+    def get_troop_lengths(cls, troop):
+        return dict(
+            (discipline_id, duration + self_education)
+            for discipline_id, duration, self_education in cls.objects.filter(
+                specialty_id=troop.specialty_id, term=troop.term
+            ).values_list('discipline_id', 'duration', 'self_education_hours')
+        )
+
+    @staticmethod
+    def get_theme_keys(theme_specialties):
+        return set(theme_specialties.values_list(
+            'specialty_id', 'theme__discipline_id', 'theme__term'
+        ))
+
+    @classmethod
+    def refresh(cls, keys=None):
+        theme_specialties = Theme.specialties.through.objects.all()
+        lengths = cls.objects.all()
+
+        if keys is not None:
+            keys = set(keys)
+
+            if not keys:
+                return
+
+            specialties, disciplines, terms = [
+                set(values) for values in zip(*keys)
+            ]
+
+            theme_specialties = theme_specialties.filter(
+                specialty_id__in=specialties,
+                theme__discipline_id__in=disciplines, theme__term__in=terms
+            )
+            lengths = lengths.filter(
+                specialty_id__in=specialties, discipline_id__in=disciplines,
+                term__in=terms
+            )
+
+        aggregated = {}
+
+        for struct in theme_specialties.values(
+                'specialty_id', 'theme__discipline_id', 'theme__term'
+        ).annotate(
+            duration=Sum('theme__duration'),
+            self_education=Sum('theme__self_education_hours')
+        ):
+            key = (
+                struct['specialty_id'], struct['theme__discipline_id'],
+                struct['theme__term']
+            )
+
+            if keys is None or key in keys:
+                aggregated[key] = (
+                    struct['duration'], struct['self_education']
+                )
+
+        with transaction.atomic():
+            stale = []
+
+            for length in lengths:
+                key = (length.specialty_id, length.discipline_id, length.term)
+
+                if keys is not None and key not in keys:
+                    continue
+
+                if key not in aggregated:
+                    stale.append(length.id)
+                    continue
+
+                hours = aggregated.pop(key)
+
+                if hours != (length.duration, length.self_education_hours):
+                    length.duration, length.self_education_hours = hours
+                    length.save()
+
+            cls.objects.filter(id__in=stale).delete()
+            cls.objects.bulk_create([
+                cls(
+                    specialty_id=specialty_id, discipline_id=discipline_id,
+                    term=term, duration=duration,
+                    self_education_hours=self_education
+                )
+                for (specialty_id, discipline_id, term), (
+                    duration, self_education
+                ) in aggregated.items()
+            ])
+
+    def __unicode__(self):
+        return '%s %s %i' % (self.specialty, self.discipline, self.term)
+
+
+class ScheduleBuild(BaseScheduleModel):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FINISHED, 'Finished'),
+        (FAILED, 'Failed')
+    )
+    DONE_STATUSES = (FINISHED, FAILED)
+
+    start_date = models.DateField()
+    term_length = models.PositiveIntegerField()
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='children'
+    )
+
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    published = models.BooleanField(default=False, db_index=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    @classmethod
+    def get_published(cls):
+        return cls.objects.filter(published=True).first()
+
+    def publish(self):
+        with transaction.atomic():
+            ScheduleBuild.objects.filter(published=True).exclude(
+                id=self.id
+            ).update(published=False)
+            ScheduleBuild.objects.filter(id=self.id).update(
+                published=True, published_at=now()
+            )
+
+        self.refresh_from_db()
+
+    def start(self):
+        ScheduleBuild.objects.filter(
+            id=self.id, status=ScheduleBuild.PENDING
+        ).update(status=ScheduleBuild.RUNNING)
+        self.refresh_from_db(fields=['status'])
+
+    def set_status(self, status):
+        ScheduleBuild.objects.filter(id=self.id).update(status=status)
+        self.status = status
+
+    def __unicode__(self):
+        return '%i %s' % (self.id, self.start_date)
+
+
+class LessonQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(build__published=True)
+
+
 class Lesson(BaseScheduleModel):
     date_of = models.DateField()
     initial_hour = models.PositiveSmallIntegerField()
+    duration = models.PositiveSmallIntegerField(default=0, editable=False)
+    end_hour = models.PositiveSmallIntegerField(default=0, editable=False)
 
     troop = models.ForeignKey(Troop)
     theme = models.ForeignKey(Theme)
+    build = models.ForeignKey(
+        ScheduleBuild, on_delete=models.CASCADE, null=True, blank=True
+    )
 
     teachers = models.ManyToManyField(Teacher)
     audiences = models.ManyToManyField(Audience)
 
     self_education = models.BooleanField(default=False)
 
+    objects = LessonQuerySet.as_manager()
+
     class Meta:
         default_related_name = 'lessons'
+        indexes = [
+            models.Index(fields=['troop', 'theme', 'self_education']),
+            models.Index(
+                fields=['build', 'date_of', 'initial_hour', 'end_hour']
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        self.duration = self.theme.duration
+        self.end_hour = self.initial_hour + self.duration
+
+        super(Lesson, self).save(*args, **kwargs)
 
     def __unicode__(self):
         discipline_name = self.theme.discipline.short_name
@@ -202,3 +492,76 @@ class Lesson(BaseScheduleModel):
         return '%s %s %s' % (
             discipline_name, self.theme.number, self.troop.code
         )
+
+
+class CheckpointLockedError(Exception):
+    pass
+
+
+class BuildCheckpoint(BaseScheduleModel):
+    task_id = models.CharField(max_length=255, unique=True)
+    build = models.ForeignKey(
+        ScheduleBuild, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='checkpoints'
+    )
+    week = models.PositiveIntegerField(null=True, blank=True)
+    date_of = models.DateField(null=True, blank=True)
+    owner = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    @staticmethod
+    def get_lock_deadline():
+        return now() + timedelta(seconds=settings.BUILD_LOCK_TIMEOUT)
+
+    @classmethod
+    def lock(cls, task_id, owner, build=None):
+        checkpoint, created = cls.objects.get_or_create(
+            task_id=task_id, defaults={
+                'build': build,
+                'owner': owner,
+                'locked_until': cls.get_lock_deadline()
+            }
+        )
+
+        if created:
+            return checkpoint
+
+        locked = cls.objects.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now()),
+            id=checkpoint.id
+        ).update(owner=owner, locked_until=cls.get_lock_deadline())
+
+        if not locked:
+            raise CheckpointLockedError(
+                'Build task %s is locked by another worker' % task_id
+            )
+
+        checkpoint.refresh_from_db()
+
+        return checkpoint
+
+    def save_week(self, date_of, week):
+        saved = BuildCheckpoint.objects.filter(
+            id=self.id, owner=self.owner
+        ).update(
+            week=week, date_of=date_of, locked_until=self.get_lock_deadline()
+        )
+
+        if not saved:
+            raise CheckpointLockedError(
+                'Build task %s was taken over by another worker' % self.task_id
+            )
+
+        self.week = week
+        self.date_of = date_of
+
+    def unlock(self):
+        BuildCheckpoint.objects.filter(
+            id=self.id, owner=self.owner
+        ).update(locked_until=None)
+
+    def release(self):
+        BuildCheckpoint.objects.filter(id=self.id, owner=self.owner).delete()
+
+    def __unicode__(self):
+        return '%s %s' % (self.task_id, self.week)
@@ -0,0 +1,256 @@
+from collections import namedtuple
+
+from django.conf import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TimeSlot = namedtuple('TimeSlot', ['date_of', 'initial_hour', 'duration'])
+
+
+class OccupancyIndex(object):
+    TEACHER = 'teacher'
+    AUDIENCE = 'audience'
+    THEME = 'theme'
+    TROOP = 'troop'
+
+    def __init__(self):
+        self.days = {}
+
+    @staticmethod
+    def get_mask(initial_hour, duration):
+        return ((1 << duration) - 1) << initial_hour
+
+    def get_occupied(self, date_of, kind, key):
+        day = self.days.get(date_of)
+
+        if day is None:
+            return 0
+
+        return day.get((kind, key), 0)
+
+    def set_occupied(self, date_of, kind, key, occupied):
+        self.days.setdefault(date_of, {})[(kind, key)] = occupied
+
+    def is_free(self, slot, kind, key):
+        occupied = self.get_occupied(slot.date_of, kind, key)
+
+        return not occupied & self.get_mask(slot.initial_hour, slot.duration)
+
+    def find_free(self, slot, kind, items):
+        day = self.days.get(slot.date_of, {})
+        mask = self.get_mask(slot.initial_hour, slot.duration)
+
+        return [
+            item for item in items if not day.get((kind, item.id), 0) & mask
+        ]
+
+    def occupy(self, slot, kind, key):
+        day = self.days.setdefault(slot.date_of, {})
+        mask = self.get_mask(slot.initial_hour, slot.duration)
+
+        day[(kind, key)] = day.get((kind, key), 0) | mask
+
+    @classmethod
+    def get_lesson_keys(cls, lesson):
+        return [(cls.THEME, lesson.theme.id)] + [
+            (cls.TEACHER, teacher_id) for teacher_id in lesson.teachers
+        ] + [
+            (cls.AUDIENCE, audience_id) for audience_id in lesson.audiences
+        ]
+
+    @classmethod
+    def get_booking_keys(cls, lesson):
+        return [(cls.TROOP, lesson.troop.id)] + [
+            (cls.TEACHER, teacher_id) for teacher_id in lesson.teachers
+        ] + [
+            (cls.AUDIENCE, audience_id) for audience_id in lesson.audiences
+        ]
+
+    def add_lesson(self, lesson):
+        slot = TimeSlot(
+            lesson.date_of, lesson.initial_hour, lesson.theme.duration
+        )
+
+        for kind, key in self.get_lesson_keys(lesson):
+            self.occupy(slot, kind, key)
+
+    @classmethod
+    def find_conflicts(cls, lessons):
+        occupied = {}
+        conflicts = {}
+
+        for lesson in lessons:
+            mask = cls.get_mask(lesson.initial_hour, lesson.theme.duration)
+
+            for kind, key in cls.get_booking_keys(lesson):
+                cell = (lesson.date_of, kind, key)
+                overlap = occupied.get(cell, 0) & mask
+
+                if overlap:
+                    conflicts[cell] = conflicts.get(cell, 0) | overlap
+
+                occupied[cell] = occupied.get(cell, 0) | mask
+
+        return sorted(
+            (date_of, hour, kind, key)
+            for (date_of, kind, key), overlap in conflicts.items()
+            for hour in range(overlap.bit_length()) if overlap >> hour & 1
+        )
+
+
+class OccupancyTensor(OccupancyIndex):
+    def __init__(self, hours=None):
+        super(OccupancyTensor, self).__init__()
+
+        self.hours = hours or settings.LESSON_HOURS
+        self.dates = {}
+        self.rows = {}
+        self.tensors = {}
+
+    def get_day(self, date_of):
+        if date_of not in self.dates:
+            self.dates[date_of] = len(self.dates)
+
+        return self.dates[date_of]
+
+    def get_row(self, kind, key):
+        rows = self.rows.setdefault(kind, {})
+
+        if key not in rows:
+            rows[key] = len(rows)
+
+        return rows[key]
+
+    def get_tensor(self, kind, row=0, day=0, hours=0):
+        tensor = self.tensors.get(kind)
+        shape = (row + 1, day + 1, max(hours, self.hours))
+        current = tensor.shape if tensor is not None else (0, 0, 0)
+
+        if all(needed <= size for needed, size in zip(shape, current)):
+            return tensor
+
+        grown = numpy.zeros([
+            size if needed <= size else max(needed, size * 2)
+            for needed, size in zip(shape, current)
+        ], dtype=bool)
+
+        if tensor is not None:
+            grown[0:current[0], 0:current[1], 0:current[2]] = tensor
+
+        self.tensors[kind] = grown
+
+        return grown
+
+    def get_occupied(self, date_of, kind, key):
+        row = self.rows.get(kind, {}).get(key)
+
+        if row is None or date_of not in self.dates:
+            return 0
+
+        cells = self.get_tensor(kind)[row, self.dates[date_of]]
+
+        return sum(1 << int(hour) for hour in numpy.flatnonzero(cells))
+
+    def set_occupied(self, date_of, kind, key, occupied):
+        row, day = self.get_row(kind, key), self.get_day(date_of)
+        tensor = self.get_tensor(kind, row, day, occupied.bit_length())
+
+        tensor[row, day] = [
+            bool(occupied >> hour & 1) for hour in range(tensor.shape[2])
+        ]
+
+    def is_free(self, slot, kind, key):
+        row = self.rows.get(kind, {}).get(key)
+
+        if row is None or slot.date_of not in self.dates:
+            return True
+
+        end = slot.initial_hour + slot.duration
+
+        return not self.get_tensor(kind)[
+            row, self.dates[slot.date_of], slot.initial_hour:end
+        ].any()
+
+    def find_free(self, slot, kind, items):
+        rows = self.rows.get(kind, {})
+
+        if slot.date_of not in self.dates or not rows:
+            return list(items)
+
+        known = [
+            (index, rows[item.id]) for index, item in enumerate(items)
+            if item.id in rows
+        ]
+
+        if not known:
+            return list(items)
+
+        end = slot.initial_hour + slot.duration
+        busy = self.get_tensor(kind)[
+            [row for _, row in known], self.dates[slot.date_of],
+            slot.initial_hour:end
+        ].any(axis=1)
+        busy_indexes = set(
+            index for (index, _), is_busy in zip(known, busy) if is_busy
+        )
+
+        return [
+            item for index, item in enumerate(items)
+            if index not in busy_indexes
+        ]
+
+    def occupy(self, slot, kind, key):
+        row, day = self.get_row(kind, key), self.get_day(slot.date_of)
+        end = slot.initial_hour + slot.duration
+
+        self.get_tensor(kind, row, day, end)[
+            row, day, slot.initial_hour:end
+        ] = True
+
+    @classmethod
+    def find_conflicts(cls, lessons):
+        tensor = cls()
+        cells = {}
+
+        for lesson in lessons:
+            day = tensor.get_day(lesson.date_of)
+            hours = range(
+                lesson.initial_hour,
+                lesson.initial_hour + lesson.theme.duration
+            )
+
+            for kind, key in cls.get_booking_keys(lesson):
+                row = tensor.get_row(kind, key)
+                rows, days, kind_hours = cells.setdefault(kind, ([], [], []))
+
+                rows.extend([row] * len(hours))
+                days.extend([day] * len(hours))
+                kind_hours.extend(hours)
+
+        dates = dict((day, date_of) for date_of, day in tensor.dates.items())
+        conflicts = []
+
+        for kind, (rows, days, hours) in cells.items():
+            keys = dict((row, key) for key, row in tensor.rows[kind].items())
+            counts = numpy.zeros(
+                (len(keys), len(dates), max(hours) + 1), dtype=numpy.int32
+            )
+            numpy.add.at(counts, (rows, days, hours), 1)
+
+            conflicts.extend(
+                (dates[day], int(hour), kind, keys[row])
+                for row, day, hour in numpy.argwhere(counts > 1)
+            )
+
+        return sorted(conflicts)
+
+
+def create_occupancy_index():
+    if settings.OCCUPANCY_BACKEND == 'tensor' and numpy is not None:
+        return OccupancyTensor()
+
+    return OccupancyIndex()
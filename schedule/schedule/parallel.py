@@ -0,0 +1,132 @@
+from itertools import chain
+
+from .occupancy import OccupancyIndex, TimeSlot, create_occupancy_index
+from .persistence import LessonUnitOfWork
+from .tracking import TeacherLoad
+
+
+class PartitionsMerger(object):
+    def __init__(self, snapshot, teacher_load=None, unit_of_work=None):
+        self.snapshot = snapshot
+        self.teacher_load = teacher_load or TeacherLoad.load(
+            snapshot.teachers, snapshot.schedule_build
+        )
+        self.unit_of_work = unit_of_work or LessonUnitOfWork(
+            snapshot.schedule_build
+        )
+        self.occupancy = create_occupancy_index()
+        self.pending = create_occupancy_index()
+
+        for lesson in snapshot.lessons:
+            self.occupancy.add_lesson(lesson)
+
+    @staticmethod
+    def get_order_key(lesson):
+        return (
+            lesson.date_of, lesson.troop.code, lesson.troop.id,
+            lesson.initial_hour
+        )
+
+    @staticmethod
+    def get_slot(lesson):
+        return TimeSlot(
+            lesson.date_of, lesson.initial_hour, lesson.theme.duration
+        )
+
+    def merge(self, partitions):
+        lessons = sorted(chain(*partitions), key=self.get_order_key)
+        merged = []
+        week = None
+
+        for lesson in lessons:
+            self.pending.add_lesson(lesson)
+
+        for lesson in lessons:
+            lesson_week = lesson.date_of.isocalendar()[0:2]
+
+            if week is not None and lesson_week != week:
+                self.unit_of_work.flush()
+
+            week = lesson_week
+            lesson = self.reassign_teachers(lesson)
+
+            self.occupancy.add_lesson(lesson)
+            self.teacher_load.add_lesson(lesson)
+            self.unit_of_work.add(lesson)
+
+            merged.append(lesson)
+
+        self.unit_of_work.flush()
+
+        return merged
+
+    def release_teachers(self, lesson):
+        slot = self.get_slot(lesson)
+        mask = OccupancyIndex.get_mask(slot.initial_hour, slot.duration)
+
+        for teacher_id in lesson.teachers:
+            occupied = self.pending.get_occupied(
+                slot.date_of, OccupancyIndex.TEACHER, teacher_id
+            )
+            self.pending.set_occupied(
+                slot.date_of, OccupancyIndex.TEACHER, teacher_id,
+                occupied & ~mask
+            )
+
+    def is_free_teacher(self, slot, teacher_id):
+        return all(
+            index.is_free(slot, OccupancyIndex.TEACHER, teacher_id)
+            for index in [self.occupancy, self.pending]
+        )
+
+    def find_free_teachers(self, teachers, slot):
+        return self.pending.find_free(
+            slot, OccupancyIndex.TEACHER, self.occupancy.find_free(
+                slot, OccupancyIndex.TEACHER, teachers
+            )
+        )
+
+    def pick_teachers(self, theme, slot):
+        count = theme.teachers_count
+        teachers = self.teacher_load.get_least_loaded(
+            self.find_free_teachers(
+                self.snapshot.main_teachers[theme.id], slot
+            ), count
+        )
+
+        if len(teachers) < count:
+            teachers += self.teacher_load.get_least_loaded(
+                self.find_free_teachers(
+                    self.snapshot.alternative_teachers[theme.id], slot
+                ), count - len(teachers)
+            )
+
+        return frozenset(teacher.id for teacher in teachers)
+
+    def get_balance_key(self, teachers):
+        return sorted(
+            [self.teacher_load.get_ratio(teacher_id)
+             for teacher_id in teachers], reverse=True
+        )
+
+    def reassign_teachers(self, lesson):
+        if not lesson.teachers:
+            return lesson
+
+        slot = self.get_slot(lesson)
+        self.release_teachers(lesson)
+
+        is_free = all(
+            self.is_free_teacher(slot, teacher_id)
+            for teacher_id in lesson.teachers
+        )
+        teachers = self.pick_teachers(lesson.theme, slot)
+
+        if len(teachers) < lesson.theme.teachers_count:
+            return lesson if is_free else lesson._replace(teachers=frozenset())
+
+        if is_free and self.get_balance_key(lesson.teachers) <= \
+                self.get_balance_key(teachers):
+            return lesson
+
+        return lesson._replace(teachers=teachers)
@@ -0,0 +1,152 @@
+from django.db import connection, transaction
+
+from .models import Lesson
+from .snapshot import LessonRecord
+
+
+DELETE_BATCH_SIZE = 500
+
+
+def clear_lessons(lessons=None):
+    if lessons is None and connection.vendor == 'postgresql':
+        tables = [
+            Lesson.teachers.through._meta.db_table,
+            Lesson.audiences.through._meta.db_table,
+            Lesson._meta.db_table
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE %s' % ', '.join(
+                connection.ops.quote_name(table) for table in tables
+            ))
+
+        return
+
+    if lessons is None:
+        lessons = Lesson.objects.all()
+
+    table = connection.ops.quote_name(Lesson._meta.db_table)
+
+    with transaction.atomic():
+        ids = list(lessons.values_list('id', flat=True))
+
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+
+            for through in [Lesson.teachers.through,
+                            Lesson.audiences.through]:
+                through.objects.filter(lesson_id__in=batch).delete()
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM %s WHERE id IN (%s)' % (
+                        table, ', '.join(['%s'] * len(batch))
+                    ), batch
+                )
+
+
+class LessonUnitOfWork(object):
+    def __init__(self, schedule_build=None):
+        self.schedule_build = schedule_build
+        self.pending = []
+
+    def add(self, lesson):
+        self.pending.append(lesson)
+
+    def flush(self):
+        if not self.pending:
+            return []
+
+        with transaction.atomic():
+            lessons = self.save_lessons(self.pending)
+            self.save_relations(lessons, self.pending)
+
+        self.pending = []
+
+        return lessons
+
+    def save_lessons(self, records):
+        lessons = Lesson.objects.bulk_create([
+            Lesson(
+                date_of=record.date_of, initial_hour=record.initial_hour,
+                duration=record.theme.duration,
+                end_hour=record.initial_hour + record.theme.duration,
+                troop_id=record.troop.id, theme_id=record.theme.id,
+                self_education=record.self_education,
+                build=self.schedule_build
+            )
+            for record in records
+        ])
+
+        if not connection.features.can_return_ids_from_bulk_insert:
+            self.resolve_ids(lessons)
+
+        return lessons
+
+    def copy(self, lessons):
+        lessons = lessons.select_related('troop', 'theme').prefetch_related(
+            'teachers', 'audiences'
+        )
+
+        for lesson in lessons:
+            self.add(LessonRecord(
+                lesson.date_of, lesson.initial_hour, lesson.troop,
+                lesson.theme,
+                frozenset(teacher.id for teacher in lesson.teachers.all()),
+                frozenset(audience.id for audience in lesson.audiences.all()),
+                lesson.self_education
+            ))
+
+        return self.flush()
+
+    def resolve_ids(self, lessons):
+        created = Lesson.objects.filter(
+            build=self.schedule_build,
+            date_of__in=set(lesson.date_of for lesson in lessons)
+        ).order_by('id').values_list(
+            'id', 'troop_id', 'date_of', 'initial_hour'
+        )
+        ids = dict(
+            ((troop_id, date_of, initial_hour), lesson_id)
+            for lesson_id, troop_id, date_of, initial_hour in created
+        )
+
+        for lesson in lessons:
+            lesson.id = ids[
+                (lesson.troop_id, lesson.date_of, lesson.initial_hour)
+            ]
+
+    def save_relations(self, lessons, records):
+        teachers_through = Lesson.teachers.through
+        audiences_through = Lesson.audiences.through
+
+        lesson_teachers = []
+        lesson_audiences = []
+
+        for lesson, record in zip(lessons, records):
+            for teacher_id in record.teachers:
+                lesson_teachers.append(teachers_through(
+                    lesson_id=lesson.id, teacher_id=teacher_id
+                ))
+
+            for audience_id in record.audiences:
+                lesson_audiences.append(audiences_through(
+                    lesson_id=lesson.id, audience_id=audience_id
+                ))
+
+        teachers_through.objects.bulk_create(lesson_teachers)
+        audiences_through.objects.bulk_create(lesson_audiences)
+
+
+class LessonCollector(LessonUnitOfWork):
+    def __init__(self, schedule_build=None):
+        super(LessonCollector, self).__init__(schedule_build)
+        self.lessons = []
+
+    def flush(self):
+        flushed = self.pending
+
+        self.lessons.extend(flushed)
+        self.pending = []
+
+        return flushed
@@ -0,0 +1,85 @@
+class PrerequisiteCycleError(ValueError):
+    pass
+
+
+class PrerequisiteGraph(object):
+    def __init__(self, order, previous_themes):
+        self.order = order
+        self.bits = {}
+        self.masks = {}
+
+        for index, theme_id in enumerate(order):
+            self.bits[theme_id] = 1 << index
+
+        for theme_id in order:
+            mask = 0
+
+            for previous_theme_id in previous_themes.get(theme_id, []):
+                mask |= self.bits[previous_theme_id]
+
+            self.masks[theme_id] = mask
+
+    @classmethod
+    def compile(cls, themes, previous_themes):
+        dependants = dict((theme_id, []) for theme_id in themes)
+        in_degree = dict((theme_id, 0) for theme_id in themes)
+
+        for theme_id, previous_ids in previous_themes.items():
+            for previous_theme_id in previous_ids:
+                dependants[previous_theme_id].append(theme_id)
+                in_degree[theme_id] += 1
+
+        ready = sorted(
+            theme_id for theme_id, degree in in_degree.items() if not degree
+        )
+        order = []
+
+        while ready:
+            theme_id = ready.pop()
+            order.append(theme_id)
+
+            for dependant_id in dependants[theme_id]:
+                in_degree[dependant_id] -= 1
+
+                if not in_degree[dependant_id]:
+                    ready.append(dependant_id)
+
+        if len(order) != len(themes):
+            cycle = cls.find_cycle(
+                [stalled_id for stalled_id in in_degree
+                 if in_degree[stalled_id]],
+                previous_themes
+            )
+
+            raise PrerequisiteCycleError(
+                'Previous themes form a cycle: %s' % ' -> '.join(
+                    '%s (id %i)' % (themes[theme_id].number, theme_id)
+                    for theme_id in cycle
+                )
+            )
+
+        return cls(order, previous_themes)
+
+    @staticmethod
+    def find_cycle(stalled_ids, previous_themes):
+        stalled = set(stalled_ids)
+        path = [min(stalled)]
+        visited = {path[0]: 0}
+
+        while True:
+            next_id = min(
+                theme_id for theme_id in previous_themes[path[-1]]
+                if theme_id in stalled
+            )
+
+            if next_id in visited:
+                return path[visited[next_id]:] + [next_id]
+
+            visited[next_id] = len(path)
+            path.append(next_id)
+
+    def get_bit(self, theme_id):
+        return self.bits[theme_id]
+
+    def is_ready(self, theme_id, completed):
+        return not self.masks[theme_id] & ~completed
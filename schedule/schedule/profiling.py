@@ -0,0 +1,188 @@
+import json
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.backends.utils import CursorWrapper, CursorDebugWrapper
+
+
+class ProfilingCursorMixin(object):
+    profiler = None
+
+    def execute(self, sql, params=None):
+        self.profiler.queries += 1
+
+        return super(ProfilingCursorMixin, self).execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.profiler.queries += 1
+
+        return super(ProfilingCursorMixin, self).executemany(sql, param_list)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+
+        if row is not None:
+            self.profiler.rows += 1
+
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.profiler.rows += len(rows)
+
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.profiler.rows += len(rows)
+
+        return rows
+
+    def __iter__(self):
+        for row in super(ProfilingCursorMixin, self).__iter__():
+            self.profiler.rows += 1
+
+            yield row
+
+
+class ProfilingCursorWrapper(ProfilingCursorMixin, CursorWrapper):
+    pass
+
+
+class ProfilingCursorDebugWrapper(ProfilingCursorMixin, CursorDebugWrapper):
+    pass
+
+
+class BuildProfiler(object):
+    PHASES = [
+        'get_disciplines_by_priority',
+        'find_lesson_dependencies',
+        'get_lessons_in_same_time',
+        'find_free_teachers',
+        'create_lesson'
+    ]
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+        self.queries = 0
+        self.rows = 0
+
+        self.setup = self.create_record()
+        self.weeks = []
+        self.current = self.setup
+        self.total = None
+
+    @staticmethod
+    def create_record(**kwargs):
+        record = {'time': 0.0, 'queries': 0, 'rows': 0, 'phases': {}}
+        record.update(kwargs)
+
+        return record
+
+    def instrument(self, builder):
+        for phase in self.PHASES:
+            setattr(builder, phase, self.wrap_phase(
+                phase, getattr(builder, phase)
+            ))
+
+        if hasattr(builder, 'prepare'):
+            builder.prepare = self.wrap_phase('prepare', builder.prepare)
+
+        builder.build_week = self.wrap_week(builder.build_week)
+        builder.build = self.wrap_build(builder.build)
+
+        return builder
+
+    @contextmanager
+    def measure(self, record):
+        started_at = default_timer()
+        queries, rows = self.queries, self.rows
+
+        try:
+            yield
+        finally:
+            record['time'] += default_timer() - started_at
+            record['queries'] += self.queries - queries
+            record['rows'] += self.rows - rows
+
+    def wrap_phase(self, phase, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            record = self.current['phases'].setdefault(phase, {
+                'calls': 0, 'time': 0.0, 'queries': 0, 'rows': 0
+            })
+            record['calls'] += 1
+
+            with self.measure(record):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    def wrap_week(self, method):
+        @wraps(method)
+        def wrapper(date, week):
+            self.current = self.create_record(
+                week=week, date=date.strftime('%Y-%m-%d')
+            )
+            self.weeks.append(self.current)
+
+            try:
+                with self.measure(self.current):
+                    return method(date, week)
+            finally:
+                self.current = self.setup
+
+        return wrapper
+
+    def wrap_build(self, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            self.total = self.create_record()
+
+            with self.capture_queries(), self.measure(self.total):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    @contextmanager
+    def capture_queries(self):
+        connection = connections[self.using]
+
+        def make_cursor(cursor):
+            wrapper = ProfilingCursorWrapper(cursor, connection)
+            wrapper.profiler = self
+
+            return wrapper
+
+        def make_debug_cursor(cursor):
+            wrapper = ProfilingCursorDebugWrapper(cursor, connection)
+            wrapper.profiler = self
+
+            return wrapper
+
+        connection.make_cursor = make_cursor
+        connection.make_debug_cursor = make_debug_cursor
+
+        try:
+            yield
+        finally:
+            del connection.make_cursor
+            del connection.make_debug_cursor
+
+    def get_report(self):
+        total = self.total or self.create_record()
+
+        return {
+            'time': total['time'],
+            'queries': total['queries'],
+            'rows': total['rows'],
+            'setup': self.setup,
+            'weeks': self.weeks
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.get_report(), report_file, indent=2)
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from timeit import default_timer
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .models import CourseLength, Discipline, Lesson, Troop
+
+
+class BuildProgress(object):
+    TOTAL = 'total_term_load'
+    CURRENT = 'current_term_load'
+    TOTALS = 'total_term_load_breakdown'
+    TROOP = 'current_term_load:troop:%s'
+    DISCIPLINE = 'current_term_load:discipline:%s'
+
+    FLUSH_LESSONS = 50
+    FLUSH_INTERVAL = 500
+
+    def __init__(self, schedule_build=None, flush_lessons=FLUSH_LESSONS,
+                 flush_interval=FLUSH_INTERVAL):
+        self.schedule_build = schedule_build
+        self.flush_lessons = flush_lessons
+        self.flush_interval = flush_interval
+
+        self.hours = 0
+        self.lessons = 0
+        self.troops = defaultdict(int)
+        self.disciplines = defaultdict(int)
+        self.flushed_at = default_timer()
+
+    @staticmethod
+    def get_key(key, schedule_build=None):
+        if schedule_build is None:
+            return key
+
+        return 'build:%i:%s' % (schedule_build.id, key)
+
+    def add(self, troop_id, discipline_id, hours):
+        self.hours += hours
+        self.lessons += 1
+        self.troops[troop_id] += hours
+        self.disciplines[discipline_id] += hours
+
+        elapsed = (default_timer() - self.flushed_at) * 1000
+
+        if self.lessons >= self.flush_lessons or \
+                elapsed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        deltas = [(self.CURRENT, self.hours)]
+        deltas.extend(
+            (self.TROOP % troop_id, hours)
+            for troop_id, hours in self.troops.items()
+        )
+        deltas.extend(
+            (self.DISCIPLINE % discipline_id, hours)
+            for discipline_id, hours in self.disciplines.items()
+        )
+
+        for key, delta in deltas:
+            if delta:
+                key = self.get_key(key, self.schedule_build)
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, delta)
+
+        self.hours = 0
+        self.lessons = 0
+        self.troops.clear()
+        self.disciplines.clear()
+        self.flushed_at = default_timer()
+
+    @classmethod
+    def reset(cls, troops_load, disciplines_load, schedule_build=None):
+        values = {cls.CURRENT: sum(troops_load.values())}
+        values.update(
+            (cls.TROOP % troop_id, hours)
+            for troop_id, hours in troops_load.items()
+        )
+        values.update(
+            (cls.DISCIPLINE % discipline_id, hours)
+            for discipline_id, hours in disciplines_load.items()
+        )
+
+        cache.set_many(dict(
+            (cls.get_key(key, schedule_build), value)
+            for key, value in values.items()
+        ), timeout=None)
+
+    @classmethod
+    def reset_from_lessons(cls, troops, disciplines, lessons,
+                           schedule_build=None):
+        troops_load = dict((troop_id, 0) for troop_id in troops)
+        disciplines_load = dict(
+            (discipline_id, 0) for discipline_id in disciplines
+        )
+
+        for lesson in lessons:
+            hours = lesson.theme.duration
+            troop_id = lesson.troop.id
+            discipline_id = lesson.theme.discipline_id
+
+            troops_load[troop_id] = troops_load.get(troop_id, 0) + hours
+            disciplines_load[discipline_id] = \
+                disciplines_load.get(discipline_id, 0) + hours
+
+        cls.reset(troops_load, disciplines_load, schedule_build)
+
+    @classmethod
+    def reset_from_database(cls, schedule_build=None):
+        troops_load = dict(
+            (troop_id, 0)
+            for troop_id in Troop.objects.values_list('id', flat=True)
+        )
+        disciplines_load = dict(
+            (discipline_id, 0)
+            for discipline_id in Discipline.objects.values_list(
+                'id', flat=True
+            )
+        )
+
+        lessons = Lesson.objects.filter(build=schedule_build)
+
+        for struct in lessons.values('troop_id').annotate(
+                hours=Sum('theme__duration')):
+            troops_load[struct['troop_id']] = struct['hours']
+
+        for struct in lessons.values(
+                'theme__discipline_id').annotate(
+                hours=Sum('theme__duration')):
+            disciplines_load[struct['theme__discipline_id']] = \
+                struct['hours']
+
+        cls.reset(troops_load, disciplines_load, schedule_build)
+        cache.set(
+            cls.get_key(cls.TOTALS, schedule_build), cls.calc_totals(),
+            timeout=None
+        )
+
+    @staticmethod
+    def calc_totals():
+        course_lengths = defaultdict(list)
+
+        for specialty_id, term, discipline_id, duration, self_education in \
+                CourseLength.objects.values_list(
+                    'specialty_id', 'term', 'discipline_id', 'duration',
+                    'self_education_hours'
+                ):
+            course_lengths[(specialty_id, term)].append(
+                (discipline_id, duration + self_education)
+            )
+
+        troops_total = {}
+        disciplines_total = defaultdict(int)
+
+        for troop_id, specialty_id, term in Troop.objects.values_list(
+                'id', 'specialty_id', 'term'):
+            lengths = course_lengths[(specialty_id, term)]
+            troops_total[troop_id] = sum(length for _, length in lengths)
+
+            for discipline_id, length in lengths:
+                disciplines_total[discipline_id] += length
+
+        return {
+            'troops': troops_total,
+            'disciplines': dict(disciplines_total)
+        }
+
+    @classmethod
+    def get_breakdown(cls, schedule_build=None):
+        totals = cache.get(cls.get_key(cls.TOTALS, schedule_build)) or {
+            'troops': {}, 'disciplines': {}
+        }
+
+        return {
+            'troops': cls.get_ratios(
+                cls.TROOP, totals['troops'], schedule_build
+            ),
+            'disciplines': cls.get_ratios(
+                cls.DISCIPLINE, totals['disciplines'], schedule_build
+            )
+        }
+
+    @classmethod
+    def get_ratios(cls, key_format, totals, schedule_build=None):
+        keys = dict(
+            (cls.get_key(key_format % key_id, schedule_build), key_id)
+            for key_id in totals
+        )
+        current = cache.get_many(keys.keys())
+
+        return dict(
+            (key_id, float(current.get(key, 0)) / totals[key_id])
+            for key, key_id in keys.items() if totals[key_id]
+        )
@@ -0,0 +1,73 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import CourseLength, Theme
+
+
+def get_theme_keys(theme):
+    if theme.pk is None:
+        return set()
+
+    return CourseLength.get_theme_keys(
+        Theme.specialties.through.objects.filter(theme_id=theme.pk)
+    )
+
+
+@receiver(pre_save, sender=Theme)
+def remember_theme_course_lengths(sender, instance, **kwargs):
+    instance.course_length_keys = get_theme_keys(instance)
+
+
+@receiver(post_save, sender=Theme)
+def refresh_theme_course_lengths(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    keys = instance.course_length_keys
+
+    CourseLength.refresh(keys | set(
+        (specialty_id, instance.discipline_id, instance.term)
+        for specialty_id, _, _ in keys
+    ))
+
+
+@receiver(pre_delete, sender=Theme)
+def remember_deleted_theme_course_lengths(sender, instance, **kwargs):
+    instance.course_length_keys = get_theme_keys(instance)
+
+
+@receiver(post_delete, sender=Theme)
+def refresh_deleted_theme_course_lengths(sender, instance, **kwargs):
+    CourseLength.refresh(instance.course_length_keys)
+
+
+@receiver(m2m_changed, sender=Theme.specialties.through)
+def refresh_specialties_course_lengths(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    if action == 'pre_clear':
+        through = Theme.specialties.through.objects
+
+        if reverse:
+            through = through.filter(specialty_id=instance.pk)
+        else:
+            through = through.filter(theme_id=instance.pk)
+
+        instance.course_length_keys = CourseLength.get_theme_keys(through)
+    elif action == 'post_clear':
+        CourseLength.refresh(instance.course_length_keys)
+    elif action in ('post_add', 'post_remove'):
+        if reverse:
+            keys = set(
+                (instance.pk, discipline_id, term)
+                for discipline_id, term in Theme.objects.filter(
+                    id__in=pk_set
+                ).values_list('discipline_id', 'term')
+            )
+        else:
+            keys = set(
+                (specialty_id, instance.discipline_id, instance.term)
+                for specialty_id in pk_set
+            )
+
+        CourseLength.refresh(keys)
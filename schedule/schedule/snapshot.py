@@ -0,0 +1,172 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from .models import Troop, Discipline, Theme, Teacher, Audience, \
+    TeacherTheme, Lesson, CourseLength
+from .prerequisites import PrerequisiteGraph
+
+
+LessonRecord = namedtuple('LessonRecord', [
+    'date_of', 'initial_hour', 'troop', 'theme',
+    'teachers', 'audiences', 'self_education'
+])
+
+
+def serialize_lesson(lesson):
+    return [
+        lesson.date_of.strftime('%Y-%m-%d'), lesson.initial_hour,
+        lesson.troop.id, lesson.theme.id,
+        sorted(lesson.teachers), sorted(lesson.audiences),
+        lesson.self_education
+    ]
+
+
+def deserialize_lesson(struct, snapshot):
+    date_of, hour, troop_id, theme_id, teachers, audiences, self_ed = struct
+
+    return LessonRecord(
+        datetime.strptime(date_of, '%Y-%m-%d').date(), hour,
+        snapshot.troops_by_id[troop_id], snapshot.themes[theme_id],
+        frozenset(teachers), frozenset(audiences), self_ed
+    )
+
+
+class ScheduleSnapshot(object):
+    def __init__(self, troops, disciplines, themes, teachers, audiences):
+        self.troops = troops
+        self.troops_by_id = dict((troop.id, troop) for troop in troops)
+        self.disciplines = disciplines
+        self.themes = {}
+        self.teachers = teachers
+        self.audiences = audiences
+
+        self.specialty_disciplines = defaultdict(list)
+        self.term_themes = defaultdict(list)
+        self.course_lengths = {}
+
+        self.main_teachers = defaultdict(list)
+        self.alternative_teachers = defaultdict(list)
+        self.theme_audiences = defaultdict(list)
+        self.previous_themes = defaultdict(list)
+        self.prerequisites = None
+
+        self.schedule_build = None
+        self.lessons = []
+
+        for theme in themes:
+            self.themes[theme.id] = theme
+            self.term_themes[(theme.discipline_id, theme.term)].append(theme)
+
+    @classmethod
+    def load(cls, schedule_build=None, with_lessons=True,
+             with_relations=True):
+        snapshot = cls(
+            list(Troop.objects.select_related('specialty')),
+            Discipline.objects.in_bulk(),
+            Theme.objects.order_by('discipline', 'term', 'sort_key', 'id'),
+            Teacher.objects.in_bulk(),
+            Audience.objects.in_bulk()
+        )
+
+        snapshot.schedule_build = schedule_build
+
+        if with_relations:
+            snapshot.load_relations()
+
+        if with_lessons:
+            snapshot.load_lessons()
+
+        return snapshot
+
+    def load_relations(self):
+        self.index_course_lengths(CourseLength.objects.values_list(
+            'specialty_id', 'discipline_id', 'term', 'duration',
+            'self_education_hours'
+        ))
+
+        teacher_themes = TeacherTheme.objects.order_by(
+            'teacher_id'
+        ).values_list('theme_id', 'teacher_id', 'alternative')
+
+        for theme_id, teacher_id, alternative in teacher_themes:
+            if alternative:
+                teachers = self.alternative_teachers[theme_id]
+            else:
+                teachers = self.main_teachers[theme_id]
+
+            teachers.append(self.teachers[teacher_id])
+
+        theme_audiences = Theme.audiences.through.objects.order_by(
+            'audience_id'
+        ).values_list('theme_id', 'audience_id')
+
+        for theme_id, audience_id in theme_audiences:
+            self.theme_audiences[theme_id].append(self.audiences[audience_id])
+
+        previous_themes = Theme.previous_themes.through.objects.values_list(
+            'from_theme_id', 'to_theme_id'
+        )
+
+        for theme_id, previous_theme_id in previous_themes:
+            self.previous_themes[theme_id].append(previous_theme_id)
+
+        self.prerequisites = PrerequisiteGraph.compile(
+            self.themes, self.previous_themes
+        )
+
+    def index_course_lengths(self, course_lengths):
+        disciplines_ids = defaultdict(set)
+
+        for specialty_id, discipline_id, term, duration, self_ed in \
+                course_lengths:
+            disciplines_ids[specialty_id].add(discipline_id)
+            self.course_lengths[(discipline_id, term, specialty_id)] = (
+                duration, self_ed
+            )
+
+        for specialty_id, ids in disciplines_ids.items():
+            self.specialty_disciplines[specialty_id] = [
+                self.disciplines[discipline_id]
+                for discipline_id in sorted(ids)
+            ]
+
+    def load_lessons(self):
+        lessons_teachers = defaultdict(set)
+        lessons_audiences = defaultdict(set)
+
+        for lesson_id, teacher_id in Lesson.teachers.through.objects \
+                .filter(lesson__build=self.schedule_build) \
+                .values_list('lesson_id', 'teacher_id'):
+            lessons_teachers[lesson_id].add(teacher_id)
+
+        for lesson_id, audience_id in Lesson.audiences.through.objects \
+                .filter(lesson__build=self.schedule_build) \
+                .values_list('lesson_id', 'audience_id'):
+            lessons_audiences[lesson_id].add(audience_id)
+
+        lessons = Lesson.objects.filter(
+            build=self.schedule_build
+        ).values_list(
+            'id', 'date_of', 'initial_hour', 'troop_id',
+            'theme_id', 'self_education'
+        )
+
+        for lesson_id, date_of, hour, troop_id, theme_id, self_ed in lessons:
+            self.lessons.append(LessonRecord(
+                date_of, hour, self.troops_by_id[troop_id],
+                self.themes[theme_id],
+                frozenset(lessons_teachers[lesson_id]),
+                frozenset(lessons_audiences[lesson_id]),
+                self_ed
+            ))
+
+    def get_ordered_themes(self, discipline, term):
+        return self.term_themes[(discipline.id, term)]
+
+    def get_course_length(self, discipline, term, specialty):
+        return self.course_lengths.get(
+            (discipline.id, term, specialty.id), (0, 0)
+        )
+
+    def calc_course_length(self, discipline, term, specialty):
+        return sum(self.get_course_length(discipline, term, specialty))
@@ -0,0 +1,323 @@
+from collections import defaultdict
+from datetime import timedelta
+from itertools import combinations, islice
+
+from .builder import SnapshotScheduleBuilder
+from .occupancy import OccupancyIndex, TimeSlot
+from .snapshot import LessonRecord
+
+
+class SearchFrame(object):
+    def __init__(self, troop, date, options):
+        self.troop = troop
+        self.date = date
+        self.options = options
+        self.index = 0
+
+        self.lesson = None
+        self.journal = None
+        self.completed = None
+        self.domains = None
+
+
+class PropagationScheduleBuilder(SnapshotScheduleBuilder):
+    MAX_BACKTRACKS = 20
+    MAX_VARIANTS = 3
+
+    def __init__(self, *args, **kwargs):
+        self.max_backtracks = kwargs.pop(
+            'max_backtracks', self.MAX_BACKTRACKS
+        )
+
+        super(PropagationScheduleBuilder, self).__init__(*args, **kwargs)
+
+        self.domains = {}
+        self.backtracks = 0
+
+    def build_week(self, date, week):
+        monday = date - timedelta(days=date.weekday())
+        days = defaultdict(list)
+
+        for troop in self.get_troops():
+            days[monday + timedelta(days=troop.day)].append(troop)
+
+        for day in sorted(days):
+            if self.start_date is None or day >= self.start_date:
+                self.build_date(day, days[day])
+
+        self.commit_week(date, week)
+
+    def build_date(self, date, troops):
+        hours = dict((troop.id, 0) for troop in troops)
+        stack = []
+
+        self.domains = {}
+        self.backtracks = 0
+
+        while True:
+            troop, options = self.select_troop(troops, date, hours)
+
+            if troop is None:
+                break
+
+            if options:
+                frame = SearchFrame(troop, date, options)
+
+                if self.advance(frame, troops, hours):
+                    stack.append(frame)
+                    continue
+
+            if self.backtrack(stack, troops, hours):
+                continue
+
+            frame = self.place_fallback(troop, date, hours)
+
+            if frame is not None:
+                stack.append(frame)
+
+        for frame in stack:
+            self.unit_of_work.add(frame.lesson)
+            self.report_progress(
+                frame.troop, frame.lesson.theme, frame.lesson.theme.duration
+            )
+
+    def select_troop(self, troops, date, hours):
+        selected, selected_options = None, None
+
+        for troop in troops:
+            options = self.get_domain(troop, date, hours[troop.id])
+
+            if options is None:
+                continue
+
+            if not options:
+                return troop, options
+
+            if selected is None or len(options) < len(selected_options):
+                selected, selected_options = troop, options
+
+        return selected, selected_options
+
+    def advance(self, frame, troops, hours):
+        while frame.index < len(frame.options):
+            option = frame.options[frame.index]
+            frame.index += 1
+
+            self.place(frame, option, hours)
+
+            if self.is_consistent(troops, frame.date, hours):
+                return True
+
+            self.unplace(frame, hours)
+
+        return False
+
+    def backtrack(self, stack, troops, hours):
+        changed = False
+
+        while stack and self.backtracks < self.max_backtracks:
+            frame = stack.pop()
+
+            self.unplace(frame, hours)
+            self.backtracks += 1
+            changed = True
+
+            if self.advance(frame, troops, hours):
+                stack.append(frame)
+                break
+
+        return changed
+
+    def is_consistent(self, troops, date, hours):
+        for troop in troops:
+            if self.get_domain(troop, date, hours[troop.id]) == []:
+                return False
+
+        return True
+
+    def get_domain(self, troop, date, hour):
+        if troop.id not in self.domains:
+            self.domains[troop.id] = self.find_options(troop, date, hour)
+
+        return self.domains[troop.id][0]
+
+    def find_options(self, troop, date, hour):
+        resources = set()
+
+        if hour >= self.get_lesson_hours():
+            return None, resources
+
+        disciplines = self.get_disciplines_by_priority(troop)
+
+        if not disciplines or disciplines[0][1] == 1:
+            return None, resources
+
+        themes = self.get_sorted_head_themes(
+            self.fetch_disciplines_head_themes(troop, hour, disciplines)
+        )
+
+        if not themes:
+            return None, resources
+
+        options = []
+
+        for theme in themes:
+            main_teachers = self.get_main_teachers(theme)
+            alternative_teachers = self.get_alternative_teachers(theme)
+            audiences = self.snapshot.theme_audiences[theme.id]
+
+            resources.add((OccupancyIndex.THEME, theme.id))
+            resources.update(
+                (OccupancyIndex.TEACHER, teacher.id)
+                for teacher in main_teachers + alternative_teachers
+            )
+            resources.update(
+                (OccupancyIndex.AUDIENCE, audience.id)
+                for audience in audiences
+            )
+
+            options.extend(self.find_theme_options(
+                theme, TimeSlot(date, hour, theme.duration)
+            ))
+
+        return options, resources
+
+    def find_theme_options(self, theme, slot):
+        if self.is_theme_parallel(theme, slot):
+            return []
+
+        teachers = self.sort_teachers_by_priority(
+            self.find_free_teachers(self.get_main_teachers(theme), slot)
+        ) + self.sort_teachers_by_priority(
+            self.find_free_teachers(self.get_alternative_teachers(theme), slot)
+        )
+        audiences = self.find_free_audiences(theme, slot)
+
+        teachers_variants = list(islice(
+            combinations(teachers, theme.teachers_count), self.MAX_VARIANTS
+        ))
+        audiences_variants = list(islice(
+            combinations(audiences, theme.audiences_count), self.MAX_VARIANTS
+        ))
+
+        if not teachers_variants or not audiences_variants:
+            return []
+
+        return [
+            (theme, variant, audiences_variants[0])
+            for variant in teachers_variants
+        ] + [
+            (theme, teachers_variants[0], variant)
+            for variant in audiences_variants[1:]
+        ]
+
+    def place(self, frame, option, hours):
+        theme, teachers, audiences = option
+        troop = frame.troop
+
+        lesson = LessonRecord(
+            frame.date, hours[troop.id], troop, theme,
+            frozenset(teacher.id for teacher in teachers),
+            frozenset(audience.id for audience in audiences),
+            False
+        )
+
+        frame.lesson = lesson
+        frame.journal = [
+            (kind, key, self.occupancy.get_occupied(lesson.date_of, kind, key))
+            for kind, key in OccupancyIndex.get_lesson_keys(lesson)
+        ]
+        frame.completed = self.completed_themes[troop.id]
+        frame.domains = dict(self.domains)
+
+        self.register_lesson(lesson)
+        self.teacher_load.add_lesson(lesson)
+
+        hours[troop.id] += theme.duration
+        self.prune_domains(lesson, hours)
+
+    def unplace(self, frame, hours):
+        lesson = frame.lesson
+        troop, theme = lesson.troop, lesson.theme
+
+        for kind, key, occupied in frame.journal:
+            self.occupancy.set_occupied(lesson.date_of, kind, key, occupied)
+
+        self.troop_themes[troop.id].discard((theme.id, False))
+        self.completed_themes[troop.id] = frame.completed
+
+        cursor = self.theme_cursors.get((troop.id, theme.discipline_id))
+
+        if cursor is not None:
+            cursor.rewind(theme)
+
+        if theme.term == troop.term:
+            self.get_discipline_progress(troop).add(
+                theme.discipline_id, -theme.duration
+            )
+
+        for teacher_id in lesson.teachers:
+            self.teacher_load.add(teacher_id, -theme.duration)
+
+        hours[troop.id] -= theme.duration
+        self.domains = frame.domains
+
+        frame.lesson = None
+
+    def place_fallback(self, troop, date, hours):
+        lesson_dependencies = self.find_lesson_dependencies(
+            self.get_disciplines_by_priority(troop), troop, date,
+            hours[troop.id]
+        )
+
+        if lesson_dependencies is None:
+            self.domains[troop.id] = (None, set())
+            return None
+
+        frame = SearchFrame(troop, date, [])
+        self.place(frame, lesson_dependencies, hours)
+
+        return frame
+
+    def prune_domains(self, lesson, hours):
+        keys = set(OccupancyIndex.get_lesson_keys(lesson))
+
+        for troop_id, (options, resources) in list(self.domains.items()):
+            if troop_id == lesson.troop.id:
+                del self.domains[troop_id]
+                continue
+
+            if not options or not keys & resources:
+                continue
+
+            pruned = [
+                option for option in options
+                if not self.is_blocked(option, hours[troop_id], lesson, keys)
+            ]
+
+            if pruned:
+                self.domains[troop_id] = (pruned, resources)
+            else:
+                del self.domains[troop_id]
+
+    @staticmethod
+    def is_blocked(option, hour, lesson, keys):
+        theme, teachers, audiences = option
+
+        if hour >= lesson.initial_hour + lesson.theme.duration or \
+                lesson.initial_hour >= hour + theme.duration:
+            return False
+
+        return (OccupancyIndex.THEME, theme.id) in keys or any(
+            (OccupancyIndex.TEACHER, teacher.id) in keys
+            for teacher in teachers
+        ) or any(
+            (OccupancyIndex.AUDIENCE, audience.id) in keys
+            for audience in audiences
+        )
+
+
+STRATEGIES = {
+    'greedy': SnapshotScheduleBuilder,
+    'propagation': PropagationScheduleBuilder
+}
@@ -1,12 +1,236 @@
+from contextlib import contextmanager
 from datetime import datetime
-from celery import shared_task
+from uuid import uuid4
 
-from .builder import ScheduleBuilder
+from celery import chord, shared_task
+from celery.exceptions import Ignore
+from django.db import transaction
+
+from .builder import SnapshotScheduleBuilder, DryRunScheduleBuilder
+from .distributed import DistributedScheduleBuilder, get_reservation_store, \
+    split_troops
+from .models import Troop, Lesson, ScheduleBuild, BuildCheckpoint, \
+    CheckpointLockedError
+from .parallel import PartitionsMerger
+from .persistence import LessonCollector, LessonUnitOfWork, clear_lessons
+from .profiling import BuildProfiler
+from .progress import BuildProgress
+from .snapshot import ScheduleSnapshot, serialize_lesson, deserialize_lesson
+from .solver import STRATEGIES
+
+
+def get_schedule_build(build_id):
+    if build_id is None:
+        return None
+
+    return ScheduleBuild.objects.get(id=build_id)
+
+
+@contextmanager
+def track_schedule_build(schedule_build):
+    if schedule_build is not None:
+        schedule_build.start()
+
+    try:
+        yield
+    except CheckpointLockedError:
+        raise Ignore()
+    except Exception:
+        if schedule_build is not None:
+            schedule_build.set_status(ScheduleBuild.FAILED)
+
+        raise
+
+
+def publish_schedule_build(schedule_build):
+    if schedule_build is not None:
+        schedule_build.set_status(ScheduleBuild.FINISHED)
+        schedule_build.publish()
+        prune_schedule_builds(schedule_build)
+
+
+def delete_schedule_builds(schedule_builds):
+    with transaction.atomic():
+        clear_lessons(Lesson.objects.filter(build__in=schedule_builds))
+        schedule_builds.delete()
+
+
+def prune_schedule_builds(published):
+    delete_schedule_builds(ScheduleBuild.objects.filter(
+        id__lt=published.id, published_at__isnull=True,
+        status__in=ScheduleBuild.DONE_STATUSES
+    ))
+
+
+def inherit_lessons(schedule_build, start_date, troops=None):
+    with transaction.atomic():
+        clear_lessons(schedule_build.lessons.all())
+
+        if schedule_build.parent is not None:
+            lessons = schedule_build.parent.lessons.all()
+            rebuilt = lessons.filter(date_of__gte=start_date)
+
+            if troops:
+                rebuilt = rebuilt.filter(troop__in=troops)
+
+            LessonUnitOfWork(schedule_build).copy(
+                lessons.exclude(id__in=rebuilt.values('id'))
+            )
+
+    BuildProgress.reset_from_database(schedule_build)
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def build_schedule(self, date, term_length, profile=False,
+                   strategy='greedy', build_id=None):
+    date_instance = datetime.strptime(date, '%Y-%m-%d')
+    schedule_build = get_schedule_build(build_id)
+
+    builder = STRATEGIES[strategy](
+        checkpoint_key=self.request.id, schedule_build=schedule_build
+    )
+
+    if not profile:
+        with track_schedule_build(schedule_build):
+            builder.build(date_instance, term_length)
+
+        publish_schedule_build(schedule_build)
+        return
+
+    profiler = BuildProfiler()
+
+    with track_schedule_build(schedule_build):
+        profiler.instrument(builder).build(date_instance, term_length)
+
+    publish_schedule_build(schedule_build)
+
+    return {'profile': profiler.get_report()}
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def rebuild_schedule(self, date, term_length, troops=None, build_id=None):
+    date_instance = datetime.strptime(date, '%Y-%m-%d').date()
+    schedule_build = get_schedule_build(build_id)
+
+    with track_schedule_build(schedule_build):
+        if schedule_build is not None and not BuildCheckpoint.objects.filter(
+                task_id=self.request.id).exists():
+            inherit_lessons(schedule_build, date_instance, troops)
+
+        builder = SnapshotScheduleBuilder(
+            checkpoint_key=self.request.id, troops=troops,
+            start_date=date_instance, schedule_build=schedule_build
+        )
+        builder.build(date_instance, term_length)
+
+    publish_schedule_build(schedule_build)
 
 
 @shared_task
-def build_schedule(date, term_length):
+def dry_run_schedule(date, term_length, overrides=None):
+    date_instance = datetime.strptime(date, '%Y-%m-%d')
+
+    builder = DryRunScheduleBuilder(overrides=overrides)
+    builder.build(date_instance, term_length)
+
+    return {
+        'summary': builder.get_summary(),
+        'lessons': [
+            serialize_lesson(lesson)
+            for lesson in builder.unit_of_work.lessons
+        ]
+    }
+
+
+@shared_task
+def build_schedule_partition(date, term_length, day, strategy='greedy',
+                             build_id=None):
+    date_instance = datetime.strptime(date, '%Y-%m-%d')
+    schedule_build = get_schedule_build(build_id)
+
+    builder = STRATEGIES[strategy](
+        unit_of_work=LessonCollector(), days=[day],
+        schedule_build=schedule_build
+    )
+
+    with track_schedule_build(schedule_build):
+        builder.build(date_instance, term_length)
+
+    return [
+        serialize_lesson(lesson) for lesson in builder.unit_of_work.lessons
+    ]
+
+
+@shared_task
+def merge_schedule_partitions(partitions, build_id=None):
+    schedule_build = get_schedule_build(build_id)
+
+    with track_schedule_build(schedule_build):
+        snapshot = ScheduleSnapshot.load(schedule_build)
+
+        PartitionsMerger(snapshot).merge([
+            [deserialize_lesson(struct, snapshot) for struct in partition]
+            for partition in partitions
+        ])
+
+    publish_schedule_build(schedule_build)
+
+
+def build_schedule_parallel(date, term_length, strategy='greedy',
+                            build_id=None):
+    days = sorted(set(Troop.objects.values_list('day', flat=True)))
+
+    if not days:
+        return merge_schedule_partitions.delay([], build_id=build_id)
+
+    return chord(
+        build_schedule_partition.s(date, term_length, day, strategy, build_id)
+        for day in days
+    )(merge_schedule_partitions.s(build_id=build_id))
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def build_schedule_shard(self, date, term_length, troops, namespace,
+                         build_id=None):
     date_instance = datetime.strptime(date, '%Y-%m-%d')
+    schedule_build = get_schedule_build(build_id)
+
+    builder = DistributedScheduleBuilder(
+        get_reservation_store(namespace, self.request.id),
+        checkpoint_key=self.request.id,
+        troops=troops, schedule_build=schedule_build
+    )
+
+    with track_schedule_build(schedule_build):
+        builder.build(date_instance, term_length)
+
 
-    builder = ScheduleBuilder()
-    builder.build(date_instance, term_length)
\ No newline at end of file
+@shared_task
+def finish_distributed_build(results, namespace, build_id=None):
+    get_reservation_store(namespace).clear()
+    publish_schedule_build(get_schedule_build(build_id))
+
+
+def build_schedule_distributed(date, term_length, shards, build_id=None):
+    troops = list(Troop.objects.order_by('day', 'id').values_list(
+        'id', flat=True
+    ))
+    namespace = uuid4().hex
+
+    if not troops:
+        return finish_distributed_build.delay(
+            [], namespace, build_id=build_id
+        )
+
+    return chord(
+        build_schedule_shard.s(date, term_length, shard, namespace, build_id)
+        for shard in split_troops(troops, shards)
+    )(finish_distributed_build.s(namespace, build_id=build_id))
+
+
+@shared_task
+def delete_schedule_build(build_id):
+    delete_schedule_builds(ScheduleBuild.objects.filter(
+        id=build_id, published=False,
+        status__in=ScheduleBuild.DONE_STATUSES
+    ))
@@ -0,0 +1,172 @@
+from datetime import date
+from unittest import TestCase as SimpleTestCase
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..assignment import ResourceAssigner, solve_assignment
+from ..builder import SnapshotScheduleBuilder
+from ..factories import AudienceFactory, TeacherFactory, ThemeFactory, \
+    TroopFactory
+from ..models import Theme
+from ..occupancy import OccupancyIndex
+from ..persistence import LessonCollector
+from ..snapshot import ScheduleSnapshot, LessonRecord
+from ..tracking import TeacherLoad
+from .snapshot_test import CurriculumMixin
+
+
+class SolveAssignmentTest(SimpleTestCase):
+    def test_square(self):
+        self.assertEquals(solve_assignment([
+            [4, 1, 3],
+            [2, 0, 5],
+            [3, 2, 2]
+        ]), [1, 0, 2])
+
+    def test_rectangular(self):
+        self.assertEquals(solve_assignment([
+            [7, 3, 9, 1],
+            [2, 8, 6, 1]
+        ]), [3, 0])
+
+    def test_empty(self):
+        self.assertEquals(solve_assignment([]), [])
+
+    def test_more_requests_than_resources(self):
+        requests = [(1, {'a': 1}), (1, {'a': 0}), (1, {'a': 2, 'b': 5})]
+
+        self.assertEquals(
+            ResourceAssigner(None, None, None).solve(requests, [0, 1, 2]),
+            {0: set(), 1: set(['a']), 2: set(['b'])}
+        )
+
+    def test_large_component_falls_back_to_greedy(self):
+        assigner = ResourceAssigner(None, None, None)
+        assigner.MAX_ROWS = 1
+
+        self.assertEquals(assigner.match_component(
+            [(1, {'a': 0, 'b': 1}), (1, {'a': 0})], [0, 1]
+        ), {0: ['b'], 1: ['a']})
+
+
+class ResourceAssignerTest(TestCase):
+    def setUp(self):
+        self.date = date(2017, 9, 4)
+        self.troops = TroopFactory.create_batch(2)
+        self.teachers = TeacherFactory.create_batch(3, work_hours_limit=100)
+        self.audience = AudienceFactory()
+
+        self.shared = self.create_theme(self.teachers[0:2])
+        self.single = self.create_theme(self.teachers[0:1])
+
+        self.snapshot = ScheduleSnapshot.load()
+        self.occupancy = OccupancyIndex()
+        self.teacher_load = TeacherLoad.load(self.snapshot.teachers)
+
+    def create_theme(self, teachers, **kwargs):
+        theme = ThemeFactory(duration=2, **kwargs)
+        theme.audiences.set([self.audience])
+        Theme.set_teachers(theme, teachers, [])
+
+        return theme
+
+    def create_lesson(self, troop, theme, teachers, hour=0):
+        lesson = LessonRecord(
+            self.date, hour, troop, self.snapshot.themes[theme.id],
+            frozenset(teacher.id for teacher in teachers),
+            frozenset(), False
+        )
+
+        self.occupancy.add_lesson(lesson)
+        self.teacher_load.add_lesson(lesson)
+
+        return lesson
+
+    def assign(self, lessons):
+        return ResourceAssigner(
+            self.snapshot, self.occupancy, self.teacher_load
+        ).assign(lessons)
+
+    def test_assign_teachers(self):
+        lessons = self.assign([
+            self.create_lesson(
+                self.troops[0], self.shared, self.teachers[0:1]
+            ),
+            self.create_lesson(self.troops[1], self.single, [])
+        ])
+
+        self.assertEquals(
+            [lesson.teachers for lesson in lessons],
+            [frozenset([self.teachers[1].id]),
+             frozenset([self.teachers[0].id])]
+        )
+        self.assertEquals(
+            [lesson.audiences for lesson in lessons],
+            [frozenset([self.audience.id]), frozenset()]
+        )
+        self.assertEquals(self.teacher_load.hours[self.teachers[0].id], 2)
+        self.assertEquals(self.teacher_load.hours[self.teachers[1].id], 2)
+        self.assertEquals(OccupancyIndex.find_conflicts(lessons), [])
+
+    def test_assign_all_or_nothing(self):
+        theme = self.create_theme(self.teachers[0:1], teachers_count=2)
+        self.snapshot = ScheduleSnapshot.load()
+
+        lessons = self.assign([
+            self.create_lesson(self.troops[0], theme, [])
+        ])
+
+        self.assertEquals(lessons[0].teachers, frozenset())
+
+    def test_assign_keeps_other_windows(self):
+        lessons = self.assign([
+            self.create_lesson(
+                self.troops[0], self.single, self.teachers[0:1]
+            ),
+            self.create_lesson(
+                self.troops[1], self.single, self.teachers[0:1], hour=2
+            )
+        ])
+
+        self.assertEquals(
+            [lesson.teachers for lesson in lessons],
+            [frozenset([self.teachers[0].id])] * 2
+        )
+
+
+    def test_assign_skips_staffed_windows(self):
+        theme = self.create_theme(self.teachers[0:2], audiences_count=0)
+        self.snapshot = ScheduleSnapshot.load()
+        self.teacher_load.add(self.teachers[0].id, 50)
+
+        lessons = [
+            self.create_lesson(self.troops[0], theme, self.teachers[0:1]),
+            self.create_lesson(self.troops[1], theme, self.teachers[1:2])
+        ]
+
+        self.assertEquals(self.assign(lessons), lessons)
+
+
+class MatchingBuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum(troops_count=4)
+        cache.set('current_term_load', 0, timeout=None)
+
+    def build(self):
+        builder = SnapshotScheduleBuilder(unit_of_work=LessonCollector())
+        builder.build(date(2017, 9, 4), 2)
+
+        return builder.unit_of_work.lessons
+
+    def test_build(self):
+        greedy = self.build()
+
+        with override_settings(RESOURCE_ASSIGNMENT='matching'):
+            matched = self.build()
+
+        self.assertEquals(OccupancyIndex.find_conflicts(matched), [])
+        self.assertLessEqual(
+            len([lesson for lesson in matched if not lesson.teachers]),
+            len([lesson for lesson in greedy if not lesson.teachers])
+        )
@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from ..management.commands.benchmark_builder import Command
+
+
+class BenchmarkBuilderTest(TestCase):
+    def setUp(self):
+        self.command = Command()
+
+    def test_run_case(self):
+        self.command.generate_dataset(2, 5)
+        result = self.command.run_case('snapshot', 1)
+
+        self.assertTrue(result['lessons'] > 0)
+        self.assertTrue(result['queries'] > 0)
+        self.assertEquals(
+            result['lessons_per_second'], result['lessons'] / result['time']
+        )
+
+    def test_compare(self):
+        baseline = {
+            'first': {'time': 1.0, 'queries': 10, 'memory': 2048},
+            'second': {'time': 1.0, 'queries': 10, 'memory': 0}
+        }
+        results = {
+            'first': {'time': 1.1, 'queries': 11, 'memory': 4096},
+            'second': {'time': 1.6, 'queries': 10, 'memory': 512},
+            'third': {'time': 9.0, 'queries': 99, 'memory': 0}
+        }
+
+        self.assertEquals(self.command.compare(results, baseline, 0.2), [
+            'first memory: 4096 > 2048',
+            'second time: 1.6 > 1.0'
+        ])
@@ -136,6 +136,17 @@ class ScheduleBuilderTest(TestCase):
 
         self.assertFalse(len(in_same_time))
 
+    def test_get_lessons_in_same_time_with_short_lesson(self):
+        troops = TroopFactory.create_batch(2)
+
+        lesson = LessonFactory(
+            initial_hour=1, theme=ThemeFactory(duration=1), troop=troops[0]
+        )
+
+        self.assertEquals(self.builder.get_lessons_in_same_time(
+            ThemeFactory(duration=2), troops[1], lesson.date_of, 0
+        ), [lesson])
+
     def test_get_disciplines_by_priority(self):
         specialty = SpecialtyFactory()
         term = 5
@@ -175,6 +186,23 @@ class ScheduleBuilderTest(TestCase):
         result = self.builder.get_next_theme(discipline, troop)
         self.assertEquals(theme_one, result)
 
+    def test_get_next_theme_orders_number_parts(self):
+        discipline = DisciplineFactory()
+        troop = TroopFactory(term=3)
+
+        theme_one = ThemeFactory(number='1.10', discipline=discipline, term=3)
+        theme_two = ThemeFactory(number='1.2', discipline=discipline, term=3)
+
+        self.assertEquals(
+            self.builder.get_next_theme(discipline, troop), theme_two
+        )
+
+        LessonFactory(theme=theme_two, troop=troop)
+
+        self.assertEquals(
+            self.builder.get_next_theme(discipline, troop), theme_one
+        )
+
     def test_check_prev_themes_should_be_found(self):
         troop = TroopFactory()
         theme = ThemeFactory()
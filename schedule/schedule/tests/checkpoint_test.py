@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.timezone import now
+from mock import patch
+
+from ..builder import SnapshotScheduleBuilder
+from ..models import Lesson, BuildCheckpoint, CheckpointLockedError
+from .snapshot_test import CurriculumMixin
+
+
+class CheckpointedBuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+    def build_interrupted(self, failed_date):
+        original = SnapshotScheduleBuilder.build_day
+
+        def build_day(builder, troop, date_of):
+            if date_of == failed_date:
+                raise RuntimeError('Worker lost')
+
+            return original(builder, troop, date_of)
+
+        with patch.object(SnapshotScheduleBuilder, 'build_day', build_day):
+            with self.assertRaises(RuntimeError):
+                SnapshotScheduleBuilder(checkpoint_key='task').build(
+                    date(2017, 9, 4), 3
+                )
+
+    def test_checkpoint_after_week(self):
+        self.build_interrupted(date(2017, 9, 11))
+
+        checkpoint = BuildCheckpoint.objects.get(task_id='task')
+
+        self.assertEquals(checkpoint.week, 0)
+        self.assertEquals(checkpoint.date_of, date(2017, 9, 4))
+        self.assertFalse(
+            Lesson.objects.filter(date_of__gt=date(2017, 9, 4)).exists()
+        )
+
+    def test_checkpoint_without_term_load_in_cache(self):
+        cache.delete('current_term_load')
+
+        self.build_interrupted(date(2017, 9, 11))
+
+        self.assertEquals(
+            BuildCheckpoint.objects.get(task_id='task').week, 0
+        )
+
+    def test_resume(self):
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 3)
+        expected = self.get_lessons_struct()
+
+        Lesson.objects.all().delete()
+        cache.set('current_term_load', 0, timeout=None)
+
+        self.build_interrupted(date(2017, 9, 11))
+        cache.set('current_term_load', 1000, timeout=None)
+
+        with patch.object(SnapshotScheduleBuilder, 'build_week',
+                          autospec=True,
+                          side_effect=SnapshotScheduleBuilder.build_week) \
+                as build_week:
+            SnapshotScheduleBuilder(checkpoint_key='task').build(
+                date(2017, 9, 4), 3
+            )
+
+        self.assertEquals(
+            [c[0][2] for c in build_week.call_args_list], [1, 2]
+        )
+        self.assertEquals(self.get_lessons_struct(), expected)
+        self.assertEquals(
+            int(cache.get('current_term_load')),
+            sum(lesson.theme.duration for lesson in Lesson.objects.all())
+        )
+        self.assertFalse(BuildCheckpoint.objects.exists())
+
+    def test_locked_checkpoint(self):
+        BuildCheckpoint.objects.create(
+            task_id='task', week=0, date_of=date(2017, 9, 4), owner='other',
+            locked_until=now() + timedelta(minutes=10)
+        )
+
+        with self.assertRaises(CheckpointLockedError):
+            SnapshotScheduleBuilder(checkpoint_key='task').build(
+                date(2017, 9, 4), 3
+            )
+
+        self.assertFalse(Lesson.objects.exists())
+        self.assertEquals(BuildCheckpoint.objects.get().owner, 'other')
+
+    def test_expired_lock_is_taken_over(self):
+        self.build_interrupted(date(2017, 9, 11))
+        BuildCheckpoint.objects.update(
+            owner='other', locked_until=now() - timedelta(minutes=10)
+        )
+
+        SnapshotScheduleBuilder(checkpoint_key='task').build(
+            date(2017, 9, 4), 3
+        )
+
+        self.assertTrue(
+            Lesson.objects.filter(date_of=date(2017, 9, 18)).exists()
+        )
+        self.assertFalse(BuildCheckpoint.objects.exists())
+
+    def test_taken_over_build_stops_writing(self):
+        original = SnapshotScheduleBuilder.build_day
+
+        def build_day(builder, troop, date_of):
+            if date_of == date(2017, 9, 11):
+                BuildCheckpoint.objects.update(owner='other')
+
+            return original(builder, troop, date_of)
+
+        with patch.object(SnapshotScheduleBuilder, 'build_day', build_day):
+            with self.assertRaises(CheckpointLockedError):
+                SnapshotScheduleBuilder(checkpoint_key='task').build(
+                    date(2017, 9, 4), 3
+                )
+
+        self.assertFalse(
+            Lesson.objects.filter(date_of__gt=date(2017, 9, 4)).exists()
+        )
+        self.assertEquals(BuildCheckpoint.objects.get().week, 0)
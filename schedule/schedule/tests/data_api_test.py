@@ -425,6 +425,23 @@ class ThemeApiTest(ScheduleApiTestMixin, APITestCase):
             [self.serialize_theme(theme)]
         )
 
+    def test_creation_with_invalid_number(self):
+        payload = {
+            'name': 'Some Theme Name',
+            'number': '1.a',
+            'term': 5,
+            'duration': 2,
+            'audiences_count': 1,
+            'teachers_count': 1
+        }
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('number', response.json())
+
     def test_creation(self):
         discipline = DisciplineFactory()
         theme_type = ThemeTypeFactory()
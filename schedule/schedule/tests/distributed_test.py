@@ -0,0 +1,238 @@
+import os
+from datetime import date
+from unittest import skipIf
+
+import redis
+from django.core.cache import cache
+from django.test import TestCase
+from mock import Mock, patch
+
+from ..distributed import LocalReservationStore, RedisReservationStore, \
+    get_reservation_store, split_troops
+from ..models import Lesson
+from ..occupancy import OccupancyIndex, TimeSlot
+from ..tasks import build_schedule_shard, build_schedule_distributed, \
+    finish_distributed_build
+from .snapshot_test import CurriculumMixin
+
+
+def get_redis_client():
+    client = redis.StrictRedis.from_url(
+        os.environ.get('TEST_REDIS_URL', 'redis://localhost:6379/15')
+    )
+
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        return None
+
+    return client
+
+
+redis_client = get_redis_client()
+
+
+class ReservationStoreTest(TestCase):
+    def setUp(self):
+        self.store = self.create_store('test', 'shard')
+        self.slot = TimeSlot(date(2017, 9, 4), 2, 2)
+
+    def tearDown(self):
+        self.store.clear()
+        self.create_store('other').clear()
+
+    def create_store(self, namespace, owner=None):
+        return LocalReservationStore(namespace, owner)
+
+    def test_reserve(self):
+        self.assertTrue(self.store.reserve(
+            self.slot, OccupancyIndex.TEACHER, 1
+        ))
+        self.assertFalse(self.store.reserve(
+            TimeSlot(date(2017, 9, 4), 3, 2), OccupancyIndex.TEACHER, 1
+        ))
+        self.assertTrue(self.store.reserve(
+            TimeSlot(date(2017, 9, 4), 4, 2), OccupancyIndex.TEACHER, 1
+        ))
+        self.assertTrue(self.store.reserve(
+            self.slot, OccupancyIndex.AUDIENCE, 1
+        ))
+
+    def test_release(self):
+        self.store.reserve(self.slot, OccupancyIndex.TEACHER, 1)
+        self.store.release(self.slot, OccupancyIndex.TEACHER, 1)
+
+        self.assertTrue(
+            self.store.is_free(self.slot, OccupancyIndex.TEACHER, 1)
+        )
+
+    def test_namespace_is_shared(self):
+        self.store.reserve(self.slot, OccupancyIndex.TEACHER, 1)
+
+        self.assertFalse(self.create_store('test').is_free(
+            self.slot, OccupancyIndex.TEACHER, 1
+        ))
+        self.assertTrue(self.create_store('other').is_free(
+            self.slot, OccupancyIndex.TEACHER, 1
+        ))
+
+    def test_rollback_releases_uncommitted_claims(self):
+        committed = TimeSlot(date(2017, 9, 4), 0, 2)
+        self.store.reserve(committed, OccupancyIndex.TEACHER, 1)
+        self.store.commit()
+        self.store.reserve(self.slot, OccupancyIndex.TEACHER, 1)
+        self.create_store('test', 'other').reserve(
+            self.slot, OccupancyIndex.AUDIENCE, 1
+        )
+
+        self.create_store('test', 'shard').rollback()
+
+        self.assertFalse(
+            self.store.is_free(committed, OccupancyIndex.TEACHER, 1)
+        )
+        self.assertTrue(
+            self.store.is_free(self.slot, OccupancyIndex.TEACHER, 1)
+        )
+        self.assertFalse(
+            self.store.is_free(self.slot, OccupancyIndex.AUDIENCE, 1)
+        )
+
+    def test_released_claims_are_not_rolled_back(self):
+        self.store.reserve(self.slot, OccupancyIndex.TEACHER, 1)
+        self.store.release(self.slot, OccupancyIndex.TEACHER, 1)
+        self.create_store('test', 'other').reserve(
+            self.slot, OccupancyIndex.TEACHER, 1
+        )
+
+        self.store.rollback()
+
+        self.assertFalse(
+            self.store.is_free(self.slot, OccupancyIndex.TEACHER, 1)
+        )
+
+
+@skipIf(redis_client is None, 'redis is not available')
+class RedisReservationStoreTest(ReservationStoreTest):
+    def create_store(self, namespace, owner=None):
+        return RedisReservationStore(namespace, redis_client, owner)
+
+    def tearDown(self):
+        super(RedisReservationStoreTest, self).tearDown()
+
+        for key in redis_client.keys('schedule:reservations:*'):
+            redis_client.delete(key)
+
+
+class ReservationHelpersTest(TestCase):
+    def test_get_reservation_store_without_redis(self):
+        self.assertIsInstance(
+            get_reservation_store('test'), LocalReservationStore
+        )
+
+    def test_redis_store(self):
+        client = Mock()
+        client.hget.return_value = '12'
+        store = RedisReservationStore('test', client, 'shard')
+        slot = TimeSlot(date(2017, 9, 4), 2, 2)
+
+        store.reserve(slot, OccupancyIndex.TEACHER, 1)
+
+        store.reserve_script.assert_called_once_with(keys=[
+            'schedule:reservations:{test}',
+            'schedule:reservations:{test}:claims:shard'
+        ], args=['2017-09-04:teacher:1', 12, store.TIMEOUT])
+        self.assertFalse(store.is_free(slot, OccupancyIndex.TEACHER, 1))
+
+    def test_split_troops(self):
+        self.assertEquals(
+            split_troops([1, 2, 3, 4, 5], 2), [[1, 2, 3], [4, 5]]
+        )
+        self.assertEquals(split_troops([1], 3), [[1]])
+
+
+class DistributedBuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum(troops_count=3)
+
+        cache.set('current_term_load', 0, timeout=None)
+
+    def tearDown(self):
+        LocalReservationStore('test').clear()
+
+    def test_resume_releases_stale_claims(self):
+        troop = self.troops[0]
+        store = LocalReservationStore('test', 'shard')
+        slot = TimeSlot(date(2017, 9, 4), 0, 8)
+
+        for teacher in self.teachers:
+            store.reserve(slot, OccupancyIndex.TEACHER, teacher.id)
+
+        for audience in self.audiences:
+            store.reserve(slot, OccupancyIndex.AUDIENCE, audience.id)
+
+        build_schedule_shard.apply(
+            args=('2017-09-04', 2, [troop.id], 'test'), task_id='shard'
+        )
+
+        lessons = Lesson.objects.filter(troop=troop)
+
+        self.assertTrue(lessons.exists())
+
+        for lesson in lessons:
+            self.assertTrue(lesson.teachers.exists())
+            self.assertTrue(lesson.audiences.exists())
+
+    def test_shards_do_not_overlap(self):
+        for troop in self.troops:
+            build_schedule_shard(
+                '2017-09-04', 2, [troop.id], 'test'
+            )
+
+        self.assertEquals(
+            set(Lesson.objects.values_list('troop_id', flat=True)),
+            set(troop.id for troop in self.troops)
+        )
+
+        busy = set()
+
+        for lesson in Lesson.objects.prefetch_related(
+                'teachers', 'audiences'):
+            resources = [
+                ('teacher', teacher.id) for teacher in lesson.teachers.all()
+            ] + [
+                ('audience', audience.id)
+                for audience in lesson.audiences.all()
+            ]
+
+            for resource in resources:
+                for hour in range(lesson.initial_hour,
+                                  lesson.initial_hour + lesson.theme.duration):
+                    key = (lesson.date_of, hour) + resource
+
+                    self.assertNotIn(key, busy)
+                    busy.add(key)
+
+    @patch('schedule.tasks.chord')
+    def test_build_schedule_distributed(self, chord):
+        build_schedule_distributed('2017-09-04', 2, 2)
+
+        shards = [
+            signature.args[2] for signature in chord.call_args[0][0]
+        ]
+
+        self.assertEquals(
+            sorted(sum(shards, [])),
+            sorted(troop.id for troop in self.troops)
+        )
+        self.assertEquals(len(shards), 2)
+
+    def test_finish_distributed_build_clears_reservations(self):
+        store = LocalReservationStore('test')
+        slot = TimeSlot(date(2017, 9, 4), 0, 2)
+        store.reserve(slot, OccupancyIndex.TEACHER, 1)
+
+        finish_distributed_build([], 'test')
+
+        self.assertTrue(LocalReservationStore('test').is_free(
+            slot, OccupancyIndex.TEACHER, 1
+        ))
@@ -0,0 +1,61 @@
+from datetime import date
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..builder import SnapshotScheduleBuilder
+from ..models import Lesson, Specialty, Teacher, Theme, Troop
+from ..snapshot import ScheduleSnapshot
+
+
+class GenerateDatasetTest(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_dataset', preset='small', clear=True, stdout=StringIO(),
+            **options
+        )
+
+    def get_curriculum_struct(self):
+        return list(Theme.objects.order_by('id').values_list(
+            'discipline__short_name', 'term', 'number', 'duration',
+            'teachers__name', 'previous_themes__number'
+        ))
+
+    def test_generate(self):
+        self.generate(seed=1)
+
+        self.assertEquals(Specialty.objects.count(), 2)
+        self.assertEquals(Troop.objects.count(), 12)
+        self.assertEquals(Teacher.objects.count(), 20)
+        self.assertEquals(Theme.objects.count(), 100)
+
+        snapshot = ScheduleSnapshot.load()
+
+        self.assertEquals(len(snapshot.prerequisites.order), 100)
+
+        for specialty in Specialty.objects.all():
+            self.assertEquals(
+                len(snapshot.specialty_disciplines[specialty.id]), 4
+            )
+
+    def test_seed(self):
+        self.generate(seed=1)
+        expected = self.get_curriculum_struct()
+
+        self.generate(seed=1)
+
+        self.assertEquals(self.get_curriculum_struct(), expected)
+
+        self.generate(seed=2)
+
+        self.assertNotEquals(self.get_curriculum_struct(), expected)
+
+    def test_build(self):
+        self.generate(seed=1)
+        cache.set('current_term_load', 0, timeout=None)
+
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 1)
+
+        self.assertTrue(Lesson.objects.exists())
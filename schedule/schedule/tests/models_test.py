@@ -1,7 +1,14 @@
+from importlib import import_module
 from unittest import TestCase
 
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+
 from ..factories import DisciplineFactory, ThemeFactory, SpecialtyFactory, TeacherFactory
-from ..models import Theme, TeacherTheme
+from ..factories import LessonFactory
+from ..models import Theme, TeacherTheme, Lesson, CourseLength
 
 
 class SpecialtyModelTest(TestCase):
@@ -92,6 +99,94 @@ class ThemeModelTest(TestCase):
         for teacher in teachers_alternative:
             self.assertTrue(teacher.teachertheme_set.first().alternative)
 
+    def test_parse_number(self):
+        self.assertEquals(Theme.parse_number('1/2'), '0001.0002')
+        self.assertEquals(Theme.parse_number(' 10.1 '), '0010.0001')
+        self.assertLess(Theme.parse_number('1.2'), Theme.parse_number('1.10'))
+        self.assertLess(Theme.parse_number('1'), Theme.parse_number('1.1'))
+
+        for number in ['', '1.a', '1..2', '12345']:
+            self.assertRaises(ValueError, Theme.parse_number, number)
+
+    def test_save_sets_sort_key(self):
+        theme = ThemeFactory(number='2.10')
+
+        self.assertEquals(
+            Theme.objects.get(id=theme.id).sort_key, '0002.0010'
+        )
+        self.assertRaises(ValueError, ThemeFactory, number='two')
+
+    def test_save_skips_unchanged_number_and_duration(self):
+        theme = Theme.objects.get(id=ThemeFactory(number='2.10').id)
+        theme.name = 'Renamed'
+
+        with patch.object(Theme, 'parse_number') as parse_number:
+            with CaptureQueriesContext(connection) as queries:
+                theme.save()
+
+        self.assertFalse(parse_number.called)
+        self.assertFalse([
+            query for query in queries
+            if Lesson._meta.db_table in query['sql']
+        ])
+        self.assertEquals(
+            Theme.objects.get(id=theme.id).sort_key, '0002.0010'
+        )
+
+    def test_migration_fills_sort_keys(self):
+        migration = import_module('schedule.migrations.0015_theme_sort_key')
+        theme = ThemeFactory(number='2/10')
+        themes = Theme.objects.filter(id=theme.id)
+
+        themes.update(sort_key='')
+        migration.fill_sort_keys(apps, None)
+
+        self.assertEquals(themes.get().sort_key, '0002.0010')
+
+        themes.update(number='2a')
+
+        try:
+            self.assertRaises(
+                ValueError, migration.fill_sort_keys, apps, None
+            )
+        finally:
+            theme.delete()
+
+    def test_set_teachers_keeps_unchanged_rows(self):
+        theme = ThemeFactory()
+        teachers = TeacherFactory.create_batch(3)
+
+        Theme.set_teachers(theme, teachers[0:2], [teachers[2]])
+        kept = TeacherTheme.objects.get(theme=theme, teacher=teachers[0]).id
+
+        Theme.set_teachers(theme, [teachers[0]], teachers[1:3])
+
+        self.assertEquals(
+            TeacherTheme.objects.get(theme=theme, teacher=teachers[0]).id,
+            kept
+        )
+        self.assertEquals(list(theme.teachers_main), [teachers[0]])
+        self.assertEquals(
+            sorted(theme.teachers_alternative, key=lambda t: t.id),
+            teachers[1:3]
+        )
+
+    def test_set_teachers_batch(self):
+        themes = ThemeFactory.create_batch(2)
+        teachers = TeacherFactory.create_batch(2)
+
+        Theme.set_teachers(themes[0], teachers, [])
+        Theme.set_teachers_batch([
+            (themes[0], [teachers[1]], []),
+            (themes[1], [teachers[0]], [teachers[1]])
+        ])
+
+        self.assertEquals(list(themes[0].teachers_main), [teachers[1]])
+        self.assertEquals(list(themes[1].teachers_main), [teachers[0]])
+        self.assertEquals(
+            list(themes[1].teachers_alternative), [teachers[1]]
+        )
+
     def test_get_teachers(self):
         theme = ThemeFactory()
         teachers = TeacherFactory.create_batch(2)
@@ -101,3 +196,86 @@ class ThemeModelTest(TestCase):
 
         self.assertEquals(list(theme.teachers_main), [teachers[0]])
         self.assertEquals(list(theme.teachers_alternative), [teachers[1]])
+
+
+class LessonModelTest(TestCase):
+    def test_time_span(self):
+        lesson = LessonFactory(theme=ThemeFactory(duration=4), initial_hour=2)
+
+        lesson.refresh_from_db()
+
+        self.assertEquals(lesson.duration, 4)
+        self.assertEquals(lesson.end_hour, 6)
+
+    def test_time_span_follows_theme_duration(self):
+        theme = ThemeFactory(duration=2)
+        lesson = LessonFactory(theme=theme, initial_hour=2)
+
+        theme.duration = 6
+        theme.save()
+
+        lesson = Lesson.objects.get(id=lesson.id)
+
+        self.assertEquals(lesson.duration, 6)
+        self.assertEquals(lesson.end_hour, 8)
+
+
+class CourseLengthModelTest(TestCase):
+    def setUp(self):
+        self.specialty = SpecialtyFactory()
+        self.discipline = DisciplineFactory()
+        self.theme = ThemeFactory(
+            discipline=self.discipline, term=1, duration=2,
+            self_education_hours=1
+        )
+
+    def get_length(self, term=1):
+        return CourseLength.objects.filter(
+            specialty=self.specialty, discipline=self.discipline, term=term
+        ).values_list('duration', 'self_education_hours').first()
+
+    def test_specialties_change(self):
+        self.theme.specialties.add(self.specialty)
+        ThemeFactory(
+            discipline=self.discipline, term=1, duration=4,
+            self_education_hours=0
+        ).specialties.add(self.specialty)
+
+        self.assertEquals(self.get_length(), (6, 1))
+
+        self.theme.specialties.remove(self.specialty)
+        self.assertEquals(self.get_length(), (4, 0))
+
+        self.specialty.themes.clear()
+        self.assertIsNone(self.get_length())
+
+        self.specialty.themes.add(self.theme)
+        self.assertEquals(self.get_length(), (2, 1))
+
+    def test_theme_change(self):
+        self.theme.specialties.add(self.specialty)
+
+        self.theme.duration = 4
+        self.theme.save()
+
+        self.assertEquals(self.get_length(), (4, 1))
+
+        self.theme.term = 2
+        self.theme.save()
+
+        self.assertIsNone(self.get_length())
+        self.assertEquals(self.get_length(2), (4, 1))
+
+        self.theme.delete()
+
+        self.assertIsNone(self.get_length(2))
+
+    def test_refresh(self):
+        self.theme.specialties.add(self.specialty)
+        CourseLength.objects.filter(specialty=self.specialty).update(
+            duration=0
+        )
+
+        CourseLength.refresh()
+
+        self.assertEquals(self.get_length(), (2, 1))
@@ -0,0 +1,170 @@
+from datetime import date
+from unittest import TestCase, skipIf
+
+from django.test import override_settings
+
+from ..occupancy import OccupancyIndex, OccupancyTensor, TimeSlot, \
+    create_occupancy_index, numpy
+from ..snapshot import LessonRecord
+from ..factories import ThemeFactory, TeacherFactory, TroopFactory
+
+
+class OccupancyIndexTest(TestCase):
+    index_class = OccupancyIndex
+
+    def setUp(self):
+        self.index = self.index_class()
+        self.date = date(2017, 9, 4)
+
+    def test_get_mask(self):
+        self.assertEquals(OccupancyIndex.get_mask(2, 2), 0b1100)
+        self.assertEquals(OccupancyIndex.get_mask(0, 6), 0b111111)
+
+    def test_is_free_when_overlapped(self):
+        self.index.occupy(
+            TimeSlot(self.date, 2, 2), OccupancyIndex.TEACHER, 1
+        )
+
+        self.assertFalse(self.index.is_free(
+            TimeSlot(self.date, 0, 4), OccupancyIndex.TEACHER, 1
+        ))
+        self.assertFalse(self.index.is_free(
+            TimeSlot(self.date, 3, 1), OccupancyIndex.TEACHER, 1
+        ))
+
+    def test_is_free_when_not_overlapped(self):
+        self.index.occupy(
+            TimeSlot(self.date, 2, 2), OccupancyIndex.TEACHER, 1
+        )
+
+        self.assertTrue(self.index.is_free(
+            TimeSlot(self.date, 4, 2), OccupancyIndex.TEACHER, 1
+        ))
+        self.assertTrue(self.index.is_free(
+            TimeSlot(self.date, 2, 2), OccupancyIndex.TEACHER, 2
+        ))
+        self.assertTrue(self.index.is_free(
+            TimeSlot(self.date, 2, 2), OccupancyIndex.AUDIENCE, 1
+        ))
+        self.assertTrue(self.index.is_free(
+            TimeSlot(date(2017, 9, 5), 2, 2), OccupancyIndex.TEACHER, 1
+        ))
+
+    def test_add_lesson(self):
+        theme = ThemeFactory(duration=4)
+        lesson = LessonRecord(
+            self.date, 0, None, theme, frozenset([1, 2]), frozenset([3]),
+            False
+        )
+
+        self.index.add_lesson(lesson)
+        slot = TimeSlot(self.date, 3, 2)
+
+        self.assertFalse(
+            self.index.is_free(slot, OccupancyIndex.THEME, theme.id)
+        )
+        self.assertFalse(self.index.is_free(slot, OccupancyIndex.TEACHER, 2))
+        self.assertFalse(self.index.is_free(slot, OccupancyIndex.AUDIENCE, 3))
+        self.assertTrue(self.index.is_free(slot, OccupancyIndex.AUDIENCE, 1))
+
+    def test_set_occupied(self):
+        slot = TimeSlot(self.date, 2, 2)
+        occupied = self.index.get_occupied(self.date, OccupancyIndex.THEME, 1)
+
+        self.index.occupy(slot, OccupancyIndex.THEME, 1)
+        self.index.set_occupied(self.date, OccupancyIndex.THEME, 1, occupied)
+
+        self.assertTrue(self.index.is_free(slot, OccupancyIndex.THEME, 1))
+
+    def test_set_occupied_restores_mask(self):
+        self.index.set_occupied(self.date, OccupancyIndex.TEACHER, 1, 0b1010)
+
+        self.assertEquals(
+            self.index.get_occupied(self.date, OccupancyIndex.TEACHER, 1),
+            0b1010
+        )
+        self.assertTrue(self.index.is_free(
+            TimeSlot(self.date, 2, 1), OccupancyIndex.TEACHER, 1
+        ))
+
+    def test_find_free(self):
+        teachers = TeacherFactory.build_batch(3)
+
+        for index, teacher in enumerate(teachers):
+            teacher.id = index + 1
+
+        self.index.occupy(
+            TimeSlot(self.date, 2, 2), OccupancyIndex.TEACHER, 1
+        )
+        self.index.occupy(
+            TimeSlot(self.date, 0, 2), OccupancyIndex.TEACHER, 2
+        )
+
+        self.assertEquals(self.index.find_free(
+            TimeSlot(self.date, 2, 4), OccupancyIndex.TEACHER, teachers
+        ), teachers[1:])
+        self.assertEquals(self.index.find_free(
+            TimeSlot(self.date, 0, 6), OccupancyIndex.TEACHER, teachers
+        ), teachers[2:])
+        self.assertEquals(self.index.find_free(
+            TimeSlot(date(2017, 9, 5), 0, 6), OccupancyIndex.TEACHER,
+            teachers
+        ), teachers)
+
+    def test_find_conflicts(self):
+        troops = TroopFactory.create_batch(2)
+        theme = ThemeFactory(duration=2)
+        lessons = [
+            LessonRecord(
+                self.date, 0, troops[0], theme, frozenset([1, 2]),
+                frozenset([3]), False
+            ),
+            LessonRecord(
+                self.date, 1, troops[1], theme, frozenset([2]),
+                frozenset([4]), False
+            ),
+            LessonRecord(
+                self.date, 2, troops[0], theme, frozenset([1]),
+                frozenset([3]), False
+            ),
+            LessonRecord(
+                date(2017, 9, 5), 0, troops[0], theme, frozenset([1]),
+                frozenset([3]), False
+            )
+        ]
+
+        self.assertEquals(self.index_class.find_conflicts(lessons), [
+            (self.date, 1, OccupancyIndex.TEACHER, 2)
+        ])
+        self.assertEquals(self.index_class.find_conflicts(lessons + [
+            LessonRecord(
+                self.date, 3, troops[0], theme, frozenset([5]),
+                frozenset([6]), False
+            )
+        ]), [
+            (self.date, 1, OccupancyIndex.TEACHER, 2),
+            (self.date, 3, OccupancyIndex.TROOP, troops[0].id)
+        ])
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class OccupancyTensorTest(OccupancyIndexTest):
+    index_class = OccupancyTensor
+
+    def test_grow(self):
+        for key in range(10):
+            self.index.occupy(
+                TimeSlot(self.date, 4, 4), OccupancyIndex.TEACHER, key
+            )
+
+        self.assertFalse(self.index.is_free(
+            TimeSlot(self.date, 7, 1), OccupancyIndex.TEACHER, 0
+        ))
+        self.assertEquals(
+            self.index.get_occupied(self.date, OccupancyIndex.TEACHER, 9),
+            0b11110000
+        )
+
+    @override_settings(OCCUPANCY_BACKEND='tensor')
+    def test_create_occupancy_index(self):
+        self.assertIsInstance(create_occupancy_index(), OccupancyTensor)
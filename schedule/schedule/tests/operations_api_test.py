@@ -4,8 +4,10 @@ from mock import patch, Mock, call
 from rest_framework.test import APITestCase
 
 from .data_api_test import ScheduleApiTestMixin
+from ..models import Lesson, ScheduleBuild
 from ..factories import UserFactory, TeacherFactory, ThemeFactory, \
-    LessonFactory, TroopFactory, DisciplineFactory, SpecialtyFactory
+    LessonFactory, TroopFactory, DisciplineFactory, SpecialtyFactory, \
+    ScheduleBuildFactory
 
 
 class TeacherLoadStatisticsApiTest(ScheduleApiTestMixin, APITestCase):
@@ -19,14 +21,23 @@ class TeacherLoadStatisticsApiTest(ScheduleApiTestMixin, APITestCase):
         teacher_two = TeacherFactory(work_hours_limit=60)
 
         theme = ThemeFactory(duration=6)
+        schedule_build = ScheduleBuildFactory(published=True)
 
         for i in range(4):
-            lesson_one = LessonFactory(date_of=now().date(), theme=theme)
-            lesson_two = LessonFactory(date_of=now().date(), theme=theme)
+            lesson_one = LessonFactory(
+                date_of=now().date(), theme=theme, build=schedule_build
+            )
+            lesson_two = LessonFactory(
+                date_of=now().date(), theme=theme, build=schedule_build
+            )
 
             lesson_one.teachers.set([teacher_one])
             lesson_two.teachers.set([teacher_two])
 
+        LessonFactory(
+            date_of=now().date(), theme=theme, build=ScheduleBuildFactory()
+        ).teachers.set([teacher_one])
+
         date_from = self.format_date(now() - timedelta(days=1))
         date_to = self.format_date(now() + timedelta(days=1))
 
@@ -70,6 +81,8 @@ class TroopProgressStatisticsApiTest(ScheduleApiTestMixin, APITestCase):
         self.discipline_one = DisciplineFactory()
         self.discipline_two = DisciplineFactory()
 
+        self.schedule_build = ScheduleBuildFactory(published=True)
+
         for i in range(6):
             ThemeFactory(
                 discipline=self.discipline_one, duration=4, term=term
@@ -159,7 +172,7 @@ class TroopProgressStatisticsApiTest(ScheduleApiTestMixin, APITestCase):
         themes = discipline.themes.filter(term=troop.term)[:count]
 
         for theme in themes:
-            LessonFactory(troop=troop, theme=theme)
+            LessonFactory(troop=troop, theme=theme, build=self.schedule_build)
 
 
 class ScheduleApiTest(ScheduleApiTestMixin, APITestCase):
@@ -168,9 +181,10 @@ class ScheduleApiTest(ScheduleApiTestMixin, APITestCase):
     def setUp(self):
         self.admin = UserFactory(is_staff=True)
 
+    @patch('schedule.progress.cache')
     @patch('schedule.api.serializers.cache')
     @patch('schedule.api.serializers.build_schedule')
-    def test_schedule_create(self, build_schedule, cache):
+    def test_schedule_create(self, build_schedule, cache, progress_cache):
         specialty = SpecialtyFactory()
         troop = TroopFactory(specialty=specialty, term=2)
         discipline = DisciplineFactory()
@@ -194,15 +208,352 @@ class ScheduleApiTest(ScheduleApiTestMixin, APITestCase):
             self.url, data=payload
         )
 
+        schedule_build = ScheduleBuild.objects.get()
+
         build_schedule.delay.assert_called_once_with(
-            payload['start_date'], payload['term_length']
+            payload['start_date'], payload['term_length'],
+            build_id=schedule_build.id
         )
+        self.assertFalse(schedule_build.published)
+        self.assertEquals(Lesson.objects.count(), 2)
 
+        prefix = 'build:%i:' % schedule_build.id
         calls = [
-            call('current_term_load', 0, timeout=None),
             call('build_schedule', async_result.task_id, timeout=None),
-            call('total_term_load', 14, timeout=None)
+            call('build_schedule_build', schedule_build.id, timeout=None),
+            call(prefix + 'total_term_load', 14, timeout=None)
         ]
 
         cache.set.assert_has_calls(calls)
+        progress_cache.set_many.assert_called_once_with({
+            prefix + 'current_term_load': 0,
+            prefix + 'current_term_load:troop:%i' % troop.id: 0,
+            prefix + 'current_term_load:discipline:%i' % discipline.id: 0
+        }, timeout=None)
+        progress_cache.set.assert_called_once_with(
+            prefix + 'total_term_load_breakdown', {
+                'troops': {troop.id: 14},
+                'disciplines': {discipline.id: 14}
+            }, timeout=None
+        )
+        self.assertEquals(response.status_code, 201)
+
+    @patch('schedule.api.serializers.cache')
+    @patch('schedule.api.serializers.build_schedule_parallel')
+    @patch('schedule.api.serializers.build_schedule')
+    def test_schedule_create_parallel(self, build_schedule,
+                                      build_schedule_parallel, cache):
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'parallel': True
+        }
+        build_schedule_parallel.return_value = Mock(task_id=1)
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        build_schedule_parallel.assert_called_once_with(
+            payload['start_date'], payload['term_length'],
+            build_id=ScheduleBuild.objects.get().id
+        )
+        self.assertFalse(build_schedule.delay.called)
+        cache.set.assert_any_call('build_schedule', 1, timeout=None)
+        self.assertEquals(response.status_code, 201)
+
+    @patch('schedule.api.serializers.cache')
+    @patch('schedule.api.serializers.build_schedule_distributed')
+    def test_schedule_create_distributed(self, build_schedule_distributed,
+                                         cache):
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'shards': 4
+        }
+        build_schedule_distributed.return_value = Mock(task_id=1)
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        build_schedule_distributed.assert_called_once_with(
+            payload['start_date'], payload['term_length'], 4,
+            build_id=ScheduleBuild.objects.get().id
+        )
+        self.assertEquals(response.status_code, 201)
+
+    def test_schedule_create_distributed_with_strategy(self):
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'shards': 4,
+            'strategy': 'propagation'
+        }
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    @patch('schedule.api.serializers.cache')
+    @patch('schedule.api.serializers.build_schedule')
+    def test_schedule_create_with_strategy(self, build_schedule, cache):
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'strategy': 'propagation'
+        }
+        build_schedule.delay.return_value = Mock(task_id=1)
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        build_schedule.delay.assert_called_once_with(
+            payload['start_date'], payload['term_length'],
+            strategy='propagation', build_id=ScheduleBuild.objects.get().id
+        )
+        self.assertEquals(response.status_code, 201)
+
+    def test_schedule_create_with_unknown_strategy(self):
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'strategy': 'unknown'
+        }
+
+        response = self.authorize_client(self.admin).post(
+            self.url, data=payload
+        )
+
+        self.assertEquals(response.status_code, 400)
+
+    @patch('schedule.api.serializers.cache')
+    @patch('schedule.api.serializers.rebuild_schedule')
+    def test_schedule_rebuild(self, rebuild_schedule, cache):
+        troops = TroopFactory.create_batch(2)
+        theme = ThemeFactory(duration=2)
+        today = now().date()
+        published = ScheduleBuildFactory(published=True)
+
+        lessons = [
+            LessonFactory(troop=troops[0], theme=theme, build=published,
+                          date_of=today - timedelta(days=1)),
+            LessonFactory(troop=troops[1], theme=theme, build=published,
+                          date_of=today),
+            LessonFactory(troop=troops[0], theme=theme, build=published,
+                          date_of=today)
+        ]
+
+        payload = {
+            'start_date': today.strftime('%Y-%m-%d'),
+            'term_length': 4,
+            'troops': [troops[0].id]
+        }
+        rebuild_schedule.delay.return_value = Mock(task_id=1)
+
+        response = self.authorize_client(self.admin).post(
+            self.url + 'rebuild/', data=payload
+        )
+
+        schedule_build = ScheduleBuild.objects.exclude(id=published.id).get()
+
+        rebuild_schedule.delay.assert_called_once_with(
+            payload['start_date'], payload['term_length'], [troops[0].id],
+            build_id=schedule_build.id
+        )
+        self.assertEquals(schedule_build.parent, published)
+        self.assertFalse(schedule_build.published)
+        self.assertEquals(
+            list(Lesson.objects.published().order_by('id')), lessons
+        )
+        cache.set.assert_any_call('build_schedule', 1, timeout=None)
         self.assertEquals(response.status_code, 201)
+
+    @patch('schedule.api.serializers.dry_run_schedule')
+    def test_schedule_dry_run_create(self, dry_run_schedule):
+        troop = TroopFactory()
+        theme = ThemeFactory()
+
+        payload = {
+            'start_date': datetime.now().strftime('%Y-%m-%d'),
+            'term_length': 18,
+            'lesson_hours': 8,
+            'troop_days': [{'troop': troop.id, 'day': 2}],
+            'teachers': [{
+                'work_hours_limit': 100,
+                'themes_main': [theme.id]
+            }]
+        }
+        dry_run_schedule.delay.return_value = Mock(task_id='id')
+
+        response = self.authorize_client(self.admin).post(
+            self.url + 'dry_run/', data=payload, format='json'
+        )
+
+        dry_run_schedule.delay.assert_called_once_with(
+            payload['start_date'], payload['term_length'], {
+                'lesson_hours': 8,
+                'troop_days': [[troop.id, 2]],
+                'teachers': [{
+                    'name': '',
+                    'work_hours_limit': 100,
+                    'themes_main': [theme.id],
+                    'themes_alternative': []
+                }]
+            }
+        )
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(response.json(), {'task_id': 'id'})
+
+    @patch('schedule.api.viewsets.AsyncResult')
+    def test_schedule_dry_run_result(self, async_result):
+        result = {'summary': {'lessons': 0}, 'lessons': []}
+        async_result.return_value = Mock(status='SUCCESS', result=result)
+
+        response = self.authorize_client(self.admin).get(
+            self.url + 'dry_run/?task_id=id'
+        )
+
+        async_result.assert_called_once_with('id')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json(), result)
+
+    @patch('schedule.api.viewsets.AsyncResult')
+    def test_schedule_dry_run_result_when_processing(self, async_result):
+        async_result.return_value = Mock(status='PENDING')
+
+        response = self.authorize_client(self.admin).get(
+            self.url + 'dry_run/?task_id=id'
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json(), {'status': 'PENDING'})
+
+    @patch('schedule.api.viewsets.cache')
+    @patch('schedule.api.viewsets.AsyncResult')
+    @patch('schedule.api.viewsets.BuildProgress')
+    def test_schedule_status_processing(self, build_progress, async_result,
+                                        cache):
+        schedule_build = ScheduleBuildFactory()
+        cache.get.side_effect = ['id', schedule_build.id, 20, 5]
+        async_result.return_value = Mock(status='STARTED')
+        build_progress.get_breakdown.return_value = {
+            'troops': {1: 0.5}, 'disciplines': {2: 0.25}
+        }
+
+        response = self.authorize_client(self.admin).get(self.url)
+
+        build_progress.get_breakdown.assert_called_once_with(schedule_build)
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json(), {
+            'status': 'BUILD_PROCESSING',
+            'progress': 0.25,
+            'troops': {'1': 0.5},
+            'disciplines': {'2': 0.25}
+        })
+
+    @patch('schedule.api.viewsets.cache')
+    @patch('schedule.api.viewsets.AsyncResult')
+    def test_schedule_status_with_profile(self, async_result, cache):
+        profile = {'time': 1.0, 'queries': 10, 'rows': 20, 'weeks': []}
+        cache.get.return_value = 'id'
+        async_result.return_value = Mock(
+            status='SUCCESS', result={'profile': profile}
+        )
+
+        response = self.authorize_client(self.admin).get(self.url)
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json(), {'profile': profile})
+
+
+class ScheduleBuildApiTest(ScheduleApiTestMixin, APITestCase):
+    url = '/api/v1/schedule_build/'
+
+    def setUp(self):
+        self.admin = UserFactory(is_staff=True)
+
+    def test_list(self):
+        published = ScheduleBuildFactory(published=True)
+        schedule_build = ScheduleBuildFactory(parent=published)
+        LessonFactory(build=published)
+
+        response = self.authorize_client(self.admin).get(self.url)
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            [
+                (struct['id'], struct['parent'], struct['published'],
+                 struct['lessons_count'])
+                for struct in response.json()
+            ],
+            [
+                (schedule_build.id, published.id, False, 0),
+                (published.id, None, True, 1)
+            ]
+        )
+
+    def test_publish(self):
+        published = ScheduleBuildFactory(published=True)
+        schedule_build = ScheduleBuildFactory(status=ScheduleBuild.FINISHED)
+
+        response = self.authorize_client(self.admin).post(
+            self.url + '%i/publish/' % schedule_build.id
+        )
+
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.json()['published'])
+        self.assertEquals(ScheduleBuild.get_published(), schedule_build)
+        self.assertFalse(
+            ScheduleBuild.objects.get(id=published.id).published
+        )
+
+    def test_publish_unfinished(self):
+        published = ScheduleBuildFactory(published=True)
+        client = self.authorize_client(self.admin)
+
+        for build_status in [ScheduleBuild.PENDING, ScheduleBuild.RUNNING,
+                             ScheduleBuild.FAILED]:
+            schedule_build = ScheduleBuildFactory(status=build_status)
+
+            response = client.post(
+                self.url + '%i/publish/' % schedule_build.id
+            )
+
+            self.assertEquals(response.status_code, 400)
+            self.assertEquals(ScheduleBuild.get_published(), published)
+
+    @patch('schedule.api.viewsets.delete_schedule_build')
+    def test_destroy(self, delete_schedule_build):
+        published = ScheduleBuildFactory(published=True)
+        schedule_build = ScheduleBuildFactory(status=ScheduleBuild.FAILED)
+        client = self.authorize_client(self.admin)
+
+        response = client.delete(
+            self.url + '%i/' % published.id
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertFalse(delete_schedule_build.delay.called)
+
+        response = client.delete(self.url + '%i/' % schedule_build.id)
+
+        self.assertEquals(response.status_code, 202)
+        delete_schedule_build.delay.assert_called_once_with(schedule_build.id)
+
+    @patch('schedule.api.viewsets.delete_schedule_build')
+    def test_destroy_build_in_progress(self, delete_schedule_build):
+        client = self.authorize_client(self.admin)
+
+        for build_status in [ScheduleBuild.PENDING, ScheduleBuild.RUNNING]:
+            schedule_build = ScheduleBuildFactory(status=build_status)
+
+            response = client.delete(self.url + '%i/' % schedule_build.id)
+
+            self.assertEquals(response.status_code, 409)
+
+        self.assertFalse(delete_schedule_build.delay.called)
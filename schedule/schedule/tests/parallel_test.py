@@ -0,0 +1,113 @@
+from datetime import date
+from itertools import chain
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..builder import SnapshotScheduleBuilder
+from ..models import Lesson
+from ..parallel import PartitionsMerger
+from ..persistence import LessonCollector
+from ..snapshot import ScheduleSnapshot, deserialize_lesson
+from ..tasks import build_schedule_partition, merge_schedule_partitions
+from .snapshot_test import CurriculumMixin
+
+
+class ParallelBuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum(troops_count=3)
+
+        self.troops[1].day = 1
+        self.troops[1].save()
+
+        cache.set('current_term_load', 0, timeout=None)
+
+    def build_partitions(self):
+        return [
+            build_schedule_partition('2017-09-04', 2, day) for day in [0, 1]
+        ]
+
+    def test_build_partition(self):
+        builder = SnapshotScheduleBuilder(
+            unit_of_work=LessonCollector(), days=[1]
+        )
+        builder.build(date(2017, 9, 4), 1)
+
+        self.assertTrue(len(builder.unit_of_work.lessons))
+        self.assertFalse(Lesson.objects.exists())
+
+        for lesson in builder.unit_of_work.lessons:
+            self.assertEquals(lesson.troop, self.troops[1])
+            self.assertEquals(lesson.date_of, date(2017, 9, 5))
+
+    def test_merge_partitions(self):
+        partitions = self.build_partitions()
+        merge_schedule_partitions(partitions)
+
+        self.assertEquals(
+            Lesson.objects.count(), sum(len(p) for p in partitions)
+        )
+
+        busy = set()
+
+        for lesson in Lesson.objects.all():
+            for teacher in lesson.teachers.all():
+                for hour in range(lesson.initial_hour,
+                                  lesson.initial_hour + lesson.theme.duration):
+                    key = (lesson.date_of, hour, teacher.id)
+
+                    self.assertNotIn(key, busy)
+                    busy.add(key)
+
+    def get_load_spread(self, lessons):
+        hours = dict((teacher.id, 0) for teacher in self.teachers)
+
+        for lesson in lessons:
+            for teacher_id in lesson.teachers:
+                hours[teacher_id] += lesson.theme.duration
+
+        return max(hours.values()) - min(hours.values())
+
+    def test_merge_keeps_lessons_staffed(self):
+        partitions = self.build_partitions()
+        merge_schedule_partitions(partitions)
+
+        self.assertEquals(
+            sorted(
+                (lesson.date_of.strftime('%Y-%m-%d'), lesson.initial_hour,
+                 lesson.troop_id, lesson.theme_id, lesson.teachers.count())
+                for lesson in Lesson.objects.all()
+            ),
+            sorted(
+                tuple(struct[0:4]) + (len(struct[4]),)
+                for struct in chain(*partitions)
+            )
+        )
+
+    def test_merge_balances_load_across_days(self):
+        self.troops[2].day = 2
+        self.troops[2].save()
+
+        builder = SnapshotScheduleBuilder(unit_of_work=LessonCollector())
+        builder.build(date(2017, 9, 4), 1)
+
+        snapshot = ScheduleSnapshot.load()
+        partitions = [
+            [
+                deserialize_lesson(struct, snapshot)
+                for struct in build_schedule_partition('2017-09-04', 1, day)
+            ]
+            for day in [0, 1, 2]
+        ]
+        merged = PartitionsMerger(
+            snapshot, unit_of_work=LessonCollector()
+        ).merge(partitions)
+
+        self.assertLess(
+            self.get_load_spread(merged),
+            self.get_load_spread(chain(*partitions))
+        )
+        self.assertLessEqual(
+            self.get_load_spread(merged),
+            self.get_load_spread(builder.unit_of_work.lessons)
+        )
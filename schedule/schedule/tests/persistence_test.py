@@ -0,0 +1,148 @@
+from datetime import date
+
+from django.test import TestCase
+from mock import patch
+
+from ..models import Lesson, Teacher
+from ..persistence import LessonUnitOfWork, clear_lessons
+from ..snapshot import LessonRecord
+from ..factories import LessonFactory, TeacherFactory, AudienceFactory, \
+    ThemeFactory, TroopFactory, ScheduleBuildFactory
+
+
+class LessonUnitOfWorkTest(TestCase):
+    def setUp(self):
+        self.unit_of_work = LessonUnitOfWork()
+
+        self.troop = TroopFactory()
+        self.themes = ThemeFactory.create_batch(2, duration=2)
+        self.teachers = TeacherFactory.create_batch(2)
+        self.audiences = AudienceFactory.create_batch(2)
+
+        self.records = [
+            LessonRecord(
+                date(2017, 9, 4), 0, self.troop, self.themes[0],
+                frozenset([self.teachers[0].id]),
+                frozenset([audience.id for audience in self.audiences]),
+                False
+            ),
+            LessonRecord(
+                date(2017, 9, 4), 2, self.troop, self.themes[1],
+                frozenset([teacher.id for teacher in self.teachers]),
+                frozenset(), False
+            )
+        ]
+
+    def test_flush(self):
+        LessonFactory()
+
+        for record in self.records:
+            self.unit_of_work.add(record)
+
+        lessons = self.unit_of_work.flush()
+
+        self.assertEquals(len(lessons), 2)
+        self.assertFalse(self.unit_of_work.pending)
+
+        first = Lesson.objects.get(id=lessons[0].id)
+        second = Lesson.objects.get(id=lessons[1].id)
+
+        self.assertEquals(first.theme, self.themes[0])
+        self.assertEquals(list(first.teachers.all()), self.teachers[0:1])
+        self.assertEquals(
+            sorted(first.audiences.all(), key=lambda a: a.id), self.audiences
+        )
+        self.assertEquals(second.initial_hour, 2)
+        self.assertEquals(second.end_hour, 4)
+        self.assertEquals(
+            sorted(second.teachers.all(), key=lambda t: t.id), self.teachers
+        )
+        self.assertFalse(second.audiences.exists())
+
+    def test_flush_resolves_ids_within_build(self):
+        schedule_build = ScheduleBuildFactory()
+        unit_of_work = LessonUnitOfWork(schedule_build)
+        bulk_create = Lesson.objects.bulk_create
+
+        def bulk_create_concurrently(lessons):
+            created = bulk_create(lessons)
+            LessonFactory(
+                build=ScheduleBuildFactory(), troop=self.troop,
+                date_of=date(2017, 9, 4), initial_hour=0
+            )
+
+            return created
+
+        for record in self.records:
+            unit_of_work.add(record)
+
+        with patch.object(Lesson.objects, 'bulk_create',
+                          bulk_create_concurrently):
+            lessons = unit_of_work.flush()
+
+        first = Lesson.objects.get(id=lessons[0].id)
+
+        self.assertEquals(first.build, schedule_build)
+        self.assertEquals(list(first.teachers.all()), self.teachers[0:1])
+
+    def test_flush_rolls_back_on_error(self):
+        count = Lesson.objects.count()
+
+        for record in self.records:
+            self.unit_of_work.add(record)
+
+        with patch.object(
+                LessonUnitOfWork, 'save_relations', side_effect=ValueError
+        ):
+            with self.assertRaises(ValueError):
+                self.unit_of_work.flush()
+
+        self.assertEquals(Lesson.objects.count(), count)
+        self.assertEquals(len(self.unit_of_work.pending), 2)
+
+    def test_flush_when_empty(self):
+        self.assertEquals(self.unit_of_work.flush(), [])
+
+
+class ClearLessonsTest(TestCase):
+    def setUp(self):
+        self.schedule_build = ScheduleBuildFactory()
+        self.teachers = TeacherFactory.create_batch(2)
+        self.audience = AudienceFactory()
+
+        self.lessons = [
+            LessonFactory(build=self.schedule_build),
+            LessonFactory()
+        ]
+
+        for lesson in self.lessons:
+            lesson.teachers.set(self.teachers)
+            lesson.audiences.set([self.audience])
+
+    def test_clear_scoped(self):
+        clear_lessons(self.schedule_build.lessons.all())
+
+        self.assertEquals(list(Lesson.objects.all()), self.lessons[1:])
+        self.assertEquals(Lesson.teachers.through.objects.count(), 2)
+        self.assertEquals(Lesson.audiences.through.objects.count(), 1)
+
+    def test_clear_all(self):
+        clear_lessons()
+
+        self.assertFalse(Lesson.objects.exists())
+        self.assertFalse(Lesson.teachers.through.objects.exists())
+        self.assertFalse(Lesson.audiences.through.objects.exists())
+        self.assertEquals(Teacher.objects.count(), 2)
+
+    @patch('schedule.persistence.DELETE_BATCH_SIZE', 1)
+    def test_clear_in_batches(self):
+        LessonFactory(build=self.schedule_build).teachers.set(self.teachers)
+
+        clear_lessons(self.schedule_build.lessons.all())
+
+        self.assertEquals(list(Lesson.objects.all()), self.lessons[1:])
+        self.assertEquals(
+            list(Lesson.teachers.through.objects.values_list(
+                'lesson_id', flat=True
+            )), [self.lessons[1].id] * 2
+        )
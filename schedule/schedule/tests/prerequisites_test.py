@@ -0,0 +1,99 @@
+from django.test import TestCase
+
+from ..builder import SnapshotScheduleBuilder
+from ..prerequisites import PrerequisiteGraph, PrerequisiteCycleError
+from ..factories import LessonFactory, ThemeFactory, TroopFactory
+
+
+class PrerequisiteGraphTest(TestCase):
+    def setUp(self):
+        self.themes = ThemeFactory.create_batch(4)
+        self.ids = [theme.id for theme in self.themes]
+        self.themes_dict = dict((theme.id, theme) for theme in self.themes)
+
+    def test_compile_topological_order(self):
+        graph = PrerequisiteGraph.compile(self.themes_dict, {
+            self.ids[0]: [self.ids[1], self.ids[2]],
+            self.ids[1]: [self.ids[3]],
+            self.ids[2]: [self.ids[3]]
+        })
+
+        position = dict(
+            (theme_id, index) for index, theme_id in enumerate(graph.order)
+        )
+
+        self.assertEquals(len(graph.order), 4)
+        self.assertTrue(position[self.ids[3]] < position[self.ids[1]])
+        self.assertTrue(position[self.ids[3]] < position[self.ids[2]])
+        self.assertTrue(position[self.ids[1]] < position[self.ids[0]])
+        self.assertTrue(position[self.ids[2]] < position[self.ids[0]])
+
+    def test_is_ready(self):
+        graph = PrerequisiteGraph.compile(self.themes_dict, {
+            self.ids[0]: [self.ids[1], self.ids[2]]
+        })
+
+        completed = graph.get_bit(self.ids[1])
+
+        self.assertFalse(graph.is_ready(self.ids[0], completed))
+        self.assertTrue(graph.is_ready(self.ids[3], completed))
+
+        completed |= graph.get_bit(self.ids[2])
+
+        self.assertTrue(graph.is_ready(self.ids[0], completed))
+
+    def test_compile_cycle(self):
+        with self.assertRaises(PrerequisiteCycleError) as context:
+            PrerequisiteGraph.compile(self.themes_dict, {
+                self.ids[0]: [self.ids[1]],
+                self.ids[1]: [self.ids[2]],
+                self.ids[2]: [self.ids[0]],
+                self.ids[3]: [self.ids[0]]
+            })
+
+        message = str(context.exception)
+
+        for theme_id in self.ids[0:3]:
+            self.assertIn('(id %i)' % theme_id, message)
+
+        self.assertNotIn('(id %i)' % self.ids[3], message)
+
+
+class SnapshotCheckPrevThemesTest(TestCase):
+    def test_check_prev_themes(self):
+        troop = TroopFactory()
+        theme = ThemeFactory()
+
+        prev_themes = ThemeFactory.create_batch(2)
+        theme.previous_themes.set(prev_themes)
+
+        LessonFactory(theme=prev_themes[0], troop=troop)
+
+        builder = SnapshotScheduleBuilder()
+        builder.prepare()
+
+        self.assertFalse(builder.check_prev_themes(theme, troop))
+        self.assertTrue(builder.check_prev_themes(prev_themes[1], troop))
+
+        LessonFactory(theme=prev_themes[1], troop=troop, self_education=True)
+        builder = SnapshotScheduleBuilder()
+        builder.prepare()
+
+        self.assertTrue(builder.check_prev_themes(theme, troop))
+
+    def test_prepare_reports_cycle(self):
+        themes = ThemeFactory.create_batch(3)
+        themes[0].previous_themes.set([themes[1]])
+        themes[1].previous_themes.set([themes[0]])
+        themes[2].previous_themes.set([themes[0]])
+
+        builder = SnapshotScheduleBuilder()
+
+        with self.assertRaises(PrerequisiteCycleError) as context:
+            builder.prepare()
+
+        message = str(context.exception)
+
+        self.assertIn('(id %i)' % themes[0].id, message)
+        self.assertIn('(id %i)' % themes[1].id, message)
+        self.assertNotIn('(id %i)' % themes[2].id, message)
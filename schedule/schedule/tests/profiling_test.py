@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from ..builder import ScheduleBuilder, SnapshotScheduleBuilder
+from ..profiling import BuildProfiler
+from .snapshot_test import CurriculumMixin
+
+
+class BuildProfilerTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+        self.profiler = BuildProfiler()
+
+    def test_snapshot_builder_report(self):
+        builder = self.profiler.instrument(SnapshotScheduleBuilder())
+        builder.build(date(2017, 9, 4), 2)
+
+        report = self.profiler.get_report()
+        setup = report['setup']['phases']['prepare']
+
+        self.assertEquals(len(report['weeks']), 2)
+        self.assertEquals(report['weeks'][1]['date'], '2017-09-11')
+        self.assertEquals(setup['calls'], 1)
+        self.assertEquals(setup['queries'], 13)
+        self.assertTrue(setup['rows'] > 0)
+
+        phases = report['weeks'][0]['phases']
+
+        self.assertEquals(phases['create_lesson']['calls'], 6)
+        self.assertEquals(phases['create_lesson']['queries'], 0)
+        self.assertTrue(phases['find_lesson_dependencies']['calls'] >= 6)
+        self.assertEquals(phases['get_disciplines_by_priority']['queries'], 0)
+        self.assertTrue(report['weeks'][0]['queries'] > 0)
+
+        self.assertEquals(
+            report['queries'],
+            setup['queries'] + sum(
+                week['queries'] for week in report['weeks']
+            )
+        )
+
+    def test_orm_builder_report(self):
+        builder = self.profiler.instrument(ScheduleBuilder())
+        builder.build(date(2017, 9, 4), 1)
+
+        phases = self.profiler.get_report()['weeks'][0]['phases']
+
+        for phase in BuildProfiler.PHASES:
+            self.assertTrue(phases[phase]['calls'] > 0)
+
+        self.assertTrue(phases['get_disciplines_by_priority']['queries'] > 0)
+        self.assertTrue(phases['find_free_teachers']['rows'] > 0)
+
+    def test_restores_connection(self):
+        builder = self.profiler.instrument(SnapshotScheduleBuilder())
+        builder.build(date(2017, 9, 4), 1)
+
+        self.assertNotIn('make_cursor', connection.__dict__)
+        self.assertNotIn('make_debug_cursor', connection.__dict__)
+
+    def test_dump(self):
+        builder = self.profiler.instrument(SnapshotScheduleBuilder())
+        builder.build(date(2017, 9, 4), 1)
+
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+        try:
+            self.profiler.dump(path)
+
+            with open(path) as report_file:
+                report = json.load(report_file)
+        finally:
+            os.remove(path)
+
+        self.assertEquals(
+            report['queries'], self.profiler.get_report()['queries']
+        )
+        self.assertEquals(len(report['weeks']), 1)
@@ -0,0 +1,109 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..builder import SnapshotScheduleBuilder
+from ..models import Lesson
+from ..progress import BuildProgress
+from ..factories import LessonFactory, ScheduleBuildFactory
+from .snapshot_test import CurriculumMixin
+
+
+class BuildProgressTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        BuildProgress.reset_from_database()
+
+    def get_troop_load(self, troop):
+        return cache.get(BuildProgress.TROOP % troop.id)
+
+    def test_flush_every_lessons(self):
+        progress = BuildProgress(flush_lessons=3, flush_interval=60000)
+
+        for i in range(2):
+            progress.add(self.troops[0].id, self.disciplines[0].id, 2)
+
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 0)
+
+        progress.add(self.troops[1].id, self.disciplines[1].id, 4)
+
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 8)
+        self.assertEquals(self.get_troop_load(self.troops[0]), 4)
+        self.assertEquals(self.get_troop_load(self.troops[1]), 4)
+        self.assertEquals(
+            cache.get(BuildProgress.DISCIPLINE % self.disciplines[1].id), 4
+        )
+        self.assertEquals(progress.lessons, 0)
+
+    def test_flush_every_interval(self):
+        progress = BuildProgress(flush_lessons=100, flush_interval=0)
+        progress.add(self.troops[0].id, self.disciplines[0].id, 2)
+
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 2)
+
+    def test_flush_missing_key(self):
+        cache.delete(BuildProgress.CURRENT)
+
+        progress = BuildProgress()
+        progress.add(self.troops[0].id, self.disciplines[0].id, 2)
+        progress.flush()
+
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 2)
+
+    def test_reset_from_database(self):
+        LessonFactory(troop=self.troops[0], theme=self.themes[0])
+        LessonFactory(troop=self.troops[0], theme=self.themes[4])
+
+        BuildProgress.reset_from_database()
+
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 4)
+        self.assertEquals(self.get_troop_load(self.troops[0]), 4)
+        self.assertEquals(self.get_troop_load(self.troops[1]), 0)
+        self.assertEquals(BuildProgress.get_breakdown(), {
+            'troops': {self.troops[0].id: 0.25, self.troops[1].id: 0.0},
+            'disciplines': {
+                self.disciplines[0].id: 2 / 16.0,
+                self.disciplines[1].id: 2 / 16.0
+            }
+        })
+
+    def test_builds_do_not_share_progress(self):
+        builds = ScheduleBuildFactory.create_batch(2)
+        LessonFactory(
+            troop=self.troops[0], theme=self.themes[0], build=builds[0]
+        )
+
+        for schedule_build in builds:
+            BuildProgress.reset_from_database(schedule_build)
+
+        progress = BuildProgress(builds[1], flush_lessons=1)
+        progress.add(self.troops[0].id, self.disciplines[0].id, 4)
+
+        self.assertEquals(
+            cache.get(BuildProgress.get_key(BuildProgress.CURRENT, builds[0])),
+            2
+        )
+        self.assertEquals(
+            cache.get(BuildProgress.get_key(BuildProgress.CURRENT, builds[1])),
+            4
+        )
+        self.assertEquals(cache.get(BuildProgress.CURRENT), 0)
+        self.assertEquals(
+            BuildProgress.get_breakdown(builds[0])['troops'][
+                self.troops[0].id
+            ], 2 / 16.0
+        )
+
+    def test_build(self):
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 2)
+
+        self.assertEquals(
+            cache.get(BuildProgress.CURRENT),
+            sum(lesson.theme.duration for lesson in Lesson.objects.all())
+        )
+
+        for troop in self.troops:
+            self.assertEquals(self.get_troop_load(troop), sum(
+                lesson.theme.duration for lesson in troop.lessons.all()
+            ))
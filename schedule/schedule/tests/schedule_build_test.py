@@ -0,0 +1,185 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.timezone import now
+from mock import patch
+
+from ..factories import ScheduleBuildFactory, LessonFactory
+from ..models import Lesson, ScheduleBuild, BuildCheckpoint
+from ..tasks import build_schedule, rebuild_schedule, \
+    build_schedule_partition, merge_schedule_partitions, delete_schedule_build
+from .snapshot_test import CurriculumMixin
+
+
+class ScheduleBuildTest(TestCase):
+    def test_publish(self):
+        builds = ScheduleBuildFactory.create_batch(2)
+
+        builds[0].publish()
+        self.assertEquals(ScheduleBuild.get_published(), builds[0])
+
+        builds[1].publish()
+
+        self.assertEquals(ScheduleBuild.get_published(), builds[1])
+        self.assertIsNotNone(builds[1].published_at)
+        self.assertEquals(
+            ScheduleBuild.objects.filter(published=True).count(), 1
+        )
+
+    def test_get_published_without_builds(self):
+        self.assertIsNone(ScheduleBuild.get_published())
+
+    def test_delete_keeps_build_in_progress(self):
+        running = ScheduleBuildFactory(status=ScheduleBuild.RUNNING)
+        LessonFactory(build=running)
+        failed = ScheduleBuildFactory(status=ScheduleBuild.FAILED)
+        LessonFactory(build=failed)
+
+        delete_schedule_build(running.id)
+        delete_schedule_build(failed.id)
+
+        self.assertEquals(
+            list(ScheduleBuild.objects.values_list('id', flat=True)),
+            [running.id]
+        )
+        self.assertEquals(
+            list(Lesson.objects.values_list('build_id', flat=True)),
+            [running.id]
+        )
+
+
+class VersionedBuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+        self.published = ScheduleBuildFactory()
+        build_schedule('2017-09-04', 2, build_id=self.published.id)
+
+        self.published.refresh_from_db()
+
+    def get_build_struct(self, schedule_build):
+        return set(
+            (lesson.date_of, lesson.initial_hour, lesson.troop_id,
+             lesson.theme_id, frozenset(
+                 lesson.teachers.values_list('id', flat=True)
+             ))
+            for lesson in schedule_build.lessons.all()
+        )
+
+    def test_build_publishes(self):
+        self.assertTrue(self.published.published)
+        self.assertEquals(
+            Lesson.objects.published().count(), Lesson.objects.count()
+        )
+
+    def test_build_keeps_published_lessons(self):
+        schedule_build = ScheduleBuildFactory()
+        lessons = self.get_build_struct(self.published)
+
+        build_schedule('2017-09-04', 1, build_id=schedule_build.id)
+        schedule_build.refresh_from_db()
+        self.published.refresh_from_db()
+
+        self.assertTrue(schedule_build.published)
+        self.assertFalse(self.published.published)
+        self.assertEquals(self.get_build_struct(self.published), lessons)
+        self.assertTrue(schedule_build.lessons.exists())
+        self.assertFalse(schedule_build.lessons.filter(
+            date_of__gt=date(2017, 9, 8)
+        ).exists())
+
+    def test_build_finishes(self):
+        self.assertEquals(self.published.status, ScheduleBuild.FINISHED)
+
+    def test_failed_build(self):
+        schedule_build = ScheduleBuildFactory()
+
+        with patch('schedule.builder.SnapshotScheduleBuilder.build',
+                   side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                build_schedule('2017-09-04', 1, build_id=schedule_build.id)
+
+        schedule_build.refresh_from_db()
+        self.assertEquals(schedule_build.status, ScheduleBuild.FAILED)
+        self.assertFalse(schedule_build.published)
+
+    def test_locked_build_is_ignored(self):
+        schedule_build = ScheduleBuildFactory(status=ScheduleBuild.RUNNING)
+        BuildCheckpoint.objects.create(
+            task_id='task', build=schedule_build, owner='other',
+            locked_until=now() + timedelta(minutes=10)
+        )
+
+        result = build_schedule.apply(
+            args=('2017-09-04', 1), kwargs={'build_id': schedule_build.id},
+            task_id='task'
+        )
+
+        schedule_build.refresh_from_db()
+        self.assertEquals(result.state, 'IGNORED')
+        self.assertEquals(schedule_build.status, ScheduleBuild.RUNNING)
+        self.assertFalse(schedule_build.lessons.exists())
+
+    def test_publish_prunes_abandoned_builds(self):
+        abandoned = ScheduleBuildFactory(status=ScheduleBuild.FAILED)
+        LessonFactory(build=abandoned)
+        running = ScheduleBuildFactory(status=ScheduleBuild.RUNNING)
+        LessonFactory(build=running)
+        schedule_build = ScheduleBuildFactory()
+
+        build_schedule('2017-09-04', 1, build_id=schedule_build.id)
+
+        self.assertFalse(ScheduleBuild.objects.filter(
+            id=abandoned.id
+        ).exists())
+        self.assertTrue(ScheduleBuild.objects.filter(
+            id=running.id
+        ).exists())
+        self.assertTrue(ScheduleBuild.objects.filter(
+            id=self.published.id
+        ).exists())
+        self.assertEquals(
+            set(Lesson.objects.values_list('build_id', flat=True)),
+            set([self.published.id, running.id, schedule_build.id])
+        )
+
+    def test_rebuild_inherits_lessons(self):
+        troop = self.troops[0]
+        schedule_build = ScheduleBuildFactory(parent=self.published)
+
+        rebuild_schedule(
+            '2017-09-11', 1, [troop.id], build_id=schedule_build.id
+        )
+        schedule_build.refresh_from_db()
+
+        kept = self.published.lessons.exclude(
+            troop=troop, date_of__gte=date(2017, 9, 11)
+        )
+
+        self.assertTrue(schedule_build.published)
+        self.assertEquals(
+            self.get_build_struct(schedule_build),
+            self.get_build_struct(self.published)
+        )
+        self.assertTrue(kept.exists())
+        self.assertEquals(
+            schedule_build.lessons.count(), self.published.lessons.count()
+        )
+
+    def test_parallel_build(self):
+        schedule_build = ScheduleBuildFactory()
+
+        merge_schedule_partitions([
+            build_schedule_partition(
+                '2017-09-04', 2, 0, build_id=schedule_build.id
+            )
+        ], build_id=schedule_build.id)
+        schedule_build.refresh_from_db()
+
+        self.assertTrue(schedule_build.published)
+        self.assertEquals(
+            self.get_build_struct(schedule_build),
+            self.get_build_struct(self.published)
+        )
@@ -0,0 +1,245 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..builder import ScheduleBuilder, SnapshotScheduleBuilder, \
+    DryRunScheduleBuilder
+from ..models import Lesson, Theme, Troop
+from ..snapshot import ScheduleSnapshot
+from ..tasks import build_schedule, dry_run_schedule
+from ..factories import AudienceFactory, TeacherFactory, ThemeFactory, \
+    TroopFactory, SpecialtyFactory, DisciplineFactory, ScheduleBuildFactory
+
+
+class CurriculumMixin(object):
+    def create_curriculum(self, term=2, day=0, troops_count=2):
+        Troop.objects.all().delete()
+        Theme.objects.all().delete()
+
+        self.specialty = SpecialtyFactory()
+        self.troops = [
+            TroopFactory(specialty=self.specialty, term=term, day=day,
+                         code='troop%i' % i)
+            for i in range(troops_count)
+        ]
+        self.disciplines = DisciplineFactory.create_batch(2)
+        self.teachers = TeacherFactory.create_batch(3, work_hours_limit=100)
+        self.audiences = AudienceFactory.create_batch(2)
+        self.themes = []
+
+        for discipline in self.disciplines:
+            previous = None
+
+            for number in range(1, 5):
+                theme = ThemeFactory(
+                    discipline=discipline, term=term, number=str(number),
+                    duration=2, self_education_hours=0
+                )
+                theme.specialties.set([self.specialty])
+                theme.audiences.set(self.audiences)
+                Theme.set_teachers(
+                    theme, self.teachers[0:2], self.teachers[2:3]
+                )
+
+                if previous:
+                    theme.previous_themes.set([previous])
+
+                previous = theme
+                self.themes.append(theme)
+
+    def get_lessons_struct(self):
+        return sorted(
+            (
+                lesson.date_of, lesson.initial_hour, lesson.troop_id,
+                lesson.theme_id,
+                sorted(lesson.teachers.values_list('id', flat=True)),
+                sorted(lesson.audiences.values_list('id', flat=True))
+            )
+            for lesson in Lesson.objects.all()
+        )
+
+
+class ScheduleSnapshotTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+
+    def test_load_relations(self):
+        snapshot = ScheduleSnapshot.load()
+        theme = self.themes[1]
+
+        self.assertEquals(
+            snapshot.specialty_disciplines[self.specialty.id],
+            self.disciplines
+        )
+        self.assertEquals(
+            snapshot.main_teachers[theme.id], self.teachers[0:2]
+        )
+        self.assertEquals(
+            snapshot.alternative_teachers[theme.id], self.teachers[2:3]
+        )
+        self.assertEquals(snapshot.theme_audiences[theme.id], self.audiences)
+        self.assertEquals(
+            snapshot.previous_themes[theme.id], [self.themes[0].id]
+        )
+        self.assertEquals(
+            snapshot.calc_course_length(
+                self.disciplines[0], 2, self.specialty
+            ),
+            8
+        )
+
+    def test_load_lessons(self):
+        lesson = Lesson.objects.create(
+            date_of=date(2017, 9, 4), initial_hour=0,
+            troop=self.troops[0], theme=self.themes[0]
+        )
+        lesson.teachers.set(self.teachers[0:1])
+
+        snapshot = ScheduleSnapshot.load()
+
+        self.assertEquals(len(snapshot.lessons), 1)
+        self.assertEquals(snapshot.lessons[0].theme, self.themes[0])
+        self.assertEquals(
+            snapshot.lessons[0].teachers, frozenset([self.teachers[0].id])
+        )
+
+
+class SnapshotScheduleBuilderTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+    def test_build_matches_orm_builder(self):
+        ScheduleBuilder().build(date(2017, 9, 4), 2)
+        expected = self.get_lessons_struct()
+
+        Lesson.objects.all().delete()
+
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 2)
+
+        self.assertTrue(len(expected))
+        self.assertEquals(self.get_lessons_struct(), expected)
+
+
+class PartialRebuildTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 3)
+        self.expected = self.get_lessons_struct()
+
+    def test_rebuild_from_date(self):
+        Lesson.objects.filter(date_of__gte=date(2017, 9, 11)).delete()
+
+        SnapshotScheduleBuilder(start_date=date(2017, 9, 11)).build(
+            date(2017, 9, 11), 2
+        )
+
+        self.assertEquals(self.get_lessons_struct(), self.expected)
+
+    def test_rebuild_troops(self):
+        Lesson.objects.filter(
+            date_of__gte=date(2017, 9, 11), troop=self.troops[1]
+        ).delete()
+
+        SnapshotScheduleBuilder(
+            start_date=date(2017, 9, 11), troops=[self.troops[1].id]
+        ).build(date(2017, 9, 11), 2)
+
+        self.assertEquals(self.get_lessons_struct(), self.expected)
+
+    def test_rebuild_skips_days_before_start_date(self):
+        Lesson.objects.filter(date_of__gte=date(2017, 9, 11)).delete()
+        count = Lesson.objects.count()
+
+        SnapshotScheduleBuilder(start_date=date(2017, 9, 5)).build(
+            date(2017, 9, 5), 1
+        )
+
+        self.assertEquals(Lesson.objects.count(), count)
+
+
+class DryRunScheduleBuilderTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+    def test_build_without_writes(self):
+        builder = DryRunScheduleBuilder()
+
+        with self.assertNumQueries(9):
+            builder.build(date(2017, 9, 4), 2)
+
+        self.assertFalse(Lesson.objects.exists())
+        self.assertEquals(cache.get('current_term_load'), 0)
+
+        SnapshotScheduleBuilder().build(date(2017, 9, 4), 2)
+        expected = self.get_lessons_struct()
+
+        self.assertEquals(sorted(
+            (lesson.date_of, lesson.initial_hour, lesson.troop.id,
+             lesson.theme.id, sorted(lesson.teachers),
+             sorted(lesson.audiences))
+            for lesson in builder.unit_of_work.lessons
+        ), expected)
+
+    def test_overrides(self):
+        self.themes[0].teachers_count = 3
+        self.themes[0].save()
+
+        builder = DryRunScheduleBuilder(overrides={
+            'lesson_hours': 2,
+            'troop_days': [[self.troops[1].id, 3]],
+            'teachers': [{
+                'name': 'Extra', 'work_hours_limit': 1,
+                'themes_main': [self.themes[0].id]
+            }]
+        })
+        builder.build(date(2017, 9, 4), 1)
+
+        lessons = sorted(
+            builder.unit_of_work.lessons, key=lambda lesson: lesson.troop.id
+        )
+
+        self.assertEquals(len(lessons), 2)
+        self.assertEquals(lessons[0].date_of, date(2017, 9, 4))
+        self.assertEquals(lessons[1].date_of, date(2017, 9, 7))
+        self.assertEquals(lessons[0].teachers, frozenset(
+            [self.teachers[0].id, self.teachers[1].id, -1]
+        ))
+        self.assertEquals(Troop.objects.get(id=self.troops[1].id).day, 0)
+
+    def test_get_summary(self):
+        builder = DryRunScheduleBuilder(overrides={'lesson_hours': 4})
+        builder.build(date(2017, 9, 4), 1)
+
+        self.assertEquals(builder.get_summary(), {
+            'lessons': 4,
+            'hours': 8,
+            'without_teachers': 0,
+            'without_audiences': 0,
+            'progress': 0.25,
+            'max_teacher_load': 0.04
+        })
+
+    def test_dry_run_after_published_build(self):
+        build_schedule('2017-09-04', 2, build_id=ScheduleBuildFactory().id)
+        expected = self.get_lessons_struct()
+
+        result = dry_run_schedule('2017-09-04', 2)
+
+        self.assertEquals(result['summary']['lessons'], len(expected))
+        self.assertEquals(result['summary']['without_teachers'], 0)
+        self.assertEquals(result['summary']['without_audiences'], 0)
+        self.assertEquals(sorted(
+            (date_of, hour, troop_id, theme_id, teachers, audiences)
+            for date_of, hour, troop_id, theme_id, teachers, audiences, _
+            in result['lessons']
+        ), sorted(
+            (date_of.strftime('%Y-%m-%d'), hour, troop_id, theme_id,
+             teachers, audiences)
+            for date_of, hour, troop_id, theme_id, teachers, audiences
+            in expected
+        ))
@@ -0,0 +1,146 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from ..builder import SnapshotScheduleBuilder
+from ..models import Lesson, Theme, Troop
+from ..persistence import LessonCollector
+from ..solver import PropagationScheduleBuilder, SearchFrame
+from ..factories import AudienceFactory, DisciplineFactory, TeacherFactory, \
+    ThemeFactory, TroopFactory, SpecialtyFactory
+from .snapshot_test import CurriculumMixin
+
+
+class PropagationScheduleBuilderTest(TestCase):
+    def setUp(self):
+        Troop.objects.all().delete()
+        Theme.objects.all().delete()
+
+        self.teachers = TeacherFactory.create_batch(2, work_hours_limit=100)
+        self.troops = []
+        self.themes = []
+
+        for code in ['a', 'b']:
+            specialty = SpecialtyFactory()
+            theme = ThemeFactory(
+                discipline=DisciplineFactory(), term=2, number='1',
+                duration=6, self_education_hours=0
+            )
+            theme.specialties.set([specialty])
+            theme.audiences.set([AudienceFactory()])
+
+            self.troops.append(TroopFactory(
+                specialty=specialty, term=2, day=0, code=code
+            ))
+            self.themes.append(theme)
+
+        Theme.set_teachers(
+            self.themes[0], self.teachers[0:1], self.teachers[1:2]
+        )
+        Theme.set_teachers(self.themes[1], self.teachers[0:1], [])
+
+        cache.set('current_term_load', 0, timeout=None)
+
+    def build(self, builder_class):
+        builder = builder_class(unit_of_work=LessonCollector())
+        builder.build(date(2017, 9, 4), 1)
+
+        return dict(
+            (lesson.troop.code, lesson.teachers)
+            for lesson in builder.unit_of_work.lessons
+        )
+
+    def test_fills_more_than_greedy(self):
+        self.assertEquals(self.build(SnapshotScheduleBuilder), {
+            'a': frozenset([self.teachers[0].id]),
+            'b': frozenset()
+        })
+        self.assertEquals(self.build(PropagationScheduleBuilder), {
+            'a': frozenset([self.teachers[1].id]),
+            'b': frozenset([self.teachers[0].id])
+        })
+
+    def test_falls_back_to_greedy(self):
+        Theme.set_teachers(self.themes[0], self.teachers[0:1], [])
+
+        self.assertEquals(
+            self.build(PropagationScheduleBuilder),
+            self.build(SnapshotScheduleBuilder)
+        )
+
+    @patch.object(PropagationScheduleBuilder, 'find_lesson_dependencies',
+                  return_value=None)
+    @patch.object(PropagationScheduleBuilder, 'find_options',
+                  return_value=([], set()))
+    def test_fallback_without_dependencies(self, find_options,
+                                           find_lesson_dependencies):
+        self.assertEquals(self.build(PropagationScheduleBuilder), {})
+
+
+class SearchStateTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+    def get_state(self, builder, troop):
+        occupancy = dict(
+            ((date_of, key), occupied)
+            for date_of, day in builder.occupancy.days.items()
+            for key, occupied in day.items() if occupied
+        )
+
+        return (
+            occupancy,
+            builder.get_disciplines_by_priority(troop),
+            builder.completed_themes[troop.id],
+            set(builder.troop_themes[troop.id]),
+            dict(
+                (teacher_id, hours)
+                for teacher_id, hours in builder.teacher_load.hours.items()
+                if hours
+            ),
+            builder.get_next_theme(self.disciplines[0], troop)
+        )
+
+    def test_unplace_restores_state(self):
+        builder = PropagationScheduleBuilder()
+        builder.prepare()
+
+        troop = self.troops[0]
+        hours = {troop.id: 0}
+        expected = self.get_state(builder, troop)
+
+        frame = SearchFrame(troop, date(2017, 9, 4), builder.get_domain(
+            troop, date(2017, 9, 4), 0
+        ))
+        builder.place(frame, frame.options[0], hours)
+
+        self.assertEquals(hours[troop.id], 2)
+        self.assertNotEquals(self.get_state(builder, troop), expected)
+
+        builder.unplace(frame, hours)
+
+        self.assertEquals(hours[troop.id], 0)
+        self.assertEquals(self.get_state(builder, troop), expected)
+
+    def test_build(self):
+        PropagationScheduleBuilder().build(date(2017, 9, 4), 2)
+
+        busy = set()
+
+        for lesson in Lesson.objects.all():
+            self.assertTrue(lesson.teachers.exists())
+            self.assertTrue(lesson.audiences.exists())
+
+            for teacher in lesson.teachers.all():
+                for hour in range(lesson.initial_hour,
+                                  lesson.initial_hour + lesson.theme.duration):
+                    key = (lesson.date_of, hour, teacher.id)
+
+                    self.assertNotIn(key, busy)
+                    busy.add(key)
+
+        self.assertEquals(Lesson.objects.count(), 12)
+        self.assertEquals(cache.get('current_term_load'), 24)
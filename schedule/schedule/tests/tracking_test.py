@@ -0,0 +1,202 @@
+from django.test import TestCase
+
+from ..builder import ScheduleBuilder, SnapshotScheduleBuilder
+from ..tracking import DisciplineProgress, ThemeCursor, TeacherLoad
+from ..factories import LessonFactory, ThemeFactory, TroopFactory, \
+    SpecialtyFactory, DisciplineFactory, TeacherFactory
+
+
+class DisciplineProgressTest(TestCase):
+    def setUp(self):
+        self.disciplines = DisciplineFactory.create_batch(4)
+        self.progress = DisciplineProgress(self.disciplines, {
+            self.disciplines[0].id: 10,
+            self.disciplines[1].id: 20,
+            self.disciplines[2].id: 0,
+            self.disciplines[3].id: 10
+        })
+
+    def test_get_ordered_keeps_disciplines_order_on_ties(self):
+        self.assertEquals(self.progress.get_ordered(), [
+            (self.disciplines[0], 0.0),
+            (self.disciplines[1], 0.0),
+            (self.disciplines[3], 0.0)
+        ])
+
+    def test_add(self):
+        self.progress.add(self.disciplines[0].id, 4)
+        self.progress.add(self.disciplines[1].id, 4)
+        self.progress.add(self.disciplines[0].id, 2)
+
+        self.assertEquals(self.progress.get_ordered(), [
+            (self.disciplines[3], 0.0),
+            (self.disciplines[1], 0.2),
+            (self.disciplines[0], 0.6)
+        ])
+
+    def test_add_skips_completed(self):
+        self.progress.add(self.disciplines[3].id, 10)
+        self.progress.add(self.disciplines[2].id, 10)
+
+        self.assertEquals(self.progress.get_ordered(), [
+            (self.disciplines[0], 0.0),
+            (self.disciplines[1], 0.0)
+        ])
+
+    def test_add_back(self):
+        self.progress.add(self.disciplines[0].id, 4)
+        self.progress.add(self.disciplines[0].id, -4)
+
+        self.assertEquals(self.progress.get_ordered(), [
+            (self.disciplines[0], 0.0),
+            (self.disciplines[1], 0.0),
+            (self.disciplines[3], 0.0)
+        ])
+
+    def test_compact(self):
+        for i in range(9):
+            self.progress.add(self.disciplines[1].id, 1)
+
+        self.assertTrue(len(self.progress.heap) <= 6)
+        self.assertEquals(
+            self.progress.get_ordered()[-1], (self.disciplines[1], 0.45)
+        )
+
+
+class SnapshotDisciplinesPriorityTest(TestCase):
+    def test_get_disciplines_by_priority(self):
+        specialty = SpecialtyFactory()
+        troop = TroopFactory(specialty=specialty, term=5)
+        disciplines = DisciplineFactory.create_batch(3)
+
+        for discipline, lessons_count in zip(disciplines, [3, 6, 8]):
+            themes = ThemeFactory.create_batch(
+                10, duration=2, discipline=discipline, term=5,
+                self_education_hours=1
+            )
+
+            for theme in themes:
+                theme.specialties.set([specialty])
+
+            for theme in themes[0:lessons_count]:
+                LessonFactory(troop=troop, theme=theme)
+
+            LessonFactory(troop=troop, theme=themes[0], self_education=True)
+
+        builder = SnapshotScheduleBuilder()
+        builder.prepare()
+
+        self.assertEquals(
+            builder.get_disciplines_by_priority(troop),
+            ScheduleBuilder().get_disciplines_by_priority(troop)
+        )
+
+
+class ThemeCursorTest(TestCase):
+    def setUp(self):
+        self.themes = ThemeFactory.create_batch(3)
+        self.cursor = ThemeCursor(self.themes)
+        self.scheduled = set()
+
+    def is_scheduled(self, theme):
+        return theme in self.scheduled
+
+    def test_get_next(self):
+        self.assertEquals(self.cursor.get_next(self.is_scheduled), self.themes[0])
+
+        self.scheduled.add(self.themes[0])
+        self.scheduled.add(self.themes[2])
+
+        self.assertEquals(self.cursor.get_next(self.is_scheduled), self.themes[1])
+        self.assertEquals(self.cursor.position, 1)
+
+    def test_get_next_when_exhausted(self):
+        self.scheduled.update(self.themes)
+
+        self.assertIsNone(self.cursor.get_next(self.is_scheduled))
+        self.assertEquals(self.cursor.position, 3)
+
+    def test_rewind(self):
+        self.scheduled.update(self.themes[0:2])
+        self.cursor.get_next(self.is_scheduled)
+        self.scheduled.remove(self.themes[1])
+
+        self.cursor.rewind(self.themes[1])
+
+        self.assertEquals(self.cursor.position, 1)
+        self.assertEquals(
+            self.cursor.get_next(self.is_scheduled), self.themes[1]
+        )
+
+
+class SnapshotNextThemeTest(TestCase):
+    def test_get_next_theme(self):
+        discipline = DisciplineFactory()
+        troop = TroopFactory(term=3)
+
+        theme_one = ThemeFactory(number='10.1', discipline=discipline, term=3)
+        theme_two = ThemeFactory(number='2.2', discipline=discipline, term=3)
+        theme_three = ThemeFactory(number='1.3', discipline=discipline, term=3)
+        ThemeFactory(number='1.1', discipline=discipline, term=4)
+
+        LessonFactory(theme=theme_two, troop=troop)
+
+        builder = SnapshotScheduleBuilder()
+        builder.prepare()
+
+        self.assertEquals(builder.get_next_theme(discipline, troop), theme_three)
+
+        LessonFactory(theme=theme_three, troop=troop)
+        builder.snapshot = None
+        builder.prepare()
+
+        self.assertEquals(builder.get_next_theme(discipline, troop), theme_one)
+
+
+class TeacherLoadTest(TestCase):
+    def setUp(self):
+        self.teachers = TeacherFactory.create_batch(3, work_hours_limit=100)
+        self.teachers_dict = dict(
+            (teacher.id, teacher) for teacher in self.teachers
+        )
+
+        self.add_load_for_teacher(self.teachers[0], 40)
+        self.add_load_for_teacher(self.teachers[1], 60)
+        self.add_load_for_teacher(self.teachers[2], 20)
+
+    def add_load_for_teacher(self, teacher, load):
+        theme = ThemeFactory(duration=2)
+
+        for lesson in LessonFactory.create_batch(load / 2, theme=theme):
+            lesson.teachers.set([teacher])
+
+    def test_load(self):
+        with self.assertNumQueries(1):
+            load = TeacherLoad.load(self.teachers_dict)
+
+        self.assertEquals(load.get_ratio(self.teachers[0].id), 0.4)
+        self.assertEquals(load.get_ratio(self.teachers[2].id), 0.2)
+
+    def test_sort(self):
+        load = TeacherLoad.load(self.teachers_dict)
+
+        self.assertEquals(load.sort(self.teachers), [
+            self.teachers[2], self.teachers[0], self.teachers[1]
+        ])
+
+        load.add(self.teachers[2].id, 30)
+
+        self.assertEquals(load.sort(self.teachers), [
+            self.teachers[0], self.teachers[2], self.teachers[1]
+        ])
+
+    def test_get_least_loaded(self):
+        load = TeacherLoad.load(self.teachers_dict)
+
+        self.assertEquals(
+            load.get_least_loaded(self.teachers, 2),
+            [self.teachers[2], self.teachers[0]]
+        )
+        self.assertEquals(load.get_least_loaded(self.teachers[0:2]), [
+            self.teachers[0]
+        ])
@@ -0,0 +1,76 @@
+from datetime import date
+from StringIO import StringIO
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from ..builder import SnapshotScheduleBuilder
+from ..factories import ScheduleBuildFactory, LessonFactory
+from ..occupancy import OccupancyTensor, numpy
+from .snapshot_test import CurriculumMixin
+
+
+class ValidateScheduleTest(CurriculumMixin, TestCase):
+    def setUp(self):
+        self.create_curriculum()
+        cache.set('current_term_load', 0, timeout=None)
+
+        self.schedule_build = ScheduleBuildFactory(published=True)
+
+    def build(self):
+        SnapshotScheduleBuilder(schedule_build=self.schedule_build).build(
+            date(2017, 9, 4), 2
+        )
+
+    def validate(self, **options):
+        stdout = StringIO()
+        call_command('validate_schedule', stdout=stdout, **options)
+
+        return stdout.getvalue()
+
+    def test_validate(self):
+        self.build()
+
+        self.assertIn('no conflicts found', self.validate())
+
+    def test_validate_with_conflicts(self):
+        self.build()
+
+        lesson = self.schedule_build.lessons.first()
+        LessonFactory(
+            date_of=lesson.date_of, initial_hour=lesson.initial_hour,
+            troop=lesson.troop, theme=lesson.theme, build=self.schedule_build
+        )
+
+        with self.assertRaises(CommandError):
+            self.validate()
+
+    def test_validate_ignores_prerequisite_cycles(self):
+        self.build()
+        self.themes[0].previous_themes.set([self.themes[1]])
+
+        self.assertIn('no conflicts found', self.validate())
+
+    def test_validate_unknown_build(self):
+        with self.assertRaises(CommandError):
+            self.validate(build=self.schedule_build.id + 1)
+
+    @skipIf(numpy is None, 'numpy is not installed')
+    def test_tensor_backend(self):
+        self.build()
+        expected = self.get_lessons_struct()
+
+        self.schedule_build.lessons.all().delete()
+
+        with override_settings(OCCUPANCY_BACKEND='tensor'):
+            builder = SnapshotScheduleBuilder(
+                schedule_build=self.schedule_build
+            )
+            builder.build(date(2017, 9, 4), 2)
+
+        self.assertIsInstance(builder.occupancy, OccupancyTensor)
+        self.assertEquals(self.get_lessons_struct(), expected)
+        self.assertIn('no conflicts found', self.validate())
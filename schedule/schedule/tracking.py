@@ -0,0 +1,135 @@
+import heapq
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from .models import Lesson
+
+
+class DisciplineProgress(object):
+    def __init__(self, disciplines, course_lengths):
+        self.disciplines = {}
+        self.positions = {}
+        self.course_lengths = {}
+        self.hours = {}
+        self.ratios = {}
+        self.heap = []
+
+        for position, discipline in enumerate(disciplines):
+            course_length = course_lengths.get(discipline.id)
+
+            if not course_length:
+                continue
+
+            self.disciplines[discipline.id] = discipline
+            self.positions[discipline.id] = position
+            self.course_lengths[discipline.id] = course_length
+            self.hours[discipline.id] = 0
+
+            self.push(discipline.id, 0.0)
+
+    def push(self, discipline_id, ratio):
+        self.ratios[discipline_id] = ratio
+
+        if ratio < 1.0:
+            heapq.heappush(
+                self.heap, (ratio, self.positions[discipline_id],
+                            discipline_id)
+            )
+
+    def add(self, discipline_id, hours):
+        if discipline_id not in self.hours or not hours:
+            return
+
+        self.hours[discipline_id] += hours
+        self.push(discipline_id, float(self.hours[discipline_id]) / float(
+            self.course_lengths[discipline_id]
+        ))
+
+        if len(self.heap) > 2 * len(self.disciplines):
+            self.compact()
+
+    def is_actual(self, entry):
+        return self.ratios[entry[2]] == entry[0]
+
+    def get_actual(self, entries):
+        actual = []
+        seen = set()
+
+        for entry in entries:
+            if self.is_actual(entry) and entry[2] not in seen:
+                seen.add(entry[2])
+                actual.append(entry)
+
+        return actual
+
+    def compact(self):
+        self.heap = self.get_actual(self.heap)
+        heapq.heapify(self.heap)
+
+    def get_ordered(self):
+        return [
+            (self.disciplines[entry[2]], entry[0])
+            for entry in self.get_actual(
+                heapq.nsmallest(len(self.heap), self.heap)
+            )
+        ]
+
+
+class ThemeCursor(object):
+    def __init__(self, themes):
+        self.themes = themes
+        self.position = 0
+
+    def get_next(self, is_scheduled):
+        while self.position < len(self.themes):
+            theme = self.themes[self.position]
+
+            if not is_scheduled(theme):
+                return theme
+
+            self.position += 1
+
+    def rewind(self, theme):
+        if theme in self.themes:
+            self.position = min(self.position, self.themes.index(theme))
+
+
+class TeacherLoad(object):
+    def __init__(self, teachers):
+        self.teachers = teachers
+        self.hours = defaultdict(int)
+
+    @classmethod
+    def load(cls, teachers, schedule_build=None):
+        load = cls(teachers)
+        hours = Lesson.teachers.through.objects.filter(
+            lesson__build=schedule_build
+        ).values(
+            'teacher_id'
+        ).annotate(hours=Sum('lesson__theme__duration'))
+
+        for struct in hours:
+            load.hours[struct['teacher_id']] = struct['hours']
+
+        return load
+
+    def add(self, teacher_id, hours):
+        self.hours[teacher_id] += hours
+
+    def add_lesson(self, lesson):
+        for teacher_id in lesson.teachers:
+            self.add(teacher_id, lesson.theme.duration)
+
+    def get_ratio(self, teacher_id):
+        return float(self.hours[teacher_id]) / float(
+            self.teachers[teacher_id].work_hours_limit
+        )
+
+    def sort(self, teachers):
+        return sorted(teachers, key=lambda teacher: self.get_ratio(teacher.id))
+
+    def get_least_loaded(self, teachers, count=1):
+        return heapq.nsmallest(
+            count, teachers, key=lambda teacher: self.get_ratio(teacher.id)
+        )